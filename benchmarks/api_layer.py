@@ -0,0 +1,87 @@
+"""Бенчмарк API-слоя (modules/api/*) против заглушки панели.
+
+    python -m benchmarks.api_layer --users 10000 --repeat 20 --latency-ms 20
+"""
+import argparse
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta
+
+from benchmarks.common import point_bot_at, print_table, summarize
+from benchmarks.mock_panel import add_scale_arguments, panel_from_args
+
+
+def build_cases(panel):
+    """Набор вызовов API-слоя, которые делают обработчики бота"""
+    from modules.api.hosts import HostAPI
+    from modules.api.inbounds import InboundAPI
+    from modules.api.nodes import NodeAPI
+    from modules.api.system import SystemAPI
+    from modules.api.users import UserAPI
+
+    user = panel.data.users[len(panel.data.users) // 2]
+    node = panel.data.nodes[0]
+    end = datetime.now()
+    start = end - timedelta(days=7)
+
+    return [
+        ("SystemAPI.get_stats", SystemAPI.get_stats),
+        ("SystemAPI.get_bandwidth_stats", SystemAPI.get_bandwidth_stats),
+        ("UserAPI.get_users_count", UserAPI.get_users_count),
+        ("UserAPI.get_all_users", UserAPI.get_all_users),
+        ("UserAPI.get_user_by_uuid", lambda: UserAPI.get_user_by_uuid(user["uuid"])),
+        ("UserAPI.get_user_by_username", lambda: UserAPI.get_user_by_username(user["username"])),
+        ("UserAPI.get_user_usage_by_range", lambda: UserAPI.get_user_usage_by_range(
+            user["uuid"], start.isoformat(), end.isoformat())),
+        ("NodeAPI.get_all_nodes", NodeAPI.get_all_nodes),
+        ("NodeAPI.get_nodes_realtime_usage", NodeAPI.get_nodes_realtime_usage),
+        ("NodeAPI.get_nodes_usage_by_range", lambda: NodeAPI.get_nodes_usage_by_range(
+            start.isoformat(), end.isoformat())),
+        ("NodeAPI.get_node_usage_by_range", lambda: NodeAPI.get_node_usage_by_range(
+            node["uuid"], start.isoformat(), end.isoformat())),
+        ("InboundAPI.get_inbounds", InboundAPI.get_inbounds),
+        ("HostAPI.get_all_hosts", HostAPI.get_all_hosts),
+    ]
+
+
+async def run(panel, repeat, only=None):
+    rows = []
+    for name, call in build_cases(panel):
+        if only and only not in name:
+            continue
+        samples = []
+        panel.reset_hits()
+        failures = 0
+        for _ in range(repeat):
+            started = time.perf_counter()
+            result = await call()
+            samples.append(time.perf_counter() - started)
+            if result is None:
+                failures += 1
+        row = {"call": name, **summarize(samples)}
+        row["panel_calls"] = round(sum(panel.hits.values()) / repeat, 1)
+        row["failed"] = failures
+        rows.append(row)
+    return rows
+
+
+def main():
+    parser = add_scale_arguments(argparse.ArgumentParser(description="API layer benchmark against the mock panel"))
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--only", default=None, help="подстрока имени вызова")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    with panel_from_args(args) as panel:
+        point_bot_at(panel)
+        rows = asyncio.run(run(panel, args.repeat, args.only))
+
+    print(f"users={args.users} nodes={args.nodes} latency={args.latency_ms}ms error_rate={args.error_rate}")
+    print_table(rows, ["call", "n", "p50", "p95", "p99", "max", "panel_calls", "failed"])
+
+
+if __name__ == "__main__":
+    main()
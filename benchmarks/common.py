@@ -0,0 +1,57 @@
+"""Общие утилиты для скриптов бенчмарков"""
+import math
+import os
+import sys
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+
+def point_bot_at(panel, admin_id=1):
+    """Настроить окружение бота на заглушку панели.
+
+    Вызывать до первого импорта modules.*: modules.config читает переменные при импорте.
+    """
+    os.environ["API_BASE_URL"] = panel.url
+    os.environ["API_TOKEN"] = panel.token or "benchmark"
+    os.environ.setdefault("TELEGRAM_BOT_TOKEN", "123456:benchmark")
+    os.environ.setdefault("ADMIN_USER_IDS", str(admin_id))
+    os.environ.setdefault("SLOW_HANDLER_THRESHOLD_MS", "1000000")
+
+
+def percentile(samples, pct):
+    """Перцентиль по методу ближайшего ранга"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(0, min(len(ordered) - 1, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+def summarize(samples):
+    """p50/p95/p99/max в миллисекундах"""
+    ms = [s * 1000 for s in samples]
+    return {
+        "n": len(ms),
+        "p50": percentile(ms, 50),
+        "p95": percentile(ms, 95),
+        "p99": percentile(ms, 99),
+        "max": max(ms) if ms else 0.0,
+    }
+
+
+def print_table(rows, columns):
+    """Вывести список словарей выровненной таблицей"""
+    widths = {c: max(len(c), *(len(_fmt(r.get(c))) for r in rows)) for c in columns}
+    print("  ".join(c.ljust(widths[c]) for c in columns))
+    print("  ".join("-" * widths[c] for c in columns))
+    for row in rows:
+        print("  ".join(_fmt(row.get(c)).rjust(widths[c]) if isinstance(row.get(c), (int, float))
+                        else _fmt(row.get(c)).ljust(widths[c]) for c in columns))
+
+
+def _fmt(value):
+    if isinstance(value, float):
+        return f"{value:.2f}"
+    return "" if value is None else str(value)
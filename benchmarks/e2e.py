@@ -0,0 +1,328 @@
+"""Сквозной бенчмарк: сценарии из синтетических Update через настоящий ConversationHandler.
+
+Бот работает с заглушкой панели (benchmarks/mock_panel.py) и поддельным Bot API,
+который записывает исходящие вызовы. Нажатия кнопок берутся из последней
+отправленной клавиатуры, поэтому сценарии следуют реальному интерфейсу.
+
+    python -m benchmarks.e2e --users 10000 --runs 20 --latency-ms 20
+    python -m benchmarks.e2e --flow search_user --steps --cold
+"""
+import argparse
+import asyncio
+import json
+import logging
+import re
+import time
+from collections import Counter
+
+from telegram import Update
+from telegram.ext import Application
+from telegram.request import BaseRequest
+
+from benchmarks.common import point_bot_at, print_table, summarize
+from benchmarks.mock_panel import add_scale_arguments, panel_from_args
+
+ADMIN_ID = 1
+BOT_USER = {"id": 123456, "is_bot": True, "first_name": "RemnaBench", "username": "remna_bench_bot"}
+ADMIN_USER = {"id": ADMIN_ID, "is_bot": False, "first_name": "Admin", "username": "admin", "language_code": "ru"}
+CHAT = {"id": ADMIN_ID, "type": "private", "first_name": "Admin"}
+
+# Методы Bot API, которые возвращают Message и заменяют клавиатуру
+MESSAGE_METHODS = {
+    "sendMessage", "editMessageText", "editMessageReplyMarkup", "editMessageCaption",
+    "sendDocument", "sendPhoto", "editMessageMedia",
+}
+
+FLOWS = {
+    "dashboard": [
+        ("command", "start"),
+    ],
+    "system_stats": [
+        ("command", "start"),
+        ("click", "^stats$"),
+        ("click", "^system_stats$"),
+    ],
+    "list_users": [
+        ("command", "start"),
+        ("click", "^users$"),
+        ("click", "^list_users$"),
+    ],
+    "page_users": [
+        ("command", "start"),
+        ("click", "^users$"),
+        ("click", "^list_users$"),
+        ("click_last", "^users_page_"),
+        ("click_last", "^users_page_"),
+        ("click_last", "^users_page_"),
+    ],
+    "search_user": [
+        ("command", "start"),
+        ("click", "^users$"),
+        ("click", "^search_user$"),
+        ("text", "user000042"),
+    ],
+    "open_user": [
+        ("command", "start"),
+        ("click", "^users$"),
+        ("click", "^list_users$"),
+        ("click", "^(select_user|view)_"),
+    ],
+    "inbound_users": [
+        ("command", "start"),
+        ("click", "^inbounds$"),
+        ("click", "^list_inbounds$"),
+        ("click", "^(select|view)_inbound_"),
+        ("click", "^inbound_action_users_"),
+    ],
+    "node_stats": [
+        ("command", "start"),
+        ("click", "^nodes$"),
+        ("click", "^list_nodes$"),
+        ("click", "^(select|view)_node_"),
+        ("click", "^node_stats_"),
+    ],
+    "nodes_usage": [
+        ("command", "start"),
+        ("click", "^nodes$"),
+        ("click", "^nodes_usage$"),
+    ],
+    "bulk_filter": [
+        ("command", "start"),
+        ("click", "^bulk$"),
+        ("click", "^bulk_filter$"),
+        ("text", "tag = TRIAL and expire < now+3d and used_pct > 90"),
+        ("click", "^bulk_filter_op_disable$"),
+    ],
+    "bulk_delete_preview": [
+        ("command", "start"),
+        ("click", "^bulk$"),
+        ("click", "^bulk_delete_expired$"),
+    ],
+}
+
+
+class FlowError(Exception):
+    """Сценарий не может продолжиться: нет подходящей кнопки или обработчик упал"""
+
+
+class FakeTelegramRequest(BaseRequest):
+    """Bot API без сети: записывает вызовы и отвечает правдоподобными объектами"""
+
+    def __init__(self):
+        self.calls = Counter()
+        self.last_message = None
+        self._message_id = 0
+
+    @property
+    def read_timeout(self):
+        return None
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    async def do_request(self, url, method, request_data=None, read_timeout=None, write_timeout=None,
+                         connect_timeout=None, pool_timeout=None):
+        endpoint = url.rsplit("/", 1)[-1]
+        params = request_data.parameters if request_data else {}
+        self.calls[endpoint] += 1
+        payload = {"ok": True, "result": self._result(endpoint, params)}
+        return 200, json.dumps(payload).encode("utf-8")
+
+    def _result(self, endpoint, params):
+        if endpoint == "getMe":
+            return dict(BOT_USER, can_join_groups=False, can_read_all_group_messages=False, supports_inline_queries=False)
+        if endpoint in MESSAGE_METHODS:
+            if endpoint.startswith("send") or self.last_message is None:
+                self._message_id += 1
+            message = {
+                "message_id": self._message_id,
+                "date": int(time.time()),
+                "chat": CHAT,
+                "from": BOT_USER,
+                "text": params.get("text") or params.get("caption") or "",
+            }
+            markup = params.get("reply_markup")
+            if isinstance(markup, str):
+                markup = json.loads(markup)
+            if markup and "inline_keyboard" in markup:
+                message["reply_markup"] = markup
+            self.last_message = message
+            return message
+        return True
+
+    def buttons(self):
+        markup = (self.last_message or {}).get("reply_markup") or {}
+        return [b.get("callback_data") for row in markup.get("inline_keyboard", []) for b in row if b.get("callback_data")]
+
+
+class Harness:
+    """Приложение PTB с настоящим ConversationHandler и поддельным Bot API"""
+
+    def __init__(self, panel):
+        from modules import localization  # noqa: F401 - патчи локализации, как в main.py
+        from modules.handlers.core.conversation import create_conversation_handler
+
+        self.panel = panel
+        self.telegram = FakeTelegramRequest()
+        self.application = (
+            Application.builder()
+            .token("123456:benchmark")
+            .request(self.telegram)
+            .get_updates_request(FakeTelegramRequest())
+            .build()
+        )
+        self.application.add_handler(create_conversation_handler(), group=0)
+        self.application.add_error_handler(self._on_error)
+        self.errors = []
+        self._update_id = 0
+
+    async def _on_error(self, update, context):
+        self.errors.append(context.error)
+
+    async def __aenter__(self):
+        await self.application.initialize()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.application.shutdown()
+
+    def _next_id(self):
+        self._update_id += 1
+        return self._update_id
+
+    def _update(self, step, arg):
+        update_id = self._next_id()
+        if step == "command":
+            text = f"/{arg}"
+            message = {
+                "message_id": 10 ** 6 + update_id, "date": int(time.time()), "chat": CHAT, "from": ADMIN_USER,
+                "text": text, "entities": [{"type": "bot_command", "offset": 0, "length": len(text)}],
+            }
+            return {"update_id": update_id, "message": message}
+        if step == "text":
+            message = {"message_id": 10 ** 6 + update_id, "date": int(time.time()), "chat": CHAT, "from": ADMIN_USER, "text": arg}
+            return {"update_id": update_id, "message": message}
+
+        buttons = self.telegram.buttons()
+        matching = [data for data in buttons if re.search(arg, data)]
+        if not matching:
+            raise FlowError(f"no button matching {arg!r}; available: {buttons}")
+        data = matching[-1] if step == "click_last" else matching[0]
+        return {
+            "update_id": update_id,
+            "callback_query": {
+                "id": str(update_id), "from": ADMIN_USER, "chat_instance": "benchmark",
+                "data": data, "message": self.telegram.last_message,
+            },
+        }
+
+    async def step(self, step, arg):
+        """Обработать одно действие и вернуть (секунды, запросы к панели, вызовы Bot API)"""
+        update = Update.de_json(self._update(step, arg), self.application.bot)
+        panel_before = sum(self.panel.hits.values())
+        bot_before = sum(self.telegram.calls.values())
+        errors_before = len(self.errors)
+
+        started = time.perf_counter()
+        await self.application.process_update(update)
+        elapsed = time.perf_counter() - started
+
+        if len(self.errors) > errors_before:
+            raise FlowError(f"{step} {arg!r} raised {self.errors[-1]!r}")
+        return elapsed, sum(self.panel.hits.values()) - panel_before, sum(self.telegram.calls.values()) - bot_before
+
+
+async def run_flows(harness, flows, runs, warmup, cold):
+    from modules.handlers.users.handlers import user_cache
+
+    results = {}
+    for name in flows:
+        script = FLOWS[name]
+        totals, panel_calls, bot_calls, failures = [], [], [], []
+        per_step = [{"samples": [], "panel": 0} for _ in script]
+
+        for run in range(warmup + runs):
+            if cold:
+                user_cache.invalidate_all_users()
+            flow_time = flow_panel = flow_bot = 0
+            try:
+                for index, (step, arg) in enumerate(script):
+                    elapsed, panel, bot = await harness.step(step, arg)
+                    flow_time += elapsed
+                    flow_panel += panel
+                    flow_bot += bot
+                    if run >= warmup:
+                        per_step[index]["samples"].append(elapsed)
+                        per_step[index]["panel"] += panel
+            except FlowError as e:
+                if run >= warmup:
+                    failures.append(str(e))
+                continue
+            if run >= warmup:
+                totals.append(flow_time)
+                panel_calls.append(flow_panel)
+                bot_calls.append(flow_bot)
+
+        completed = max(1, len(totals))
+        results[name] = {
+            "flow": name,
+            **summarize(totals),
+            "panel_calls": round(sum(panel_calls) / completed, 1),
+            "bot_calls": round(sum(bot_calls) / completed, 1),
+            "failed": len(failures),
+            "errors": sorted(set(failures))[:3],
+            "steps": [
+                {
+                    "step": f"{step} {arg}",
+                    **summarize(info["samples"]),
+                    "panel_calls": round(info["panel"] / max(1, len(info["samples"])), 1),
+                }
+                for (step, arg), info in zip(script, per_step)
+            ],
+        }
+    return results
+
+
+async def main_async(args, panel):
+    async with Harness(panel) as harness:
+        flows = args.flow or list(FLOWS)
+        return await run_flows(harness, flows, args.runs, args.warmup, args.cold)
+
+
+def main():
+    parser = add_scale_arguments(argparse.ArgumentParser(description="End-to-end handler benchmark"))
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--flow", action="append", choices=sorted(FLOWS), help="запустить только этот сценарий")
+    parser.add_argument("--cold", action="store_true", help="сбрасывать кэш пользователей перед каждым прогоном")
+    parser.add_argument("--steps", action="store_true", help="показать задержку по шагам")
+    parser.add_argument("--json", dest="json_path", default=None, help="сохранить результаты в JSON")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.ERROR)
+
+    with panel_from_args(args) as panel:
+        point_bot_at(panel, admin_id=ADMIN_ID)
+        results = asyncio.run(main_async(args, panel))
+
+    print(f"users={args.users} nodes={args.nodes} latency={args.latency_ms}ms "
+          f"error_rate={args.error_rate} runs={args.runs} cold={args.cold}")
+    print_table(list(results.values()), ["flow", "n", "p50", "p95", "p99", "max", "panel_calls", "bot_calls", "failed"])
+
+    for result in results.values():
+        if args.steps:
+            print(f"\n{result['flow']}:")
+            print_table(result["steps"], ["step", "p50", "p95", "p99", "panel_calls"])
+        for error in result["errors"]:
+            print(f"! {result['flow']}: {error}")
+
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "results": results}, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""Микробенчмарки форматтеров и локализации на реалистичных данных.
+
+    python -m benchmarks.micro                    # сравнить с benchmarks/baseline.json
+    python -m benchmarks.micro --only escape      # только подходящие кейсы
+    python -m benchmarks.micro --save             # перезаписать базовые значения
+    python -m benchmarks.micro --max-regression 0.25   # код выхода 1 при замедлении > 25%
+
+Время — лучшее из нескольких повторов timeit, в микросекундах на вызов.
+Базовые значения зависят от машины: сравнивайте прогоны на одном и том же хосте.
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import sys
+import timeit
+
+from benchmarks.common import print_table
+from benchmarks.mock_panel import SPEC_PATH, SyntheticPanel
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+LONG_DESCRIPTION = (
+    "Клиент_VIP [оплачено до 2025-12-31] *семейный* тариф, `4 устройства`; "
+    "контакт: @client_support (telegram), заметки: перенос с old-panel_v1, "
+    "лимит снят вручную после обращения #1234. "
+) * 12
+
+
+def build_payloads():
+    """Синтетические пользователи, ноды и статистика в том же виде, что отдаёт панель"""
+    from modules.utils.node_metrics import NodeMetricsSnapshot
+
+    with open(SPEC_PATH, encoding="utf-8") as f:
+        spec = json.load(f)
+    data = SyntheticPanel(spec, users=200, nodes=100, hosts=10, seed=7)
+
+    user = dict(data.users[0])
+    long_user = dict(data.users[1], description=LONG_DESCRIPTION, tag="VIP_FAMILY", email="client_vip@example.com")
+    return {
+        "user": user,
+        "long_user": long_user,
+        "usernames": [u["username"] for u in data.users],
+        "nodes": NodeMetricsSnapshot(data.nodes, data.nodes_metrics(), data.nodes_seven_days()),
+        "node": data.nodes[0],
+        "host": data.hosts[0],
+        "inbound": data.inbounds[0],
+        "system_stats": data.system_stats(),
+        "bandwidth": data.bandwidth_stats(),
+        "bytes": [0, 512, 1536, 5 * 1024 ** 2, 7 * 1024 ** 3 + 123, 3 * 1024 ** 4, 2 * 1024 ** 5] * 10,
+    }
+
+
+def build_cases(payloads):
+    """Имя кейса -> функция без аргументов"""
+    from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+
+    from modules.localization import _translate_markup_for_language, translate_text
+    from modules.utils.formatters import (
+        escape_markdown, escape_markdown_uncached, escape_markdown_v2, format_bandwidth_stats, format_bytes,
+        format_host_details, format_inbound_details, format_node_details, format_nodes_stats,
+        format_system_stats, format_user_details, format_user_details_safe,
+    )
+
+    user, long_user, nodes = payloads["user"], payloads["long_user"], payloads["nodes"]
+    usernames = payloads["usernames"]
+    byte_values = payloads["bytes"]
+    details_ru = format_user_details(long_user)
+    system_ru = format_system_stats(payloads["system_stats"])
+    keyboard = InlineKeyboardMarkup([
+        [InlineKeyboardButton(f"👤 user{i:06d} ✅ Активен", callback_data=f"select_user_{i}")] for i in range(20)
+    ] + [[InlineKeyboardButton("🔙 Назад к списку", callback_data="back_to_list")]])
+
+    return {
+        "format_bytes[x70]": lambda: [format_bytes(v) for v in byte_values],
+        "escape_markdown.short": lambda: escape_markdown("user_000042"),
+        "escape_markdown.long": lambda: escape_markdown(LONG_DESCRIPTION),
+        "escape_markdown.uncached.short": lambda: escape_markdown_uncached("user_000042"),
+        "escape_markdown[200 usernames]": lambda: [escape_markdown(name) for name in usernames],
+        "escape_markdown_v2.short": lambda: escape_markdown_v2("user_000042"),
+        "escape_markdown_v2.long": lambda: escape_markdown_v2(LONG_DESCRIPTION),
+        "format_user_details": lambda: format_user_details(user),
+        "format_user_details.long_description": lambda: format_user_details(long_user),
+        "format_user_details_safe.long_description": lambda: format_user_details_safe(long_user),
+        "format_node_details": lambda: format_node_details(payloads["node"]),
+        "format_nodes_stats[100]": lambda: format_nodes_stats(nodes.nodes, nodes.totals),
+        "format_system_stats": lambda: format_system_stats(payloads["system_stats"]),
+        "format_bandwidth_stats": lambda: format_bandwidth_stats(payloads["bandwidth"]),
+        "format_host_details": lambda: format_host_details(payloads["host"]),
+        "format_inbound_details": lambda: format_inbound_details(payloads["inbound"]),
+        "translate_text.en.short": lambda: translate_text("✅ Пользователь успешно обновлен", "en"),
+        "translate_text.en.user_details": lambda: translate_text(details_ru, "en"),
+        "translate_text.en.system_stats": lambda: translate_text(system_ru, "en"),
+        "translate_text.ru.noop": lambda: translate_text(details_ru, "ru"),
+        "translate_markup.en[21]": lambda: _translate_markup_for_language(keyboard, "en"),
+    }
+
+
+def measure(func, repeat=5, min_time=0.2):
+    """Лучшее время одного вызова в микросекундах"""
+    timer = timeit.Timer(func)
+    number, elapsed = timer.autorange()
+    # autorange берёт ~0.2 с; растягиваем до min_time для стабильности
+    if elapsed < min_time:
+        number = max(1, int(number * min_time / max(elapsed, 1e-9)))
+    return min(timer.repeat(repeat=repeat, number=number)) / number * 1e6
+
+
+def load_baseline(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f).get("results", {})
+
+
+def save_baseline(path, results):
+    data = {
+        "python": platform.python_version(),
+        "machine": f"{platform.system()} {platform.machine()}",
+        "unit": "us/op",
+        "results": {name: round(value, 3) for name, value in sorted(results.items())},
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+        f.write("\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Formatter and localization microbenchmarks")
+    parser.add_argument("--only", default=None, help="подстрока имени кейса")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save", action="store_true", help="записать результаты как новые базовые")
+    parser.add_argument("--max-regression", type=float, default=None,
+                        help="допустимое замедление относительно базы (0.25 = 25%%)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.ERROR)
+
+    cases = build_cases(build_payloads())
+    baseline = load_baseline(args.baseline)
+    results, rows, regressions = {}, [], []
+
+    for name, func in cases.items():
+        if args.only and args.only not in name:
+            continue
+        value = measure(func, repeat=args.repeat)
+        results[name] = value
+        base = baseline.get(name)
+        ratio = value / base if base else None
+        rows.append({"case": name, "us/op": value, "baseline": base, "ratio": ratio})
+        if ratio and args.max_regression is not None and ratio > 1 + args.max_regression:
+            regressions.append(name)
+
+    print(f"python {platform.python_version()} ({platform.system()} {platform.machine()})")
+    print_table(rows, ["case", "us/op", "baseline", "ratio"])
+
+    if args.save:
+        if args.only:
+            results = {**baseline, **results}
+        save_baseline(args.baseline, results)
+        print(f"\nBaseline saved to {args.baseline}")
+
+    if regressions:
+        print(f"\nRegressions over {args.max_regression:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,815 @@
+"""Локальная заглушка панели Remnawave для бенчмарков.
+
+Маршруты и схемы ответов берутся из remnawave-api-v2113.json. Пользователи,
+ноды, инбаунды, хосты и профили генерируются синтетически в заданном масштабе,
+задержка и доля ошибок настраиваются.
+
+Запуск:
+    python -m benchmarks.mock_panel --users 10000 --port 3999 --latency-ms 40 --error-rate 0.01
+
+Затем в .env бота: API_BASE_URL=http://127.0.0.1:3999/api
+"""
+import argparse
+import copy
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+logger = logging.getLogger(__name__)
+
+SPEC_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "remnawave-api-v2113.json")
+
+GB = 1024 ** 3
+USER_STATUSES = ("ACTIVE", "DISABLED", "LIMITED", "EXPIRED")
+STATUS_WEIGHTS = (70, 10, 10, 10)
+COUNTRIES = ("DE", "NL", "FI", "US", "GB", "FR", "SE", "PL", "TR", "KZ", "JP", "SG")
+INBOUND_TYPES = (("vless", "tcp", "reality"), ("vless", "xhttp", "tls"), ("trojan", "tcp", "tls"), ("shadowsocks", "tcp", None))
+DEFAULT_PAGE_SIZE = 25
+
+
+def _iso(dt):
+    return dt.astimezone(timezone.utc).isoformat(timespec="milliseconds").replace("+00:00", "Z")
+
+
+def _range_days(query, default=7, limit=31):
+    """Количество дней в диапазоне start/end из query-параметров"""
+    try:
+        start = datetime.fromisoformat(query["start"].replace("Z", "+00:00"))
+        end = datetime.fromisoformat(query["end"].replace("Z", "+00:00"))
+    except (KeyError, ValueError):
+        return default
+    return max(1, min(limit, (end - start).days + 1))
+
+
+class SchemaSampler:
+    """Строит пример объекта по JSON-схеме из спецификации"""
+
+    def __init__(self, spec):
+        self.schemas = spec.get("components", {}).get("schemas", {})
+
+    def resolve(self, schema):
+        while isinstance(schema, dict) and "$ref" in schema:
+            schema = self.schemas[schema["$ref"].rsplit("/", 1)[-1]]
+        return schema or {}
+
+    def sample(self, schema):
+        schema = self.resolve(schema)
+        if "enum" in schema:
+            return schema.get("default", schema["enum"][0])
+        if "default" in schema:
+            return copy.deepcopy(schema["default"])
+        for key in ("oneOf", "anyOf", "allOf"):
+            if key in schema:
+                return self.sample(schema[key][0])
+
+        kind = schema.get("type")
+        if isinstance(kind, list):
+            kind = next((k for k in kind if k != "null"), None)
+        if kind is None and "properties" in schema:
+            kind = "object"
+
+        if kind == "object":
+            return {name: self.sample(prop) for name, prop in schema.get("properties", {}).items()}
+        if kind == "array":
+            return [self.sample(schema.get("items", {}))]
+        if kind == "string":
+            fmt = schema.get("format")
+            if fmt == "uuid":
+                return str(uuid.uuid4())
+            if fmt == "date-time":
+                return _iso(datetime.now(timezone.utc))
+            if fmt == "email":
+                return "user@example.com"
+            return "string"
+        if kind in ("integer", "number"):
+            return 0
+        if kind == "boolean":
+            return False
+        return None
+
+
+class Route:
+    """Маршрут из спецификации: шаблон пути, метод и схема успешного ответа"""
+
+    def __init__(self, method, path, operation):
+        self.method = method
+        self.path = path
+        segments = path.strip("/").split("/")
+        # Литеральные сегменты важнее параметров: /users/tags раньше /users/{uuid}
+        self.priority = tuple(seg.startswith("{") for seg in segments)
+        pattern = "/".join(
+            f"(?P<{seg[1:-1]}>[^/]+)" if seg.startswith("{") else re.escape(seg) for seg in segments
+        )
+        self.regex = re.compile(f"^/{pattern}/?$")
+
+        self.status = 200
+        self.schema = None
+        for code, response in operation.get("responses", {}).items():
+            if code.startswith("2"):
+                self.status = int(code)
+                self.schema = response.get("content", {}).get("application/json", {}).get("schema")
+                break
+
+
+class SyntheticPanel:
+    """Синтетическое состояние панели: пользователи, ноды, профили, инбаунды, хосты"""
+
+    def __init__(self, spec, users=1000, nodes=20, profiles=3, inbounds_per_profile=4, hosts=50, seed=42):
+        self.sampler = SchemaSampler(spec)
+        self.rng = random.Random(seed)
+        self.now = datetime.now(timezone.utc)
+        self.lock = threading.RLock()
+        self._templates = {}
+        self._spec = spec
+
+        self.profiles = []
+        self.inbounds = []
+        self.nodes = []
+        self.hosts = []
+        self.users = []
+        self.users_by_uuid = {}
+
+        self._build_profiles(profiles, inbounds_per_profile)
+        self._build_nodes(nodes)
+        self._build_hosts(hosts)
+        self._build_users(users)
+
+    # --- генерация ---------------------------------------------------------
+
+    def _uuid(self):
+        return str(uuid.UUID(int=self.rng.getrandbits(128), version=4))
+
+    def _template(self, path, method="get", many=False):
+        """Пример элемента ответа эндпоинта, используется как основа для сущностей"""
+        key = (path, method)
+        if key not in self._templates:
+            operation = self._spec["paths"][path][method]
+            schema = self.sampler.resolve(Route(method, path, operation).schema)
+            schema = self.sampler.resolve(schema.get("properties", {}).get("response", {}))
+            if many:
+                schema = self.sampler.resolve(schema.get("items", {}))
+            self._templates[key] = self.sampler.sample(schema)
+        return copy.deepcopy(self._templates[key])
+
+    def _ago(self, **kwargs):
+        return _iso(self.now - timedelta(**kwargs))
+
+    def _build_profiles(self, count, inbounds_per_profile):
+        for p in range(count):
+            profile_uuid = self._uuid()
+            inbounds = []
+            for i in range(inbounds_per_profile):
+                kind, network, security = INBOUND_TYPES[i % len(INBOUND_TYPES)]
+                inbound = {
+                    "uuid": self._uuid(),
+                    "profileUuid": profile_uuid,
+                    "tag": f"{kind.upper()}_{network.upper()}_{p}_{i}",
+                    "type": kind,
+                    "network": network,
+                    "security": security,
+                    "port": 443 + i,
+                    "rawInbound": None,
+                }
+                inbounds.append(inbound)
+                self.inbounds.append(dict(inbound, activeSquads=[]))
+            self.profiles.append({
+                "uuid": profile_uuid,
+                "name": f"profile-{p}",
+                "config": {"log": {"loglevel": "warning"}, "inbounds": [{"tag": ib["tag"]} for ib in inbounds]},
+                "inbounds": inbounds,
+                "nodes": [],
+                "createdAt": self._ago(days=90),
+                "updatedAt": self._ago(days=1),
+            })
+
+    def _build_nodes(self, count):
+        for n in range(count):
+            profile = self.profiles[n % len(self.profiles)] if self.profiles else None
+            country = COUNTRIES[n % len(COUNTRIES)]
+            node = self._template("/api/nodes", many=True)
+            is_disabled = n % 17 == 16
+            is_online = not is_disabled and n % 11 != 10
+            node.update({
+                "uuid": self._uuid(),
+                "name": f"node-{country.lower()}-{n:02d}",
+                "address": f"10.0.{n // 250}.{n % 250 + 1}",
+                "port": 2222,
+                "isConnected": is_online,
+                "isDisabled": is_disabled,
+                "isConnecting": False,
+                "isNodeOnline": is_online,
+                "isXrayRunning": is_online,
+                "lastStatusChange": self._ago(hours=n + 1),
+                "lastStatusMessage": None if is_online else "Connection refused",
+                "xrayVersion": "25.3.6",
+                "nodeVersion": "2.1.1",
+                "xrayUptime": str(self.rng.randint(3600, 30 * 86400)),
+                "isTrafficTrackingActive": n % 3 == 0,
+                "trafficResetDay": 1,
+                "trafficLimitBytes": 10 * 1024 * GB if n % 3 == 0 else 0,
+                "trafficUsedBytes": self.rng.randint(0, 8 * 1024) * GB,
+                "notifyPercent": 80,
+                "usersOnline": self.rng.randint(0, 500) if is_online else 0,
+                "viewPosition": n + 1,
+                "countryCode": country,
+                "consumptionMultiplier": 1.0,
+                "cpuCount": self.rng.choice((2, 4, 8)),
+                "cpuModel": "AMD EPYC 7543P",
+                "totalRam": f"{self.rng.choice((2, 4, 8))} GB",
+                "createdAt": self._ago(days=120 - n % 100),
+                "updatedAt": self._ago(hours=n + 1),
+            })
+            if isinstance(node.get("configProfile"), dict) and profile:
+                node["configProfile"]["activeConfigProfileUuid"] = profile["uuid"]
+                node["configProfile"]["activeInbounds"] = copy.deepcopy(profile["inbounds"])
+                profile["nodes"].append({"uuid": node["uuid"], "name": node["name"], "countryCode": country})
+            self.nodes.append(node)
+
+    def _build_hosts(self, count):
+        for h in range(count):
+            inbound = self.inbounds[h % len(self.inbounds)] if self.inbounds else {}
+            host = self._template("/api/hosts", many=True)
+            host.update({
+                "uuid": self._uuid(),
+                "viewPosition": h + 1,
+                "remark": f"{COUNTRIES[h % len(COUNTRIES)]} host {h}",
+                "address": f"h{h}.example.com",
+                "port": 443,
+                "sni": f"h{h}.example.com",
+                "isDisabled": h % 13 == 12,
+                "inbound": {
+                    "configProfileUuid": inbound.get("profileUuid"),
+                    "configProfileInboundUuid": inbound.get("uuid"),
+                },
+                "tag": None,
+            })
+            self.hosts.append(host)
+
+    def _build_users(self, count):
+        template = self._template("/api/users/{uuid}")
+        template["activeInternalSquads"] = []
+        template["lastConnectedNode"] = None
+        tags = (None, None, "VIP", "TRIAL", "FAMILY")
+        for i in range(count):
+            status = self.rng.choices(USER_STATUSES, STATUS_WEIGHTS)[0]
+            limit = self.rng.choice((0, 50 * GB, 100 * GB, 500 * GB))
+            used = self.rng.randint(0, limit) if limit else self.rng.randint(0, 300) * GB
+            if status == "LIMITED" and limit:
+                used = limit
+            expire_days = self.rng.randint(-30, -1) if status == "EXPIRED" else self.rng.randint(1, 365)
+            online = self.rng.random() < 0.6
+            user_uuid = self._uuid()
+            short_uuid = user_uuid.replace("-", "")[:16]
+            # Поверхностная копия: вложенные поля ниже всегда создаются заново
+            user = dict(template)
+            user.update({
+                "uuid": user_uuid,
+                "shortUuid": short_uuid,
+                "username": f"user{i:06d}",
+                "status": status,
+                "usedTrafficBytes": used,
+                "lifetimeUsedTrafficBytes": used + self.rng.randint(0, 100) * GB,
+                "trafficLimitBytes": limit,
+                "trafficLimitStrategy": self.rng.choice(("NO_RESET", "MONTH", "MONTH", "WEEK")),
+                "subLastUserAgent": "Happ/1.0" if online else None,
+                "subLastOpenedAt": self._ago(hours=self.rng.randint(1, 72)) if online else None,
+                "expireAt": _iso(self.now + timedelta(days=expire_days)),
+                "onlineAt": self._ago(minutes=self.rng.randint(0, 7 * 24 * 60)) if online else None,
+                "subRevokedAt": None,
+                "lastTrafficResetAt": None,
+                "vlessUuid": self._uuid(),
+                "description": f"Синтетический пользователь №{i}" if i % 4 == 0 else None,
+                "tag": tags[i % len(tags)],
+                "telegramId": 100000000 + i if i % 3 == 0 else None,
+                "email": f"user{i}@example.com" if i % 5 == 0 else None,
+                "hwidDeviceLimit": self.rng.choice((None, 3, 5)),
+                "firstConnectedAt": self._ago(days=self.rng.randint(1, 200)) if online else None,
+                "createdAt": self._ago(days=self.rng.randint(1, 400)),
+                "updatedAt": self._ago(days=self.rng.randint(0, 30)),
+                "subscriptionUrl": f"https://sub.example.com/{short_uuid}",
+                "activeInternalSquads": [],
+            })
+            if online and self.nodes and "lastConnectedNode" in user:
+                node = self.nodes[i % len(self.nodes)]
+                user["lastConnectedNode"] = {
+                    "connectedAt": user["onlineAt"],
+                    "nodeName": node["name"],
+                    "countryCode": node["countryCode"],
+                }
+            self.users.append(user)
+            self.users_by_uuid[user_uuid] = user
+
+    # --- выборки -----------------------------------------------------------
+
+    def find_users(self, field, value):
+        with self.lock:
+            return [u for u in self.users if str(u.get(field)) == value]
+
+    def user_usage(self, user_uuid, days=7):
+        usage = []
+        seed = int(user_uuid.replace("-", "")[:8], 16)
+        for offset in range(days):
+            date = (self.now - timedelta(days=offset)).date().isoformat()
+            for node in self.nodes[seed % 3::max(1, len(self.nodes) // 3)]:
+                usage.append({
+                    "userUuid": user_uuid,
+                    "nodeUuid": node["uuid"],
+                    "nodeName": node["name"],
+                    "countryCode": node["countryCode"],
+                    "total": (seed >> offset) % (5 * GB),
+                    "date": date,
+                })
+        return usage
+
+    def nodes_usage(self, days=7):
+        usage = []
+        for offset in range(days):
+            date = (self.now - timedelta(days=offset)).date().isoformat()
+            for index, node in enumerate(self.nodes):
+                usage.append({
+                    "nodeUuid": node["uuid"],
+                    "nodeName": node["name"],
+                    "nodeCountryCode": node["countryCode"],
+                    "total": (index + 1) * (offset + 3) * 7 * GB,
+                    "totalDownload": (index + 1) * (offset + 3) * 6 * GB,
+                    "totalUpload": (index + 1) * (offset + 3) * GB,
+                    "humanReadableTotal": "",
+                    "humanReadableTotalDownload": "",
+                    "humanReadableTotalUpload": "",
+                    "date": date,
+                })
+        return usage
+
+    def node_users_usage(self, node_uuid, days=7, limit=100):
+        usage = []
+        for offset in range(days):
+            date = (self.now - timedelta(days=offset)).date().isoformat()
+            for index, user in enumerate(self.users[:limit]):
+                usage.append({
+                    "userUuid": user["uuid"],
+                    "username": user["username"],
+                    "nodeUuid": node_uuid,
+                    "total": (index + 1) * (offset + 1) * 64 * 1024 * 1024,
+                    "date": date,
+                })
+        return usage
+
+    def realtime_usage(self):
+        usage = []
+        for node in self.nodes:
+            if not node["isConnected"]:
+                continue
+            down = self.rng.randint(1, 500) * GB
+            up = down // 8
+            down_speed = self.rng.randint(1, 200) * 1024 * 1024
+            up_speed = down_speed // 8
+            usage.append({
+                "nodeUuid": node["uuid"],
+                "nodeName": node["name"],
+                "countryCode": node["countryCode"],
+                "downloadBytes": down,
+                "uploadBytes": up,
+                "totalBytes": down + up,
+                "downloadSpeedBps": down_speed,
+                "uploadSpeedBps": up_speed,
+                "totalSpeedBps": down_speed + up_speed,
+            })
+        return usage
+
+    def nodes_metrics(self):
+        metrics = []
+        for node in self.nodes:
+            inbounds = (node.get("configProfile") or {}).get("activeInbounds") or []
+            metrics.append({
+                "nodeUuid": node["uuid"],
+                "nodeName": node["name"],
+                "countryEmoji": node["countryCode"],
+                "providerName": "synthetic",
+                "usersOnline": node["usersOnline"] or 0,
+                "inboundsStats": [
+                    {"tag": ib["tag"], "upload": str(self.rng.randint(0, 10 * GB)), "download": str(self.rng.randint(0, 80 * GB))}
+                    for ib in inbounds
+                ],
+                "outboundsStats": [
+                    {"tag": "DIRECT", "upload": str(self.rng.randint(0, 80 * GB)), "download": str(self.rng.randint(0, 10 * GB))}
+                ],
+            })
+        return {"nodes": metrics}
+
+    def system_stats(self):
+        with self.lock:
+            counts = Counter(u["status"] for u in self.users)
+            total_traffic = sum(u["usedTrafficBytes"] for u in self.users)
+            online_day = sum(1 for u in self.users if u["onlineAt"] and u["onlineAt"] >= self._ago(days=1))
+            never_online = sum(1 for u in self.users if not u["onlineAt"])
+        return {
+            "cpu": {"cores": 8, "physicalCores": 4},
+            "memory": {"total": 16 * GB, "free": 6 * GB, "used": 10 * GB, "active": 8 * GB, "available": 6 * GB},
+            "uptime": 86400 * 12,
+            "timestamp": int(time.time() * 1000),
+            "users": {
+                "statusCounts": {status: counts.get(status, 0) for status in USER_STATUSES},
+                "totalUsers": len(self.users),
+                "totalTrafficBytes": str(total_traffic),
+            },
+            "onlineStats": {
+                "lastDay": online_day,
+                "lastWeek": len(self.users) - never_online,
+                "neverOnline": never_online,
+                "onlineNow": online_day // 10,
+            },
+            "nodes": {"totalOnline": sum(1 for n in self.nodes if n["isNodeOnline"])},
+        }
+
+    def bandwidth_stats(self):
+        def period(current, previous):
+            return {"current": f"{current} GiB", "previous": f"{previous} GiB", "difference": f"{current - previous} GiB"}
+        return {
+            "bandwidthLastTwoDays": period(120, 110),
+            "bandwidthLastSevenDays": period(820, 790),
+            "bandwidthLast30Days": period(3400, 3600),
+            "bandwidthCalendarMonth": period(2100, 3500),
+            "bandwidthCurrentYear": period(31000, 28000),
+        }
+
+    def nodes_seven_days(self):
+        return {"lastSevenDays": [
+            {"nodeName": item["nodeName"], "date": item["date"], "totalBytes": str(item["total"])}
+            for item in self.nodes_usage(7)
+        ]}
+
+    def hwid_devices(self, user_uuid):
+        user = self.users_by_uuid.get(user_uuid)
+        count = (user.get("hwidDeviceLimit") or 0) // 2 if user else 0
+        devices = [{
+            "hwid": f"{user_uuid[:8]}-{d}",
+            "userUuid": user_uuid,
+            "platform": ("iOS", "Android", "Windows")[d % 3],
+            "osVersion": "17.0",
+            "deviceModel": None,
+            "userAgent": "Happ/1.0",
+            "createdAt": self._ago(days=d + 1),
+            "updatedAt": self._ago(hours=d + 1),
+        } for d in range(count)]
+        return {"total": len(devices), "devices": devices}
+
+    # --- изменения ---------------------------------------------------------
+
+    def create_user(self, body):
+        with self.lock:
+            user = copy.deepcopy(self.users[0]) if self.users else self._template("/api/users/{uuid}")
+            user_uuid = self._uuid()
+            user.update({
+                "uuid": user_uuid,
+                "shortUuid": user_uuid.replace("-", "")[:16],
+                "usedTrafficBytes": 0,
+                "lifetimeUsedTrafficBytes": 0,
+                "onlineAt": None,
+                "createdAt": _iso(datetime.now(timezone.utc)),
+                "updatedAt": _iso(datetime.now(timezone.utc)),
+                "lastConnectedNode": None,
+            })
+            user.update({k: v for k, v in body.items() if k in user})
+            self.users.append(user)
+            self.users_by_uuid[user_uuid] = user
+            return user
+
+    def update_user(self, user_uuid, fields):
+        with self.lock:
+            user = self.users_by_uuid.get(user_uuid)
+            if user is None:
+                return None
+            user.update({k: v for k, v in fields.items() if k in user and k != "uuid"})
+            user["updatedAt"] = _iso(datetime.now(timezone.utc))
+            return user
+
+    def delete_users(self, uuids):
+        with self.lock:
+            uuids = set(uuids)
+            before = len(self.users)
+            self.users = [u for u in self.users if u["uuid"] not in uuids]
+            for user_uuid in uuids:
+                self.users_by_uuid.pop(user_uuid, None)
+            return before - len(self.users)
+
+
+class MockPanel:
+    """HTTP-сервер заглушки панели с инъекцией задержки и ошибок"""
+
+    def __init__(self, host="127.0.0.1", port=0, spec_path=SPEC_PATH, latency_ms=0.0, jitter_ms=0.0,
+                 error_rate=0.0, token=None, seed=42, **scale):
+        with open(spec_path, encoding="utf-8") as f:
+            spec = json.load(f)
+
+        self.sampler = SchemaSampler(spec)
+        self.data = SyntheticPanel(spec, seed=seed, **scale)
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.token = token
+        self.hits = Counter()
+        self._hits_lock = threading.Lock()
+        self._rng = random.Random(seed)
+
+        routes = [
+            Route(method.upper(), path, operation)
+            for path, methods in spec.get("paths", {}).items()
+            for method, operation in methods.items()
+            if isinstance(operation, dict) and "responses" in operation
+        ]
+        self.routes = sorted(routes, key=lambda route: route.priority)
+        self._handlers = self._build_handlers()
+
+        self.server = ThreadingHTTPServer((host, port), self._make_request_handler())
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/api"
+
+    def start(self):
+        """Запустить сервер в фоновом потоке"""
+        self._thread = threading.Thread(target=self.server.serve_forever, name="mock-panel", daemon=True)
+        self._thread.start()
+        logger.info(f"Mock panel listening on {self.url} ({len(self.data.users)} users, {len(self.data.nodes)} nodes)")
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def reset_hits(self):
+        with self._hits_lock:
+            self.hits.clear()
+
+    # --- маршрутизация -----------------------------------------------------
+
+    def match(self, method, path):
+        allowed = False
+        for route in self.routes:
+            found = route.regex.match(path)
+            if found:
+                if route.method == method:
+                    return route, {k: unquote(v) for k, v in found.groupdict().items()}
+                allowed = True
+        return None, allowed
+
+    def _build_handlers(self):
+        d = self.data
+
+        def user_or_404(params):
+            return d.users_by_uuid.get(params.get("uuid"))
+
+        def first(items):
+            return items[0] if items else None
+
+        def list_users(params, query, body):
+            size = int(float(query.get("size", DEFAULT_PAGE_SIZE)))
+            start = int(float(query.get("start", 0)))
+            with d.lock:
+                return {"users": d.users[start:start + size], "total": len(d.users)}
+
+        def user_action(status):
+            def handler(params, query, body):
+                return d.update_user(params["uuid"], {"status": status})
+            return handler
+
+        def reset_traffic(params, query, body):
+            return d.update_user(params["uuid"], {"usedTrafficBytes": 0, "lastTrafficResetAt": _iso(datetime.now(timezone.utc))})
+
+        def revoke(params, query, body):
+            user = d.update_user(params["uuid"], {"subRevokedAt": _iso(datetime.now(timezone.utc))})
+            if user is not None:
+                user["shortUuid"] = d._uuid().replace("-", "")[:16]
+            return user
+
+        def bulk_update(params, query, body):
+            fields = body.get("fields") or {}
+            return {"affectedRows": sum(1 for u in body.get("uuids", []) if d.update_user(u, fields) is not None)}
+
+        def bulk_fields(fields):
+            def handler(params, query, body):
+                return {"affectedRows": sum(1 for u in body.get("uuids", []) if d.update_user(u, fields) is not None)}
+            return handler
+
+        def bulk_delete_by_status(params, query, body):
+            uuids = [u["uuid"] for u in d.find_users("status", body.get("status"))]
+            return {"affectedRows": d.delete_users(uuids)}
+
+        def bulk_all(fields_from_body):
+            def handler(params, query, body):
+                fields = (body or {}) if fields_from_body else {"usedTrafficBytes": 0}
+                with d.lock:
+                    for user in d.users:
+                        user.update({k: v for k, v in fields.items() if k in user})
+                return {"eventSent": True}
+            return handler
+
+        def node_or_404(params):
+            return next((n for n in d.nodes if n["uuid"] == params.get("uuid")), None)
+
+        def node_toggle(disabled):
+            def handler(params, query, body):
+                node = node_or_404(params)
+                if node is not None:
+                    node.update({"isDisabled": disabled, "isConnected": not disabled, "isNodeOnline": not disabled})
+                return node
+            return handler
+
+        def profile_inbounds(params, query, body):
+            profile = next((p for p in d.profiles if p["uuid"] == params.get("uuid")), None)
+            if profile is None:
+                return None
+            return {"total": len(profile["inbounds"]), "inbounds": profile["inbounds"]}
+
+        return {
+            ("GET", "/api/users"): list_users,
+            ("POST", "/api/users"): lambda p, q, b: d.create_user(b),
+            ("PATCH", "/api/users"): lambda p, q, b: d.update_user(b.get("uuid"), b),
+            ("GET", "/api/users/{uuid}"): lambda p, q, b: user_or_404(p),
+            ("DELETE", "/api/users/{uuid}"): lambda p, q, b: {"isDeleted": bool(d.delete_users([p["uuid"]]))},
+            ("GET", "/api/users/tags"): lambda p, q, b: {"tags": sorted({u["tag"] for u in d.users if u["tag"]})},
+            ("GET", "/api/users/by-short-uuid/{shortUuid}"): lambda p, q, b: first(d.find_users("shortUuid", p["shortUuid"])),
+            ("GET", "/api/users/by-username/{username}"): lambda p, q, b: first(d.find_users("username", p["username"])),
+            ("GET", "/api/users/by-telegram-id/{telegramId}"): lambda p, q, b: d.find_users("telegramId", p["telegramId"]),
+            ("GET", "/api/users/by-email/{email}"): lambda p, q, b: d.find_users("email", p["email"]),
+            ("GET", "/api/users/by-tag/{tag}"): lambda p, q, b: d.find_users("tag", p["tag"]),
+            ("POST", "/api/users/{uuid}/actions/enable"): user_action("ACTIVE"),
+            ("POST", "/api/users/{uuid}/actions/disable"): user_action("DISABLED"),
+            ("POST", "/api/users/{uuid}/actions/reset-traffic"): reset_traffic,
+            ("POST", "/api/users/{uuid}/actions/revoke"): revoke,
+            ("POST", "/api/users/bulk/update"): bulk_update,
+            ("POST", "/api/users/bulk/reset-traffic"): bulk_fields({"usedTrafficBytes": 0}),
+            ("POST", "/api/users/bulk/revoke-subscription"): bulk_fields({"subRevokedAt": _iso(d.now)}),
+            ("POST", "/api/users/bulk/delete"): lambda p, q, b: {"affectedRows": d.delete_users(b.get("uuids", []))},
+            ("POST", "/api/users/bulk/delete-by-status"): bulk_delete_by_status,
+            ("POST", "/api/users/bulk/all/update"): bulk_all(True),
+            ("POST", "/api/users/bulk/all/reset-traffic"): bulk_all(False),
+            ("GET", "/api/users/stats/usage/{uuid}/range"): lambda p, q, b: d.user_usage(p["uuid"], _range_days(q)),
+            ("GET", "/api/nodes"): lambda p, q, b: d.nodes,
+            ("GET", "/api/nodes/{uuid}"): lambda p, q, b: node_or_404(p),
+            ("POST", "/api/nodes/{uuid}/actions/enable"): node_toggle(False),
+            ("POST", "/api/nodes/{uuid}/actions/disable"): node_toggle(True),
+            ("POST", "/api/nodes/{uuid}/actions/restart"): lambda p, q, b: {"eventSent": node_or_404(p) is not None},
+            ("POST", "/api/nodes/actions/restart-all"): lambda p, q, b: {"eventSent": True},
+            ("GET", "/api/nodes/usage/realtime"): lambda p, q, b: d.realtime_usage(),
+            ("GET", "/api/nodes/usage/range"): lambda p, q, b: d.nodes_usage(_range_days(q)),
+            ("GET", "/api/nodes/usage/{uuid}/users/range"): lambda p, q, b: d.node_users_usage(p["uuid"], _range_days(q)),
+            ("GET", "/api/hosts"): lambda p, q, b: d.hosts,
+            ("GET", "/api/hosts/{uuid}"): lambda p, q, b: next((h for h in d.hosts if h["uuid"] == p["uuid"]), None),
+            ("GET", "/api/config-profiles"): lambda p, q, b: {"total": len(d.profiles), "configProfiles": d.profiles},
+            ("GET", "/api/config-profiles/{uuid}"): lambda p, q, b: next((x for x in d.profiles if x["uuid"] == p["uuid"]), None),
+            ("GET", "/api/config-profiles/inbounds"): lambda p, q, b: {"total": len(d.inbounds), "inbounds": d.inbounds},
+            ("GET", "/api/config-profiles/{uuid}/inbounds"): profile_inbounds,
+            ("GET", "/api/system/stats"): lambda p, q, b: d.system_stats(),
+            ("GET", "/api/system/stats/bandwidth"): lambda p, q, b: d.bandwidth_stats(),
+            ("GET", "/api/system/stats/nodes"): lambda p, q, b: d.nodes_seven_days(),
+            ("GET", "/api/system/nodes/metrics"): lambda p, q, b: d.nodes_metrics(),
+            ("GET", "/api/hwid/devices/{userUuid}"): lambda p, q, b: d.hwid_devices(p["userUuid"]),
+        }
+
+    def handle(self, method, raw_path, headers, raw_body):
+        """Обработать запрос и вернуть (статус, тело ответа)"""
+        parts = urlsplit(raw_path)
+        path = parts.path
+        query = {k: v[-1] for k, v in parse_qs(parts.query).items()}
+
+        if self.latency_ms or self.jitter_ms:
+            time.sleep(max(0.0, self.latency_ms + self._rng.uniform(-self.jitter_ms, self.jitter_ms)) / 1000)
+
+        route, params = self.match(method, path)
+        with self._hits_lock:
+            self.hits[f"{method} {route.path if route else path}"] += 1
+
+        if self.error_rate and self._rng.random() < self.error_rate:
+            return 500, self._error(path, 500, "Injected error", "A000")
+        if self.token and headers.get("Authorization") != f"Bearer {self.token}":
+            return 401, self._error(path, 401, "Unauthorized", "A001")
+        if route is None:
+            if params:
+                return 405, self._error(path, 405, "Method Not Allowed", "A002")
+            return 404, self._error(path, 404, f"Cannot {method} {path}", "A404")
+
+        try:
+            body = json.loads(raw_body) if raw_body else {}
+        except ValueError:
+            return 400, self._error(path, 400, "Invalid JSON", "A003")
+
+        handler = self._handlers.get((method, route.path))
+        if handler is None:
+            return route.status, self.sampler.sample(route.schema) if route.schema else {}
+
+        result = handler(params, query, body)
+        if result is None:
+            return 404, self._error(path, 404, "Not found", "A063")
+        return route.status, {"response": result}
+
+    @staticmethod
+    def _error(path, status, message, code):
+        return {
+            "timestamp": _iso(datetime.now(timezone.utc)),
+            "path": path,
+            "message": message,
+            "errorCode": code,
+            "statusCode": status,
+        }
+
+    def _make_request_handler(self):
+        panel = self
+
+        class RequestHandler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _dispatch(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                raw_body = self.rfile.read(length) if length else b""
+                try:
+                    status, payload = panel.handle(self.command, self.path, self.headers, raw_body)
+                except Exception as e:
+                    logger.exception(f"Mock panel handler failed: {e}")
+                    status, payload = 500, panel._error(self.path, 500, str(e), "A999")
+                body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            do_GET = do_POST = do_PATCH = do_PUT = do_DELETE = _dispatch
+
+            def log_message(self, format, *args):
+                logger.debug("mock-panel: " + format % args)
+
+        return RequestHandler
+
+
+def add_scale_arguments(parser):
+    """Общие аргументы масштаба и деградации для скриптов бенчмарков"""
+    parser.add_argument("--users", type=int, default=1000, help="количество пользователей (1k–100k)")
+    parser.add_argument("--nodes", type=int, default=20)
+    parser.add_argument("--profiles", type=int, default=3)
+    parser.add_argument("--inbounds-per-profile", type=int, default=4)
+    parser.add_argument("--hosts", type=int, default=50)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="задержка ответа панели")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="разброс задержки ±")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="доля ответов 500 (0..1)")
+    parser.add_argument("--seed", type=int, default=42)
+    return parser
+
+
+def panel_from_args(args, host="127.0.0.1", port=0, token=None):
+    return MockPanel(
+        host=host,
+        port=port,
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        token=token,
+        seed=args.seed,
+        users=args.users,
+        nodes=args.nodes,
+        profiles=args.profiles,
+        inbounds_per_profile=args.inbounds_per_profile,
+        hosts=args.hosts,
+    )
+
+
+def main():
+    parser = add_scale_arguments(argparse.ArgumentParser(description="Mock Remnawave panel for benchmarks"))
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=3999)
+    parser.add_argument("--token", default=None, help="требовать Authorization: Bearer <token>")
+    args = parser.parse_args()
+
+    logging.basicConfig(format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", level=logging.INFO)
+    panel = panel_from_args(args, host=args.host, port=args.port, token=args.token)
+    print(f"Mock panel: {panel.url}  (users={args.users}, nodes={args.nodes}, hosts={args.hosts})")
+    try:
+        panel.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        panel.server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""Время импорта при старте бота по отчету `python -X importtime`.
+
+    python -m benchmarks.startup                  # 5 запусков, медиана и самые тяжелые модули
+    python -m benchmarks.startup --runs 10 --top 30
+    python -m benchmarks.startup --load-handlers  # то же, но с импортом всех разделов (как до ленивой загрузки)
+
+Каждый запуск — отдельный интерпретатор, который импортирует main и
+собирает ConversationHandler, то есть делает все, что бот делает до
+начала опроса Telegram.
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+from benchmarks.common import ROOT_DIR, print_table
+
+LINE_RE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+STARTUP_CODE = "import main; main.create_conversation_handler()"
+HANDLER_PACKAGES = ("users", "nodes", "hosts", "inbounds", "bulk", "stats")
+
+
+def parse_importtime(stderr):
+    """Строки отчета -importtime: (модуль, собственное время, накопленное время, глубина) в мкс"""
+    entries = []
+    for line in stderr.splitlines():
+        match = LINE_RE.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            entries.append((module, int(self_us), int(cumulative_us), len(indent) // 2))
+    return entries
+
+
+def run_once(code):
+    env = dict(os.environ)
+    env.setdefault("API_BASE_URL", "http://127.0.0.1:3999/api")
+    env.setdefault("API_TOKEN", "benchmark")
+    env.setdefault("TELEGRAM_BOT_TOKEN", "123456:benchmark")
+    env.setdefault("ADMIN_USER_IDS", "1")
+    env["LOG_LEVEL"] = "CRITICAL"
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=ROOT_DIR, env=env, capture_output=True, text=True, check=True,
+    )
+    return parse_importtime(result.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Startup import-time profile")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=20, help="сколько самых тяжелых модулей показать")
+    parser.add_argument("--load-handlers", action="store_true", help="импортировать все модули разделов")
+    args = parser.parse_args()
+
+    code = STARTUP_CODE
+    if args.load_handlers:
+        code += "".join(f"; import modules.handlers.{name}.handlers" for name in HANDLER_PACKAGES)
+
+    totals, own, counts = [], [], []
+    per_module = {}
+    for _ in range(args.runs):
+        entries = run_once(code)
+        totals.append(sum(self_us for _, self_us, _, _ in entries) / 1000)
+        own.append(sum(self_us for module, self_us, _, _ in entries if module == "main" or module.startswith("modules")) / 1000)
+        counts.append(len(entries))
+        for module, self_us, cumulative_us, depth in entries:
+            per_module.setdefault(module, []).append((self_us, cumulative_us))
+
+    print(f"python {sys.version.split()[0]}, {args.runs} runs: {code}")
+    print(f"imported modules:       {statistics.median(counts):.0f}")
+    print(f"total import time:      {statistics.median(totals):.1f} ms (median)")
+    print(f"main + modules.* self:  {statistics.median(own):.1f} ms (median)")
+    loaded = [name for name in HANDLER_PACKAGES if f"modules.handlers.{name}.handlers" in per_module]
+    print(f"handler modules loaded: {', '.join(loaded) or 'none'}\n")
+
+    rows = []
+    for module, samples in per_module.items():
+        rows.append({
+            "module": module,
+            "self ms": statistics.median(s for s, _ in samples) / 1000,
+            "cumulative ms": statistics.median(c for _, c in samples) / 1000,
+        })
+    rows.sort(key=lambda row: row["self ms"], reverse=True)
+    print_table(rows[:args.top], ["module", "self ms", "cumulative ms"])
+
+
+if __name__ == "__main__":
+    main()
@@ -81,12 +81,65 @@ logger.error("Error logging enabled")
 sys.stdout.flush()
 sys.stderr.flush()
 
-from telegram.ext import Application, MessageHandler, CallbackQueryHandler, filters
+import asyncio
+
+from telegram.ext import Application, CommandHandler, MessageHandler, CallbackQueryHandler, filters
 
 # Import modules
+from modules.config import DASHBOARD_SHOW_SYSTEM_STATS, METRICS_ENABLED, METRICS_HOST, METRICS_PORT, EVENT_LOOP_LAG_INTERVAL
+from modules.handlers.users.export import handle_export_command
 from modules.handlers.core.conversation import create_conversation_handler
+from modules.handlers.core.lazy import lazy_handler
+from modules.utils.bulk_jobs import CANCEL_JOB_PREFIX, bulk_jobs
+from modules.utils.host_metrics import host_metrics
+from modules.utils.message_pages import PAGE_CALLBACK_PREFIX, handle_page_flip
+from modules.utils.metrics import InstrumentedHTTPXRequest, loop_blocking_detector, monitor_event_loop_lag, start_metrics_server
+from modules.utils.node_usage import node_usage_poller
+from modules.utils.node_watchdog import node_watchdog
+from modules.utils.rolling_restart import CANCEL_ROLLING_PREFIX
+from modules.utils.user_alerts import user_alerts
 from modules import localization  # noqa: F401 - ensure localization patches are loaded
 
+# Модули разделов не импортируются при старте: отмена задач подгружает их при первом нажатии
+handle_cancel_job = lazy_handler("modules.handlers.bulk.handlers", "handle_cancel_job")
+handle_cancel_rolling_restart = lazy_handler("modules.handlers.nodes.handlers", "handle_cancel_rolling_restart")
+
+
+async def on_startup(application: Application):
+    """Start background services on the application event loop"""
+    loop_blocking_detector.start()
+    await bulk_jobs.start(application.bot)
+    node_usage_poller.start()
+    if DASHBOARD_SHOW_SYSTEM_STATS:
+        host_metrics.start()
+    node_watchdog.start(application.bot)
+    user_alerts.start(application.bot)
+    if METRICS_ENABLED:
+        try:
+            application.bot_data["metrics_server"] = await start_metrics_server(METRICS_HOST, METRICS_PORT)
+            application.bot_data["loop_lag_task"] = asyncio.create_task(
+                monitor_event_loop_lag(EVENT_LOOP_LAG_INTERVAL)
+            )
+        except OSError as e:
+            logger.error(f"Failed to start metrics endpoint on {METRICS_HOST}:{METRICS_PORT}: {e}")
+
+
+async def on_shutdown(application: Application):
+    """Stop background services started in on_startup"""
+    await bulk_jobs.stop()
+    await node_usage_poller.stop()
+    await host_metrics.stop()
+    await node_watchdog.stop()
+    await user_alerts.stop()
+    task = application.bot_data.pop("loop_lag_task", None)
+    if task:
+        task.cancel()
+    loop_blocking_detector.stop()
+    server = application.bot_data.pop("metrics_server", None)
+    if server:
+        server.close()
+        await server.wait_closed()
+
 
 def main():
     # Load environment variables
@@ -122,7 +175,11 @@ def main():
         return
     # Create the Application
     logger.info("Creating Telegram Application...")
-    application = Application.builder().token(bot_token).build()
+    builder = Application.builder().token(bot_token).post_init(on_startup).post_shutdown(on_shutdown)
+    if METRICS_ENABLED:
+        # Measure Telegram send latency for every Bot API call except long polling
+        builder = builder.request(InstrumentedHTTPXRequest(connection_pool_size=256))
+    application = builder.build()
     logger.info("Telegram Application created successfully")
     
     # Cache cleanup will be handled automatically by the cache TTL mechanism
@@ -133,6 +190,14 @@ def main():
     conv_handler = create_conversation_handler()
     application.add_handler(conv_handler, group=0)
     logger.info("Conversation handler added successfully")
+
+    # Отмена фоновых задач доступна из любого состояния диалога
+    application.add_handler(CallbackQueryHandler(handle_cancel_job, pattern=f"^{CANCEL_JOB_PREFIX}"), group=-1)
+    application.add_handler(CallbackQueryHandler(handle_cancel_rolling_restart, pattern=f"^{CANCEL_ROLLING_PREFIX}"), group=-1)
+    # Выгрузка пользователей файлом не зависит от состояния диалога
+    application.add_handler(CommandHandler("export", handle_export_command), group=-1)
+    # Листание длинных экранов идет из кэша страниц в любом состоянии диалога
+    application.add_handler(CallbackQueryHandler(handle_page_flip, pattern=f"^{PAGE_CALLBACK_PREFIX}"), group=-1)
     
     # Run polling with retry logic
     max_retries = 10
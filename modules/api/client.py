@@ -1,7 +1,9 @@
 import httpx
 import logging
 import asyncio
+import time
 from modules.config import API_BASE_URL, API_TOKEN, API_COOKIES
+from modules.utils.metrics import observe_connection_test, observe_panel_request
 
 logger = logging.getLogger(__name__)
 
@@ -55,7 +57,9 @@ class RemnaAPI:
             client_kwargs = get_client_kwargs()
             
             async with httpx.AsyncClient(**client_kwargs) as client:
+                started = time.perf_counter()
                 response = await client.get(url, timeout=10.0, follow_redirects=True)
+                observe_connection_test(response.status_code, time.perf_counter() - started)
                 logger.debug(f"Тест подключения: статус {response.status_code}, URL: {response.url}")
                 return response.status_code == 200
         except Exception as e:
@@ -98,7 +102,15 @@ class RemnaAPI:
                     if method.upper() in ['POST', 'PATCH', 'PUT'] and data is not None:
                         request_kwargs['json'] = data
                     
-                    response = await client.request(method, follow_redirects=True, **request_kwargs)
+                    started = time.perf_counter()
+                    try:
+                        response = await client.request(method, follow_redirects=True, **request_kwargs)
+                    except Exception as e:
+                        observe_panel_request(method, endpoint, type(e).__name__, time.perf_counter() - started)
+                        raise
+                    observe_panel_request(
+                        method, endpoint, response.status_code, time.perf_counter() - started, len(response.content)
+                    )
                     
                     logger.debug(f"Response status: {response.status_code}")
                     logger.debug(f"Response headers: {dict(response.headers)}")
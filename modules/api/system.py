@@ -18,6 +18,11 @@ class SystemAPI:
         """Get nodes statistics"""
         return await RemnaAPI.get("system/stats/nodes")
 
+    @staticmethod
+    async def get_nodes_metrics():
+        """Get per-node inbound/outbound traffic and online users"""
+        return await RemnaAPI.get("system/nodes/metrics")
+
     
     @staticmethod
     async def get_xray_config():
@@ -4,6 +4,16 @@ import re
 
 logger = logging.getLogger(__name__)
 
+
+class UserPageError(Exception):
+    """A page of the users list could not be fetched"""
+
+    def __init__(self, start, size):
+        super().__init__(f"Failed to fetch users page (start={start}, size={size})")
+        self.start = start
+        self.size = size
+
+
 class UserAPI:
     """API client for user operations"""
     
@@ -55,6 +65,29 @@ class UserAPI:
         logger.info(f"Retrieved {len(all_users)} users total")
         return {'users': all_users} if all_users else []
     
+    @staticmethod
+    async def iter_user_pages(size=500):
+        """Yield users page by page without collecting the whole list.
+
+        Only an empty page ends the iteration; a failed or malformed page raises
+        UserPageError, so callers never mistake a panel error for the end of the list.
+        """
+        start = 0
+        while True:
+            response = await RemnaAPI.get("users", params={'size': size, 'start': start})
+            if isinstance(response, dict) and isinstance(response.get('users'), list):
+                users = response['users']
+            elif isinstance(response, list):
+                users = response
+            else:
+                raise UserPageError(start, size)
+            if not users:
+                break
+            yield users
+            if len(users) < size:
+                break
+            start += size
+
     @staticmethod
     async def get_users_count():
         """Get total number of users efficiently"""
@@ -138,3 +138,76 @@ DASHBOARD_SHOW_UPTIME = os.getenv("DASHBOARD_SHOW_UPTIME", "true").lower() == "t
 # Настройки поиска пользователей
 ENABLE_PARTIAL_SEARCH = os.getenv("ENABLE_PARTIAL_SEARCH", "true").lower() == "true"
 SEARCH_MIN_LENGTH = int(os.getenv("SEARCH_MIN_LENGTH", "2"))
+
+# Метрики Prometheus (/metrics)
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "false").lower() == "true"
+METRICS_HOST = os.getenv("METRICS_HOST", "0.0.0.0")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9100"))
+EVENT_LOOP_LAG_INTERVAL = float(os.getenv("EVENT_LOOP_LAG_INTERVAL", "1.0"))
+# Обработчики медленнее порога пишут в лог разбивку по запросам к панели (0 — отключено)
+SLOW_HANDLER_THRESHOLD_MS = float(os.getenv("SLOW_HANDLER_THRESHOLD_MS", "1500"))
+# Блокировка event loop дольше порога пишет в лог стек места, где он застрял (0 — отключено)
+LOOP_BLOCK_THRESHOLD_MS = float(os.getenv("LOOP_BLOCK_THRESHOLD_MS", "250"))
+
+# Массовые операции: размер пачки для users/bulk/*, число параллельных запросов к панели
+# и минимальный интервал между обновлениями сообщения с прогрессом (секунды)
+BULK_CHUNK_SIZE = int(os.getenv("BULK_CHUNK_SIZE", "100"))
+BULK_CONCURRENCY = int(os.getenv("BULK_CONCURRENCY", "4"))
+BULK_PROGRESS_INTERVAL = float(os.getenv("BULK_PROGRESS_INTERVAL", "2.0"))
+
+# Фоновые массовые задачи: каталог контрольных точек (задачи продолжаются после перезапуска)
+# и число одновременно выполняемых задач
+BULK_JOBS_DIR = os.getenv("BULK_JOBS_DIR", "data/bulk_jobs")
+BULK_JOB_WORKERS = int(os.getenv("BULK_JOB_WORKERS", "2"))
+
+# Фоновый опрос nodes/usage/realtime: интервал в секундах (0 — отключено) и глубина истории в минутах
+NODE_USAGE_POLL_INTERVAL = float(os.getenv("NODE_USAGE_POLL_INTERVAL", "30"))
+NODE_USAGE_HISTORY_MINUTES = float(os.getenv("NODE_USAGE_HISTORY_MINUTES", "60"))
+
+# Опрос метрик хоста бота (psutil) в фоновом потоке для запасного блока «Система» на дашборде,
+# интервал в секундах (0 — снимать по запросу, тоже в потоке)
+HOST_METRICS_INTERVAL = float(os.getenv("HOST_METRICS_INTERVAL", "30"))
+
+# Время жизни кэша метрик серверов (nodes + system/nodes/metrics + system/stats/nodes), секунды
+NODE_METRICS_TTL = float(os.getenv("NODE_METRICS_TTL", "15"))
+
+# История трафика серверов по дням: файл кэша закрытых дней, сколько дней хранить
+# и как часто перечитывать сегодняшний день (секунды)
+NODE_HISTORY_FILE = os.getenv("NODE_HISTORY_FILE", "data/node_history.json")
+NODE_HISTORY_MAX_DAYS = int(os.getenv("NODE_HISTORY_MAX_DAYS", "120"))
+NODE_HISTORY_TODAY_TTL = float(os.getenv("NODE_HISTORY_TODAY_TTL", "60"))
+
+# Кэш статистики пользователей по серверам: сколько пользователей держать (LRU)
+# и как часто перечитывать сегодняшний день (секунды)
+USER_USAGE_CACHE_SIZE = int(os.getenv("USER_USAGE_CACHE_SIZE", "1000"))
+USER_USAGE_TODAY_TTL = float(os.getenv("USER_USAGE_TODAY_TTL", "60"))
+
+# Сколько отрисованных графиков трафика держать в памяти
+CHART_CACHE_SIZE = int(os.getenv("CHART_CACHE_SIZE", "64"))
+
+# Мониторинг серверов с оповещением администраторов: интервал опроса (0 — отключено),
+# ускоренный интервал при нестабильных серверах, сколько опросов подряд подтверждают
+# новое состояние и минимальная пауза между оповещениями по одному серверу (секунды)
+NODE_WATCHDOG_INTERVAL = float(os.getenv("NODE_WATCHDOG_INTERVAL", "60"))
+NODE_WATCHDOG_FAST_INTERVAL = float(os.getenv("NODE_WATCHDOG_FAST_INTERVAL", "15"))
+NODE_WATCHDOG_CONFIRM_POLLS = int(os.getenv("NODE_WATCHDOG_CONFIRM_POLLS", "2"))
+NODE_WATCHDOG_COOLDOWN = float(os.getenv("NODE_WATCHDOG_COOLDOWN", "300"))
+
+# Оповещения о пользователях: интервал проверки в секундах (0 — отключено), за сколько
+# дней до окончания подписки предупреждать, пороги израсходованного трафика в процентах
+# и час ежедневной сводки по UTC (-1 — без сводки)
+USER_ALERT_INTERVAL = float(os.getenv("USER_ALERT_INTERVAL", "600"))
+USER_ALERT_EXPIRY_DAYS = sorted(
+    {int(day.strip()) for day in os.getenv("USER_ALERT_EXPIRY_DAYS", "7,3,1").split(",") if day.strip()},
+    reverse=True,
+)
+USER_ALERT_TRAFFIC_PERCENT = sorted(
+    {int(percent.strip()) for percent in os.getenv("USER_ALERT_TRAFFIC_PERCENT", "80,90,100").split(",") if percent.strip()}
+)
+USER_ALERT_DIGEST_HOUR = int(os.getenv("USER_ALERT_DIGEST_HOUR", "9"))
+
+# Поэтапный перезапуск серверов: пауза после команды перезапуска, сколько ждать
+# восстановления этапа и как часто проверять состояние серверов (секунды)
+ROLLING_RESTART_SETTLE = float(os.getenv("ROLLING_RESTART_SETTLE", "10"))
+ROLLING_RESTART_TIMEOUT = float(os.getenv("ROLLING_RESTART_TIMEOUT", "180"))
+ROLLING_RESTART_POLL_INTERVAL = float(os.getenv("ROLLING_RESTART_POLL_INTERVAL", "5"))
@@ -1,4 +1,4 @@
-from . import core, users, nodes, hosts, inbounds, bulk, stats
+import importlib
 
 __all__ = [
     "core",
@@ -9,3 +9,10 @@ __all__ = [
     "bulk",
     "stats",
 ]
+
+
+def __getattr__(name):
+    # Разделы импортируются при первом обращении, а не при старте бота
+    if name in __all__:
+        return importlib.import_module(f"{__name__}.{name}")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
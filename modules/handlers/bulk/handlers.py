@@ -1,11 +1,19 @@
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
-from telegram.ext import ContextTypes
+from telegram.ext import ApplicationHandlerStop, ContextTypes
 import logging
+from datetime import datetime
 
-from modules.config import MAIN_MENU, BULK_MENU, BULK_ACTION, BULK_CONFIRM
+from modules.config import MAIN_MENU, BULK_MENU, BULK_ACTION, BULK_CONFIRM, BULK_CHUNK_SIZE
 from modules.api.bulk import BulkAPI
 from modules.api.users import UserAPI
+from modules.localization import localize_markup, localize_text
+from modules.utils.auth import INSUFFICIENT_PERMISSIONS_MESSAGE, is_admin_user
+from modules.utils.bulk_jobs import CANCEL_JOB_PREFIX, BulkJob, bulk_jobs, cancel_job_keyboard
+from modules.utils.bulk_update import TRAFFIC_STRATEGIES, UPDATE_FIELDS, UpdatePlan
+from modules.utils.formatters import escape_markdown, format_bytes
+from modules.utils.user_filter import FilterError, get_user_index, peek_status_index
 from modules.utils.selection_helpers import SelectionHelper
+from modules.utils.metrics import timed_handler
 from modules.handlers.core.start import show_main_menu
 
 logger = logging.getLogger(__name__)
@@ -17,6 +25,7 @@ async def show_bulk_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
         [InlineKeyboardButton("❌ Удалить неактивных", callback_data="bulk_delete_inactive")],
         [InlineKeyboardButton("❌ Удалить истекших", callback_data="bulk_delete_expired")],
         [InlineKeyboardButton("🔄 Массовое обновление", callback_data="bulk_update_all")],
+        [InlineKeyboardButton("🔎 Выборка по фильтру", callback_data="bulk_filter")],
         [InlineKeyboardButton("🔙 Назад в главное меню", callback_data="back_to_main")]
     ]
     reply_markup = InlineKeyboardMarkup(keyboard)
@@ -32,6 +41,66 @@ async def show_bulk_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
     )
     return BULK_MENU
 
+async def format_delete_preview(status: str) -> tuple:
+    """Пробный прогон без загрузки полного списка: (число затронутых или None, текст, число взято из живой статистики).
+
+    Число берется из статистики панели, а трафик и примеры — из снимка пользователей
+    в кэше (только полного), если он есть.
+    """
+    from modules.api.system import SystemAPI
+    stats = await SystemAPI.get_stats()
+    status_counts = (stats or {}).get("users", {}).get("statusCounts") or {}
+    index = peek_status_index()
+    entry = index.get(status) if index is not None else None
+
+    live = status in status_counts
+    if live:
+        count = status_counts[status]
+        message = f"👥 Будет удалено: *{count}* (по статистике панели)\n"
+    elif entry is not None:
+        count = entry["count"]
+        message = f"👥 Будет удалено: *{count}* (по кэшу)\n"
+    else:
+        count = None
+        message = "❔ Не удалось оценить число затронутых пользователей.\n"
+
+    if entry is not None and entry["count"]:
+        message += f"📈 Использованный трафик: {format_bytes(entry['used'])}\n"
+        if entry["lifetime"]:
+            message += f"📦 Трафик за все время: {format_bytes(entry['lifetime'])}\n"
+        message += "\n*Примеры:*\n"
+        for username in entry["sample"]:
+            message += f"• {escape_markdown(username)}\n"
+        if entry["count"] > len(entry["sample"]):
+            message += f"…и еще {entry['count'] - len(entry['sample'])}\n"
+    if entry is not None:
+        snapshot = datetime.fromtimestamp(index.snapshot_time).strftime("%H:%M:%S")
+        message += f"\n🕒 По данным кэша на {snapshot}\n"
+    elif count:
+        message += "Трафик и примеры появятся, когда список пользователей будет загружен.\n"
+    # Панель удаляет по статусу в момент подтверждения, а не по этой оценке
+    message += "⚠️ Удаление идет по текущему статусу в панели, итог может отличаться от оценки."
+    return count, message, live
+
+
+async def confirm_delete_by_status(update: Update, status: str, question: str, confirm_button: InlineKeyboardButton):
+    """Экран подтверждения с пробным прогоном удаления по статусу"""
+    count, preview, live = await format_delete_preview(status)
+    keyboard = [[confirm_button, InlineKeyboardButton("❌ Отмена", callback_data="back_to_bulk")]]
+    # Кнопку убираем только по живой статистике: ноль из кэша мог устареть
+    if count == 0 and live:
+        keyboard = [[InlineKeyboardButton("🔙 Назад", callback_data="back_to_bulk")]]
+        question = "✅ Пользователей с таким статусом нет — удалять нечего."
+
+    await update.callback_query.edit_message_text(
+        f"{question}\n\n{preview}",
+        reply_markup=InlineKeyboardMarkup(keyboard),
+        parse_mode="Markdown"
+    )
+    return BULK_CONFIRM
+
+
+@timed_handler
 async def handle_bulk_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle bulk operations menu selection"""
     query = update.callback_query
@@ -57,46 +126,27 @@ async def handle_bulk_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return BULK_CONFIRM
 
     elif data == "bulk_delete_inactive":
-        # Confirm delete inactive
-        keyboard = [
-            [
-                InlineKeyboardButton("✅ Да, удалить неактивных", callback_data="confirm_delete_inactive"),
-                InlineKeyboardButton("❌ Отмена", callback_data="back_to_bulk")
-            ]
-        ]
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        
-        await query.edit_message_text(
+        return await confirm_delete_by_status(
+            update,
+            "DISABLED",
             "⚠️ Вы уверены, что хотите удалить ВСЕХ неактивных пользователей?",
-            reply_markup=reply_markup,
-            parse_mode="Markdown"
+            InlineKeyboardButton("✅ Да, удалить неактивных", callback_data="confirm_delete_inactive"),
         )
-        return BULK_CONFIRM
 
     elif data == "bulk_delete_expired":
-        # Confirm delete expired
-        keyboard = [
-            [
-                InlineKeyboardButton("✅ Да, удалить истекших", callback_data="confirm_delete_expired"),
-                InlineKeyboardButton("❌ Отмена", callback_data="back_to_bulk")
-            ]
-        ]
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        
-        await query.edit_message_text(
+        return await confirm_delete_by_status(
+            update,
+            "EXPIRED",
             "⚠️ Вы уверены, что хотите удалить ВСЕХ пользователей с истекшим сроком?",
-            reply_markup=reply_markup,
-            parse_mode="Markdown"
+            InlineKeyboardButton("✅ Да, удалить истекших", callback_data="confirm_delete_expired"),
         )
-        return BULK_CONFIRM
 
     elif data == "bulk_update_all":
-        # TODO: Implement bulk update all
-        await query.edit_message_text(
-            "🚧 Функция массового обновления находится в разработке.",
-            parse_mode="Markdown"
-        )
-        return BULK_MENU
+        context.user_data["bulk_update"] = {"targets": {}, "awaiting": None}
+        return await show_update_wizard(update, context)
+
+    elif data == "bulk_filter":
+        return await show_filter_prompt(update, context)
 
     elif data == "back_to_bulk":
         await show_bulk_menu(update, context)
@@ -108,6 +158,36 @@ async def handle_bulk_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     return BULK_MENU
 
+async def _start_job(update: Update, context: ContextTypes.DEFAULT_TYPE, operation: str, params: dict = None, uuids=None,
+                     diff: dict = None):
+    """Поставить массовую задачу в очередь; прогресс идет отдельным сообщением с кнопкой отмены"""
+    query = update.callback_query
+    chat_id = update.effective_chat.id
+    user_id = update.effective_user.id
+
+    progress_message = await context.bot.send_message(
+        chat_id=chat_id,
+        text=localize_text(context, "⏳ Задача поставлена в очередь..."),
+    )
+    job = BulkJob(operation, chat_id, progress_message.message_id, user_id=user_id, uuids=uuids, params=params, diff=diff)
+    await context.bot.edit_message_reply_markup(
+        chat_id=chat_id,
+        message_id=progress_message.message_id,
+        reply_markup=localize_markup(context, cancel_job_keyboard(job.id)),
+    )
+    await bulk_jobs.enqueue(job)
+
+    keyboard = [[InlineKeyboardButton("🔙 Назад", callback_data="back_to_bulk")]]
+    await query.edit_message_text(
+        f"📋 Задача `{job.id}` поставлена в очередь: {job.title}\n\n"
+        "Прогресс отображается в отдельном сообщении, задачу можно отменить.",
+        reply_markup=InlineKeyboardMarkup(keyboard),
+        parse_mode="Markdown"
+    )
+    return job
+
+
+@timed_handler
 async def handle_bulk_confirm(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle bulk operation confirmation"""
     query = update.callback_query
@@ -116,63 +196,15 @@ async def handle_bulk_confirm(update: Update, context: ContextTypes.DEFAULT_TYPE
     data = query.data
 
     if data == "confirm_reset_all_traffic":
-        # Reset all users traffic
-        result = await BulkAPI.bulk_reset_all_users_traffic()
-        
-        if result:
-            message = "✅ Трафик успешно сброшен у всех пользователей."
-        else:
-            message = "❌ Ошибка при сбросе трафика."
-        
-        # Add back button
-        keyboard = [[InlineKeyboardButton("🔙 Назад", callback_data="back_to_bulk")]]
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        
-        await query.edit_message_text(
-            message,
-            reply_markup=reply_markup,
-            parse_mode="Markdown"
-        )
+        await _start_job(update, context, "reset_all_traffic")
         return BULK_MENU
 
     elif data == "confirm_delete_inactive":
-        # Delete all inactive users
-        result = await BulkAPI.bulk_delete_users_by_status("DISABLED")
-        
-        if result:
-            message = f"✅ Успешно удалено {result.get('deletedCount', 0)} неактивных пользователей."
-        else:
-            message = "❌ Ошибка при удалении пользователей."
-        
-        # Add back button
-        keyboard = [[InlineKeyboardButton("🔙 Назад", callback_data="back_to_bulk")]]
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        
-        await query.edit_message_text(
-            message,
-            reply_markup=reply_markup,
-            parse_mode="Markdown"
-        )
+        await _start_job(update, context, "delete_by_status", {"status": "DISABLED"})
         return BULK_MENU
 
     elif data == "confirm_delete_expired":
-        # Delete all expired users
-        result = await BulkAPI.bulk_delete_users_by_status("EXPIRED")
-        
-        if result:
-            message = f"✅ Успешно удалено {result.get('deletedCount', 0)} пользователей с истекшим сроком."
-        else:
-            message = "❌ Ошибка при удалении пользователей."
-        
-        # Add back button
-        keyboard = [[InlineKeyboardButton("🔙 Назад", callback_data="back_to_bulk")]]
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        
-        await query.edit_message_text(
-            message,
-            reply_markup=reply_markup,
-            parse_mode="Markdown"
-        )
+        await _start_job(update, context, "delete_by_status", {"status": "EXPIRED"})
         return BULK_MENU
 
     elif data == "back_to_bulk":
@@ -182,3 +214,385 @@ async def handle_bulk_confirm(update: Update, context: ContextTypes.DEFAULT_TYPE
     return BULK_MENU
 
 
+async def handle_cancel_job(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Кнопка отмены фоновой задачи; работает вне диалога, поэтому останавливает обработку"""
+    query = update.callback_query
+    if not is_admin_user(update.effective_user.id):
+        await query.answer(INSUFFICIENT_PERMISSIONS_MESSAGE, show_alert=True)
+        raise ApplicationHandlerStop
+
+    job_id = query.data[len(CANCEL_JOB_PREFIX):]
+    job = bulk_jobs.cancel(job_id)
+    if job:
+        logger.info(f"Bulk job {job_id} cancellation requested by {update.effective_user.id}")
+        await query.answer("⏹ Отмена запрошена, задача остановится после текущих пачек")
+    else:
+        await query.answer("Задача уже завершена", show_alert=True)
+    raise ApplicationHandlerStop
+
+
+# Действия над выборкой по фильтру: операция BulkExecutor -> подпись кнопки
+FILTER_ACTIONS = {
+    "disable": "⛔ Отключить",
+    "enable": "✅ Включить",
+    "revoke": "🔐 Отозвать подписки",
+    "reset_traffic": "🔄 Сбросить трафик",
+}
+FILTER_SAMPLE_SIZE = 10
+
+FILTER_HELP = (
+    "🔎 *Выборка по фильтру*\n\n"
+    "Отправьте выражение, например:\n"
+    "`tag = TRIAL and expire < now+3d and used_pct > 90`\n\n"
+    "*Поля:* status, tag, username, email, description, strategy, telegram\\_id, devices, "
+    "used, limit, used\\_pct, expire, created, online\n"
+    "*Операторы:* = != < <= > >= ~ (подстрока), and, or, not, скобки\n"
+    "*Значения:* 10GB, 500MB, 90%, now-7d, now+12h, 2025-01-31, none\n\n"
+    "Сначала бот покажет, сколько пользователей попадает под фильтр, и только потом предложит действие."
+)
+
+
+async def show_filter_prompt(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Попросить выражение фильтра"""
+    context.user_data.pop("bulk_filter", None)
+    context.user_data.pop("bulk_update", None)
+    keyboard = [[InlineKeyboardButton("🔙 Назад", callback_data="back_to_bulk")]]
+    await update.callback_query.edit_message_text(
+        FILTER_HELP,
+        reply_markup=InlineKeyboardMarkup(keyboard),
+        parse_mode="Markdown"
+    )
+    return BULK_ACTION
+
+
+def _quote_expression(expression: str) -> str:
+    return "`" + expression.replace("`", "'") + "`"
+
+
+def _format_filter_preview(expression: str, index, matched: list) -> str:
+    """Пробный прогон: сколько пользователей попало под фильтр и кто именно"""
+    used = index.columns["used"]
+    statuses = {}
+    for i in matched:
+        status = index.columns["status"][i].upper() or "UNKNOWN"
+        statuses[status] = statuses.get(status, 0) + 1
+
+    message = "🔎 *Результат фильтра*\n\n"
+    message += f"{_quote_expression(expression)}\n\n"
+    message += f"👥 Найдено: *{len(matched)}* из {len(index)}\n"
+    if matched:
+        message += f"📈 Использовано трафика: {format_bytes(sum(used[i] for i in matched))}\n"
+        message += "📊 По статусам: " + ", ".join(f"{status}: {count}" for status, count in sorted(statuses.items())) + "\n"
+        message += "\n*Примеры:*\n"
+        for i in matched[:FILTER_SAMPLE_SIZE]:
+            message += f"• {escape_markdown(index.users[i].get('username') or index.uuids[i])}\n"
+        if len(matched) > FILTER_SAMPLE_SIZE:
+            message += f"…и еще {len(matched) - FILTER_SAMPLE_SIZE}\n"
+    return message
+
+
+async def handle_bulk_filter_input(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Разобрать выражение и показать пробный прогон без изменений в панели"""
+    expression = update.message.text.strip()
+    back = [[InlineKeyboardButton("🔙 Назад", callback_data="back_to_bulk")]]
+
+    index = await get_user_index()
+    if index is None:
+        await update.message.reply_text(
+            "❌ Не удалось получить список пользователей.",
+            reply_markup=InlineKeyboardMarkup(back)
+        )
+        return BULK_ACTION
+
+    try:
+        matched = index.select(expression)
+    except FilterError as e:
+        await update.message.reply_text(
+            f"❌ {e}\n\nИсправьте выражение и отправьте его снова.",
+            reply_markup=InlineKeyboardMarkup(back)
+        )
+        return BULK_ACTION
+
+    context.user_data["bulk_filter"] = {
+        "expression": expression,
+        "uuids": [index.uuids[i] for i in matched],
+    }
+
+    keyboard = []
+    if matched:
+        keyboard.append([InlineKeyboardButton(FILTER_ACTIONS["disable"], callback_data="bulk_filter_op_disable"),
+                         InlineKeyboardButton(FILTER_ACTIONS["enable"], callback_data="bulk_filter_op_enable")])
+        keyboard.append([InlineKeyboardButton(FILTER_ACTIONS["revoke"], callback_data="bulk_filter_op_revoke"),
+                         InlineKeyboardButton(FILTER_ACTIONS["reset_traffic"], callback_data="bulk_filter_op_reset_traffic")])
+    keyboard.append([InlineKeyboardButton("✏️ Изменить фильтр", callback_data="bulk_filter")])
+    keyboard.append([InlineKeyboardButton("🔙 Назад", callback_data="back_to_bulk")])
+
+    await update.message.reply_text(
+        _format_filter_preview(expression, index, matched),
+        reply_markup=InlineKeyboardMarkup(keyboard),
+        parse_mode="Markdown"
+    )
+    return BULK_ACTION
+
+
+@timed_handler
+async def handle_bulk_filter_action(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Подтверждение и запуск действия над выборкой"""
+    query = update.callback_query
+    await query.answer()
+    data = query.data
+    selection = context.user_data.get("bulk_filter")
+
+    if data == "bulk_filter":
+        return await show_filter_prompt(update, context)
+
+    if data == "back_to_bulk":
+        context.user_data.pop("bulk_filter", None)
+        context.user_data.pop("bulk_update", None)
+        await show_bulk_menu(update, context)
+        return BULK_MENU
+
+    if not selection or not selection["uuids"]:
+        return await show_filter_prompt(update, context)
+
+    if data.startswith("bulk_filter_op_"):
+        operation = data[len("bulk_filter_op_"):]
+        if operation not in FILTER_ACTIONS:
+            return BULK_ACTION
+        keyboard = [
+            [
+                InlineKeyboardButton("✅ Да, выполнить", callback_data=f"bulk_filter_run_{operation}"),
+                InlineKeyboardButton("❌ Отмена", callback_data="back_to_bulk")
+            ]
+        ]
+        await query.edit_message_text(
+            f"⚠️ {FILTER_ACTIONS[operation]}: *{len(selection['uuids'])}* пользователей?\n\n"
+            f"{_quote_expression(selection['expression'])}",
+            reply_markup=InlineKeyboardMarkup(keyboard),
+            parse_mode="Markdown"
+        )
+        return BULK_ACTION
+
+    if data.startswith("bulk_filter_run_"):
+        operation = data[len("bulk_filter_run_"):]
+        if operation not in FILTER_ACTIONS:
+            return BULK_ACTION
+        context.user_data.pop("bulk_filter", None)
+        # Выполняем над теми UUID, которые админ видел в пробном прогоне
+        await _start_job(update, context, operation, uuids=selection["uuids"])
+        return BULK_MENU
+
+    return BULK_ACTION
+
+
+# Мастер массового обновления: поле -> (подсказка для ввода, эмодзи)
+UPDATE_PROMPTS = {
+    "trafficLimitBytes": "📊 Введите лимит трафика в ГБ (0 — без ограничений):",
+    "expireShiftDays": "📅 Введите сдвиг срока в днях, например 30 или -7:",
+    "hwidDeviceLimit": "📱 Введите лимит устройств (0 — без ограничений):",
+}
+
+
+def _format_update_target(field: str, value) -> str:
+    if field == "trafficLimitBytes":
+        return format_bytes(value) if value else "без ограничений"
+    if field == "expireShiftDays":
+        return f"{value:+d} дн."
+    return str(value)
+
+
+def _update_wizard_state(context: ContextTypes.DEFAULT_TYPE) -> dict:
+    return context.user_data.setdefault("bulk_update", {"targets": {}, "awaiting": None})
+
+
+async def _send_or_edit(update: Update, text: str, keyboard: list):
+    """Ответить на текстовый ввод новым сообщением, на кнопку — правкой"""
+    if update.callback_query:
+        await update.callback_query.edit_message_text(text, reply_markup=InlineKeyboardMarkup(keyboard), parse_mode="Markdown")
+    else:
+        await update.message.reply_text(text, reply_markup=InlineKeyboardMarkup(keyboard), parse_mode="Markdown")
+
+
+async def show_update_wizard(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Выбор полей для массового обновления"""
+    state = _update_wizard_state(context)
+    state["awaiting"] = None
+    targets = state["targets"]
+
+    message = "🔄 *Массовое обновление*\n\n"
+    message += "Выберите поля и значения. Изменения применяются только к пользователям, у которых значение отличается.\n\n"
+    if targets:
+        for field, value in targets.items():
+            message += f"• {UPDATE_FIELDS[field]}: *{_format_update_target(field, value)}*\n"
+    else:
+        message += "_Поля не выбраны_\n"
+
+    keyboard = [
+        [InlineKeyboardButton("📊 Лимит трафика", callback_data="bulk_upd_field_trafficLimitBytes"),
+         InlineKeyboardButton("🔁 Стратегия сброса", callback_data="bulk_upd_field_trafficLimitStrategy")],
+        [InlineKeyboardButton("📅 Сдвиг срока", callback_data="bulk_upd_field_expireShiftDays"),
+         InlineKeyboardButton("📱 Лимит устройств", callback_data="bulk_upd_field_hwidDeviceLimit")],
+    ]
+    if targets:
+        keyboard.append([InlineKeyboardButton("🧮 Рассчитать изменения", callback_data="bulk_upd_preview")])
+        keyboard.append([InlineKeyboardButton("🗑 Сбросить выбор", callback_data="bulk_upd_clear")])
+    keyboard.append([InlineKeyboardButton("🔙 Назад", callback_data="back_to_bulk")])
+
+    await _send_or_edit(update, message, keyboard)
+    return BULK_ACTION
+
+
+def _parse_update_value(field: str, text: str):
+    """Значение поля из текста; ValueError с сообщением для пользователя"""
+    text = text.strip().replace(",", ".")
+    if field == "trafficLimitBytes":
+        try:
+            gigabytes = float(text)
+        except ValueError:
+            raise ValueError("Лимит трафика должен быть числом")
+        if gigabytes < 0:
+            raise ValueError("Лимит трафика не может быть отрицательным")
+        return int(gigabytes * 1024 ** 3)
+    if field == "expireShiftDays":
+        try:
+            days = int(text)
+        except ValueError:
+            raise ValueError("Сдвиг срока должен быть целым числом дней")
+        if days == 0:
+            raise ValueError("Сдвиг срока не может быть нулевым")
+        return days
+    try:
+        devices = int(text)
+    except ValueError:
+        raise ValueError("Лимит устройств должен быть целым числом")
+    if devices < 0:
+        raise ValueError("Лимит устройств не может быть отрицательным")
+    return devices
+
+
+async def handle_bulk_update_input(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Значение поля, введенное текстом"""
+    state = _update_wizard_state(context)
+    field = state["awaiting"]
+    try:
+        state["targets"][field] = _parse_update_value(field, update.message.text)
+    except ValueError as e:
+        keyboard = [[InlineKeyboardButton("🔙 Назад", callback_data="bulk_upd_menu")]]
+        await update.message.reply_text(
+            f"❌ {e}\n\n{UPDATE_PROMPTS[field]}",
+            reply_markup=InlineKeyboardMarkup(keyboard)
+        )
+        return BULK_ACTION
+    return await show_update_wizard(update, context)
+
+
+@timed_handler
+async def handle_bulk_text_input(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Текст в состоянии BULK_ACTION: значение для мастера обновления или выражение фильтра"""
+    if context.user_data.get("bulk_update", {}).get("awaiting"):
+        return await handle_bulk_update_input(update, context)
+    return await handle_bulk_filter_input(update, context)
+
+
+def _format_update_preview(plan: UpdatePlan) -> str:
+    """Пробный прогон обновления: сколько пользователей и каких полей коснется"""
+    message = "🧮 *Расчет массового обновления*\n\n"
+    for field, value in plan.targets.items():
+        message += f"• {UPDATE_FIELDS[field]}: *{_format_update_target(field, value)}*\n"
+    message += f"\n👥 Всего пользователей: {plan.total}\n"
+    message += f"✏️ Будет изменено: *{len(plan.diff)}*\n"
+    message += f"⏭ Уже совпадает: {plan.skipped}\n"
+    if plan.changes:
+        message += "\n*Изменения по полям:*\n"
+        labels = dict(UPDATE_FIELDS, expireAt=UPDATE_FIELDS["expireShiftDays"])
+        for field, count in plan.changes.most_common():
+            message += f"• {labels.get(field, field)}: {count}\n"
+        message += f"\n📨 Запросов к панели: ~{plan.estimated_requests(BULK_CHUNK_SIZE)}\n"
+        if plan.fragmented(BULK_CHUNK_SIZE):
+            if "expireAt" in plan.changes:
+                message += "⚠️ Сдвиг срока считается от даты каждого пользователя, поэтому пачки почти не собираются: обновление пойдет по одному пользователю и займет заметно больше времени.\n"
+            else:
+                message += "⚠️ Пачки почти не собираются: обновление пойдет по одному пользователю и займет заметно больше времени.\n"
+    return message
+
+
+@timed_handler
+async def handle_bulk_update_wizard(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Кнопки мастера массового обновления"""
+    query = update.callback_query
+    await query.answer()
+    data = query.data
+    state = _update_wizard_state(context)
+
+    if data == "bulk_upd_menu":
+        return await show_update_wizard(update, context)
+
+    if data == "bulk_upd_clear":
+        state["targets"] = {}
+        state.pop("plan", None)
+        return await show_update_wizard(update, context)
+
+    if data == "bulk_upd_field_trafficLimitStrategy":
+        keyboard = [[InlineKeyboardButton(strategy, callback_data=f"bulk_upd_strategy_{strategy}")] for strategy in TRAFFIC_STRATEGIES]
+        keyboard.append([InlineKeyboardButton("🔙 Назад", callback_data="bulk_upd_menu")])
+        await query.edit_message_text("🔁 Выберите стратегию сброса трафика:", reply_markup=InlineKeyboardMarkup(keyboard))
+        return BULK_ACTION
+
+    if data.startswith("bulk_upd_strategy_"):
+        strategy = data[len("bulk_upd_strategy_"):]
+        if strategy in TRAFFIC_STRATEGIES:
+            state["targets"]["trafficLimitStrategy"] = strategy
+        return await show_update_wizard(update, context)
+
+    if data.startswith("bulk_upd_field_"):
+        field = data[len("bulk_upd_field_"):]
+        if field not in UPDATE_PROMPTS:
+            return BULK_ACTION
+        state["awaiting"] = field
+        keyboard = [[InlineKeyboardButton("🔙 Назад", callback_data="bulk_upd_menu")]]
+        await query.edit_message_text(UPDATE_PROMPTS[field], reply_markup=InlineKeyboardMarkup(keyboard))
+        return BULK_ACTION
+
+    if data == "bulk_upd_preview":
+        if not state["targets"]:
+            return await show_update_wizard(update, context)
+        # Разница считается по свежему снимку, иначе сдвиг срока опирался бы на старые даты
+        from modules.handlers.users.handlers import user_cache
+        user_cache.invalidate_all_users()
+        users = await user_cache.get_all_users()
+        if users is None:
+            await query.edit_message_text(
+                "❌ Не удалось получить список пользователей.",
+                reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("🔙 Назад", callback_data="bulk_upd_menu")]])
+            )
+            return BULK_ACTION
+
+        plan = UpdatePlan(users, state["targets"])
+        state["plan"] = plan
+        keyboard = []
+        if plan.diff:
+            keyboard.append([InlineKeyboardButton("✅ Применить", callback_data="bulk_upd_apply")])
+        keyboard.append([InlineKeyboardButton("✏️ Изменить", callback_data="bulk_upd_menu")])
+        keyboard.append([InlineKeyboardButton("🔙 Назад", callback_data="back_to_bulk")])
+        await query.edit_message_text(
+            _format_update_preview(plan),
+            reply_markup=InlineKeyboardMarkup(keyboard),
+            parse_mode="Markdown"
+        )
+        return BULK_ACTION
+
+    if data == "bulk_upd_apply":
+        plan = state.get("plan")
+        if plan is None or not plan.diff:
+            return await show_update_wizard(update, context)
+        context.user_data.pop("bulk_update", None)
+        uniform = plan.uniform_fields()
+        if uniform is not None:
+            # Все пользователи получают одни и те же поля — хватит одного users/bulk/all/update
+            await _start_job(update, context, "update_all", {"fields": uniform})
+        else:
+            await _start_job(update, context, "update_diff", {"skipped": plan.skipped},
+                             uuids=plan.ordered_uuids(), diff=plan.diff)
+        return BULK_MENU
+
+    return BULK_ACTION
@@ -14,32 +14,50 @@ from modules.config import (
     MAIN_MENU, USER_MENU, NODE_MENU, STATS_MENU, HOST_MENU, INBOUND_MENU, BULK_MENU,
     SELECTING_USER, WAITING_FOR_INPUT, CONFIRM_ACTION,
     EDIT_USER, EDIT_FIELD, EDIT_VALUE,
-    CREATE_USER, CREATE_USER_FIELD, BULK_CONFIRM, 
+    CREATE_USER, CREATE_USER_FIELD, BULK_ACTION, BULK_CONFIRM, 
     EDIT_NODE, EDIT_NODE_FIELD, EDIT_HOST, EDIT_HOST_FIELD, NODE_PORT,
     CREATE_NODE, NODE_NAME, NODE_ADDRESS, SELECT_INBOUNDS, CREATE_HOST, HOST_PROFILE, HOST_INBOUND, HOST_PARAMS,
     ADMIN_USER_IDS
 )
 from modules.utils.auth import check_authorization
+from modules.utils.metrics import track_handler_latency
 
 from modules.handlers.core.start import start
 from modules.handlers.core.menu import handle_menu_selection
-from modules.handlers.users import (
-    handle_users_menu, handle_user_selection, handle_user_action,
-    handle_action_confirmation, handle_text_input,
-    handle_edit_field_selection, handle_edit_field_value,
-    handle_create_user_input, handle_cancel_user_creation
-)
-from modules.handlers.nodes import (
-    handle_nodes_menu, handle_node_edit_menu, handle_node_field_input, handle_cancel_node_edit,
-    handle_node_creation, show_node_certificate
-)
-from modules.handlers.stats import handle_stats_menu
-from modules.handlers.hosts import (
-    handle_hosts_menu, handle_host_edit_menu, handle_host_field_input, handle_cancel_host_edit,
-    handle_host_creation_text
-)
-from modules.handlers.inbounds import handle_inbounds_menu
-from modules.handlers.bulk import handle_bulk_menu, handle_bulk_confirm
+from modules.handlers.core.lazy import lazy_handler
+
+# Обработчики разделов импортируются при первом входе в их состояние
+_USERS = "modules.handlers.users.handlers"
+_NODES = "modules.handlers.nodes.handlers"
+_HOSTS = "modules.handlers.hosts.handlers"
+_BULK = "modules.handlers.bulk.handlers"
+handle_users_menu = lazy_handler(_USERS, "handle_users_menu")
+handle_user_selection = lazy_handler(_USERS, "handle_user_selection")
+handle_user_action = lazy_handler(_USERS, "handle_user_action")
+handle_action_confirmation = lazy_handler(_USERS, "handle_action_confirmation")
+handle_text_input = lazy_handler(_USERS, "handle_text_input")
+handle_edit_field_selection = lazy_handler(_USERS, "handle_edit_field_selection")
+handle_edit_field_value = lazy_handler(_USERS, "handle_edit_field_value")
+handle_create_user_input = lazy_handler(_USERS, "handle_create_user_input")
+handle_cancel_user_creation = lazy_handler(_USERS, "handle_cancel_user_creation")
+handle_nodes_menu = lazy_handler(_NODES, "handle_nodes_menu")
+handle_node_edit_menu = lazy_handler(_NODES, "handle_node_edit_menu")
+handle_node_field_input = lazy_handler(_NODES, "handle_node_field_input")
+handle_cancel_node_edit = lazy_handler(_NODES, "handle_cancel_node_edit")
+handle_node_creation = lazy_handler(_NODES, "handle_node_creation")
+show_node_certificate = lazy_handler(_NODES, "show_node_certificate")
+handle_stats_menu = lazy_handler("modules.handlers.stats.handlers", "handle_stats_menu")
+handle_hosts_menu = lazy_handler(_HOSTS, "handle_hosts_menu")
+handle_host_edit_menu = lazy_handler(_HOSTS, "handle_host_edit_menu")
+handle_host_field_input = lazy_handler(_HOSTS, "handle_host_field_input")
+handle_cancel_host_edit = lazy_handler(_HOSTS, "handle_cancel_host_edit")
+handle_host_creation_text = lazy_handler(_HOSTS, "handle_host_creation_text")
+handle_inbounds_menu = lazy_handler("modules.handlers.inbounds.handlers", "handle_inbounds_menu")
+handle_bulk_menu = lazy_handler(_BULK, "handle_bulk_menu")
+handle_bulk_confirm = lazy_handler(_BULK, "handle_bulk_confirm")
+handle_bulk_text_input = lazy_handler(_BULK, "handle_bulk_text_input")
+handle_bulk_filter_action = lazy_handler(_BULK, "handle_bulk_filter_action")
+handle_bulk_update_wizard = lazy_handler(_BULK, "handle_bulk_update_wizard")
 
 logger = logging.getLogger(__name__)
 
@@ -62,9 +80,32 @@ async def unauthorized_handler(update: Update, context: ContextTypes.DEFAULT_TYP
     # Если пользователь авторизован, но попал в fallback, перенаправляем на главное меню
     return await start(update, context)
 
+def _handler_pattern_label(handler) -> str:
+    """Describe which updates a handler reacts to, for use as a metric label"""
+    if isinstance(handler, CallbackQueryHandler):
+        pattern = handler.pattern
+        if pattern is None:
+            return "callback:*"
+        return f"callback:{getattr(pattern, 'pattern', pattern)}"
+    if isinstance(handler, CommandHandler):
+        return "command:" + ",".join(sorted(handler.commands))
+    if isinstance(handler, MessageHandler):
+        return "message"
+    return type(handler).__name__
+
+def _instrument_handlers(conversation: ConversationHandler) -> ConversationHandler:
+    """Wrap every handler callback with latency tracking"""
+    handlers = list(conversation.entry_points) + list(conversation.fallbacks)
+    for state_handlers in conversation.states.values():
+        handlers.extend(state_handlers)
+
+    for handler in handlers:
+        handler.callback = track_handler_latency(handler.callback, _handler_pattern_label(handler))
+    return conversation
+
 def create_conversation_handler():
     """Create the main conversation handler"""
-    return ConversationHandler(
+    return _instrument_handlers(ConversationHandler(
         entry_points=[CommandHandler("start", start)],
         states={
             MAIN_MENU: [
@@ -135,6 +176,11 @@ def create_conversation_handler():
             BULK_CONFIRM: [
                 CallbackQueryHandler(handle_bulk_confirm)
             ],
+            BULK_ACTION: [
+                MessageHandler(filters.TEXT & ~filters.COMMAND, handle_bulk_text_input),
+                CallbackQueryHandler(handle_bulk_update_wizard, pattern="^bulk_upd_"),
+                CallbackQueryHandler(handle_bulk_filter_action)
+            ],
             EDIT_NODE: [
                 CallbackQueryHandler(handle_node_edit_menu),
                 CallbackQueryHandler(handle_cancel_node_edit, pattern="^cancel_edit_node_")
@@ -183,6 +229,6 @@ def create_conversation_handler():
         per_chat=True,
         per_user=True,
         per_message=False
-    )
+    ))
 
 
@@ -0,0 +1,40 @@
+import importlib
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def lazy_handler(module: str, name: str):
+    """Колбэк, который импортирует модуль обработчика при первом вызове.
+
+    Модули разделов (users — больше 3000 строк) не загружаются при старте
+    бота, а только когда пользователь впервые попадает в их состояние.
+    """
+    target = None
+
+    async def callback(*args, **kwargs):
+        nonlocal target
+        if target is None:
+            target = getattr(importlib.import_module(module), name)
+            logger.debug(f"Loaded handler {module}.{name}")
+        return await target(*args, **kwargs)
+
+    callback.__name__ = name
+    callback.__qualname__ = name
+    callback.__module__ = module
+    return callback
+
+
+def lazy_package(package: str):
+    """Модульный __getattr__ (PEP 562): имена пакета раздела берутся из его .handlers при первом обращении"""
+
+    def __getattr__(attribute: str):
+        if attribute.startswith("__"):
+            raise AttributeError(f"module {package!r} has no attribute {attribute!r}")
+        handlers = importlib.import_module(f"{package}.handlers")
+        try:
+            return getattr(handlers, attribute)
+        except AttributeError:
+            raise AttributeError(f"module {package!r} has no attribute {attribute!r}") from None
+
+    return __getattr__
@@ -6,12 +6,8 @@ from modules.config import MAIN_MENU, USER_MENU, NODE_MENU, STATS_MENU, HOST_MEN
 
 logger = logging.getLogger(__name__)
 from modules.utils.auth import check_authorization, get_user_role, is_admin_user
-from modules.handlers.users import show_users_menu, start_create_user, show_user_details
-from modules.handlers.nodes import show_nodes_menu
-from modules.handlers.stats import show_stats_menu
-from modules.handlers.hosts import show_hosts_menu
-from modules.handlers.inbounds import show_inbounds_menu, handle_inbounds_menu
-from modules.handlers.bulk import show_bulk_menu
+from modules.utils.metrics import timed_handler
+from modules.handlers.core.lazy import lazy_handler
 from modules.handlers.core.start import show_main_menu
 from modules.handlers.core.language import (
     LANGUAGE_MENU_CALLBACK,
@@ -20,6 +16,18 @@ from modules.handlers.core.language import (
     show_language_menu,
 )
 
+# Разделы загружаются, только когда их впервые открывают из главного меню
+show_users_menu = lazy_handler("modules.handlers.users.handlers", "show_users_menu")
+start_create_user = lazy_handler("modules.handlers.users.handlers", "start_create_user")
+show_user_details = lazy_handler("modules.handlers.users.handlers", "show_user_details")
+show_nodes_menu = lazy_handler("modules.handlers.nodes.handlers", "show_nodes_menu")
+show_stats_menu = lazy_handler("modules.handlers.stats.handlers", "show_stats_menu")
+show_hosts_menu = lazy_handler("modules.handlers.hosts.handlers", "show_hosts_menu")
+show_inbounds_menu = lazy_handler("modules.handlers.inbounds.handlers", "show_inbounds_menu")
+handle_inbounds_menu = lazy_handler("modules.handlers.inbounds.handlers", "handle_inbounds_menu")
+show_bulk_menu = lazy_handler("modules.handlers.bulk.handlers", "show_bulk_menu")
+
+@timed_handler
 async def handle_menu_selection(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle main menu selection"""
     # Проверяем авторизацию
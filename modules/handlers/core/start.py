@@ -11,17 +11,22 @@ from modules.utils.auth import (
     is_admin_user
 )
 from modules.api.users import UserAPI
-from modules.api.nodes import NodeAPI
 from modules.api.inbounds import InboundAPI
 from modules.handlers.core.language import LANGUAGE_MENU_CALLBACK
 from modules.localization import SUPPORTED_LANGUAGES, get_user_language
 from modules.utils.formatters import format_bytes
+from modules.utils.host_metrics import host_metrics
+from modules.utils.metrics import timed_handler
+from modules.utils.node_usage import node_usage_poller
+from modules.utils.node_metrics import node_metrics
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
 ROLE_DISPLAY = {"admin": "Администратор", "operator": "Оператор"}
 
+@timed_handler
 @check_operator_or_admin
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Start command handler"""
@@ -113,22 +118,15 @@ async def get_system_stats():
                     
                     stats_sections.append(system_stats)
                 else:
-                    # Fallback to psutil if API fails
-                    import psutil
-                    from datetime import datetime
-                    
-                    cpu_cores = psutil.cpu_count()
-                    cpu_physical_cores = psutil.cpu_count(logical=False)
-                    memory = psutil.virtual_memory()
+                    # Fallback to host metrics if API fails: psutil is sampled in a background thread
+                    host = await host_metrics.get()
                     
                     system_stats = f"🖥️ *Система*:\n"
-                    system_stats += f"  • CPU: {cpu_cores} ядер ({cpu_physical_cores} физ.)\n"
-                    system_stats += f"  • RAM: {format_bytes(memory.used)} / {format_bytes(memory.total)} ({memory.percent:.1f}%)\n"
+                    system_stats += f"  • CPU: {host['cpu_cores']} ядер ({host['cpu_physical_cores']} физ.)\n"
+                    system_stats += f"  • RAM: {format_bytes(host['memory_used'])} / {format_bytes(host['memory_total'])} ({host['memory_percent']:.1f}%)\n"
                     
                     if DASHBOARD_SHOW_UPTIME:
-                        uptime_seconds = psutil.boot_time()
-                        current_time = datetime.now().timestamp()
-                        uptime = int(current_time - uptime_seconds)
+                        uptime = int(time.time() - host['boot_time'])
                         uptime_days = uptime // (24 * 3600)
                         uptime_hours = (uptime % (24 * 3600)) // 3600
                         uptime_minutes = (uptime % 3600) // 60
@@ -188,7 +186,7 @@ async def get_system_stats():
         # Статистика узлов (если включена)
         if DASHBOARD_SHOW_NODES_COUNT:
             try:
-                nodes_response = await NodeAPI.get_all_nodes()
+                nodes_response = await node_metrics.get_nodes()
                 nodes_count = 0
                 online_nodes = 0
                 
@@ -214,7 +212,7 @@ async def get_system_stats():
         # Статистика трафика в реальном времени (если включена)
         if DASHBOARD_SHOW_TRAFFIC_STATS:
             try:
-                realtime_usage = await NodeAPI.get_nodes_realtime_usage()
+                realtime_usage = await node_usage_poller.get_realtime_usage()
                 if realtime_usage and len(realtime_usage) > 0:
                     total_download_speed = 0
                     total_upload_speed = 0
@@ -304,7 +302,7 @@ async def get_basic_system_stats():
             active_users = sum(1 for user in users if user.get('status') == 'ACTIVE')
 
         # Получаем статистику узлов
-        nodes_response = await NodeAPI.get_all_nodes()
+        nodes_response = await node_metrics.get_nodes()
         nodes_count = 0
         online_nodes = 0
         if nodes_response:
@@ -343,7 +341,7 @@ async def get_basic_system_stats():
         
         # Получаем текущую статистику трафика по серверам
         try:
-            realtime_usage = await NodeAPI.get_nodes_realtime_usage()
+            realtime_usage = await node_usage_poller.get_realtime_usage()
             if realtime_usage and len(realtime_usage) > 0:
                 # Суммируем данные по всем серверам
                 total_download_speed = 0
@@ -6,6 +6,8 @@ from modules.config import MAIN_MENU, HOST_MENU, EDIT_HOST, EDIT_HOST_FIELD, HOS
 from modules.api.config_profiles import ConfigProfileAPI
 from modules.api.hosts import HostAPI
 from modules.utils.formatters import format_host_details
+from modules.utils.message_pages import edit_paged
+from modules.utils.metrics import timed_handler
 from modules.handlers.core.start import show_main_menu
 
 logger = logging.getLogger(__name__)
@@ -28,6 +30,7 @@ async def show_hosts_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
         parse_mode="Markdown"
     )
 
+@timed_handler
 async def handle_hosts_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle hosts menu selection"""
     query = update.callback_query
@@ -180,6 +183,7 @@ async def input_host_params(update: Update, context: ContextTypes.DEFAULT_TYPE):
     context.user_data["host_create_wait_input"] = True
     return HOST_PARAMS
 
+@timed_handler
 async def handle_host_creation_text(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle text input for host creation params (remark/address/port then SNI)"""
     text = (update.message.text or "").strip()
@@ -254,33 +258,24 @@ async def list_hosts(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     message = f"🌐 *Хосты* ({len(hosts)}):\n\n"
 
+    # Each host keeps its text and its button on the same page
+    items = []
     for i, host in enumerate(hosts):
         status_emoji = "🟢" if not host["isDisabled"] else "🔴"
         
-        message += f"{i+1}. {status_emoji} *{host['remark']}*\n"
-        message += f"   🌐 Адрес: {host['address']}:{host['port']}\n"
+        block = f"{i+1}. {status_emoji} *{host['remark']}*\n"
+        block += f"   🌐 Адрес: {host['address']}:{host['port']}\n"
         inbound = host.get('inbound') or {}
         inbound_short = (inbound.get('configProfileInboundUuid') or '—')
-        message += f"   🔌 Inbound: {inbound_short[:8]}...\n\n"
-
-    # Add action buttons
-    keyboard = []
-    
-    for i, host in enumerate(hosts):
-        keyboard.append([
+        block += f"   🔌 Inbound: {inbound_short[:8]}...\n\n"
+        items.append((block, [[
             InlineKeyboardButton(f"👁️ {host['remark']}", callback_data=f"view_host_{host['uuid']}")
-        ])
+        ]]))
     
     # Add back button
-    keyboard.append([InlineKeyboardButton("🔙 Назад", callback_data="back_to_hosts")])
-
-    reply_markup = InlineKeyboardMarkup(keyboard)
+    footer = [[InlineKeyboardButton("🔙 Назад", callback_data="back_to_hosts")]]
 
-    await update.callback_query.edit_message_text(
-        text=message,
-        reply_markup=reply_markup,
-        parse_mode="Markdown"
-    )
+    await edit_paged(update, message, items, footer_rows=footer)
 
     return HOST_MENU
 
@@ -415,6 +410,7 @@ async def start_edit_host(update: Update, context: ContextTypes.DEFAULT_TYPE, uu
         )
         return HOST_MENU
 
+@timed_handler
 async def handle_host_edit_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle host edit menu selection"""
     query = update.callback_query
@@ -562,6 +558,7 @@ async def start_edit_host_field(update: Update, context: ContextTypes.DEFAULT_TY
         await update.callback_query.edit_message_text("❌ Ошибка при подготовке редактирования.")
         return EDIT_HOST
 
+@timed_handler
 async def handle_host_field_input(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle input for host field editing"""
     try:
@@ -689,6 +686,7 @@ async def handle_host_field_input(update: Update, context: ContextTypes.DEFAULT_
         await update.message.reply_text("❌ Произошла ошибка при обработке ввода.")
         return EDIT_HOST
 
+@timed_handler
 async def handle_cancel_host_edit(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle canceling host edit"""
     query = update.callback_query
@@ -10,6 +10,8 @@ from modules.api.users import UserAPI
 from modules.api.nodes import NodeAPI
 from modules.utils.formatters import format_inbound_details, escape_markdown
 from modules.utils.selection_helpers import SelectionHelper
+from modules.utils.message_pages import edit_paged
+from modules.utils.metrics import timed_handler
 from modules.handlers.core.start import show_main_menu
 
 logger = logging.getLogger(__name__)
@@ -117,6 +119,7 @@ async def show_inbounds_menu(update: Update, context: ContextTypes.DEFAULT_TYPE)
             parse_mode="Markdown"
         )
 
+@timed_handler
 async def handle_inbounds_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle enhanced inbounds menu selection"""
     query = update.callback_query
@@ -698,9 +701,7 @@ async def list_inbounds(update: Update, context: ContextTypes.DEFAULT_TYPE):
             keyboard.append([InlineKeyboardButton(button_text, callback_data=callback_data)])
         
         # Add back button
-        keyboard.append([InlineKeyboardButton("🔙 Назад", callback_data=InboundConstants.CallbackData.BACK_TO_INBOUNDS)])
-        
-        reply_markup = InlineKeyboardMarkup(keyboard)
+        footer = [[InlineKeyboardButton("🔙 Назад", callback_data=InboundConstants.CallbackData.BACK_TO_INBOUNDS)]]
         
         # Create enhanced message
         message = f"🔌 *Список Inbounds* ({len(inbounds)} шт.)\n\n"
@@ -715,11 +716,8 @@ async def list_inbounds(update: Update, context: ContextTypes.DEFAULT_TYPE):
         
         message += f"Выберите Inbound для просмотра подробной информации:"
 
-        await update.callback_query.edit_message_text(
-            text=message,
-            reply_markup=reply_markup,
-            parse_mode="Markdown"
-        )
+        # Buttons beyond one page go to further pages
+        await edit_paged(update, message, [("", [row]) for row in keyboard], footer_rows=footer)
 
     except Exception as e:
         logger.error(f"Error listing inbounds: {e}")
@@ -793,9 +791,7 @@ async def list_full_inbounds(update: Update, context: ContextTypes.DEFAULT_TYPE)
             keyboard.append([InlineKeyboardButton(button_text, callback_data=callback_data)])
         
         # Add back button
-        keyboard.append([InlineKeyboardButton("🔙 Назад", callback_data=InboundConstants.CallbackData.BACK_TO_INBOUNDS)])
-        
-        reply_markup = InlineKeyboardMarkup(keyboard)
+        footer = [[InlineKeyboardButton("🔙 Назад", callback_data=InboundConstants.CallbackData.BACK_TO_INBOUNDS)]]
         
         # Create enhanced message with comprehensive statistics
         message = f"🔌 *Детальный список Inbounds* ({len(inbounds)} шт.)\n\n"
@@ -813,11 +809,8 @@ async def list_full_inbounds(update: Update, context: ContextTypes.DEFAULT_TYPE)
         
         message += f"Выберите Inbound для просмотра подробной информации:"
 
-        await update.callback_query.edit_message_text(
-            text=message,
-            reply_markup=reply_markup,
-            parse_mode="Markdown"
-        )
+        # Buttons beyond one page go to further pages
+        await edit_paged(update, message, [("", [row]) for row in keyboard], footer_rows=footer)
 
     except Exception as e:
         logger.error(f"Error listing full inbounds: {e}")
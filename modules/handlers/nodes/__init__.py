@@ -1 +1,4 @@
-from .handlers import *  # noqa: F401,F403
+from modules.handlers.core.lazy import lazy_package
+
+# Обработчики раздела загружаются при первом обращении к ним
+__getattr__ = lazy_package(__name__)
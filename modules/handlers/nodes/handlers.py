@@ -1,15 +1,22 @@
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
-from telegram.ext import ContextTypes
+from telegram.ext import ApplicationHandlerStop, ContextTypes
 import logging
 
-from modules.config import MAIN_MENU, NODE_MENU, EDIT_NODE, EDIT_NODE_FIELD, CREATE_NODE, NODE_NAME, NODE_ADDRESS, NODE_PORT, NODE_TLS, SELECT_INBOUNDS
+from modules.config import MAIN_MENU, NODE_MENU, EDIT_NODE, EDIT_NODE_FIELD, CREATE_NODE, NODE_NAME, NODE_ADDRESS, NODE_PORT, NODE_TLS, SELECT_INBOUNDS, ROLLING_RESTART_TIMEOUT
 from modules.api.nodes import NodeAPI
 from modules.api.inbounds import InboundAPI
 from modules.api.config_profiles import ConfigProfileAPI
-from modules.utils.formatters import format_node_details, format_bytes
+from modules.utils.formatters import format_node_details, format_bytes, escape_markdown, create_progress_bar
 from modules.utils.selection_helpers import SelectionHelper
 from modules.handlers.core.start import show_main_menu
 from modules.utils.auth import is_admin_user, check_admin, INSUFFICIENT_PERMISSIONS_MESSAGE
+from modules.utils.metrics import timed_handler
+from modules.utils.node_usage import node_usage_poller, sparkline
+from modules.utils.node_history import HISTORY_PERIODS, node_history
+from modules.utils.node_metrics import node_metrics
+from modules.utils.charts import chart_cache, render_bar_chart
+from modules.localization import resolve_language, translate_text
+from modules.utils.rolling_restart import CANCEL_ROLLING_PREFIX, RollingRestart, rolling_restarts
 
 logger = logging.getLogger(__name__)
 
@@ -29,6 +36,7 @@ async def show_nodes_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
     keyboard.append([InlineKeyboardButton("📜 Получить сертификат панели", callback_data="get_panel_certificate")])
 
     if is_admin:
+        keyboard.append([InlineKeyboardButton("🔁 Поэтапный перезапуск", callback_data="rolling_restart")])
         keyboard.append([InlineKeyboardButton("🔄 Перезапустить все серверы", callback_data="restart_all_nodes")])
 
     keyboard.append([InlineKeyboardButton("📊 Статистика использования", callback_data="nodes_usage")])
@@ -44,6 +52,7 @@ async def show_nodes_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
         parse_mode="Markdown"
     )
 
+@timed_handler
 async def handle_nodes_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle nodes menu selection"""
     query = update.callback_query
@@ -57,7 +66,7 @@ async def handle_nodes_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
         context.user_data['is_admin'] = is_admin
 
     admin_only_actions = {"add_node", "restart_all_nodes", "confirm_restart_all"}
-    admin_only_prefixes = ("enable_node_", "disable_node_", "restart_node_", "edit_node_")
+    admin_only_prefixes = ("enable_node_", "disable_node_", "restart_node_", "edit_node_", "rolling_")
     if not is_admin and (data in admin_only_actions or data.startswith(admin_only_prefixes)):
         await query.answer(INSUFFICIENT_PERMISSIONS_MESSAGE, show_alert=True)
         return NODE_MENU
@@ -94,6 +103,7 @@ async def handle_nodes_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
     elif data == "confirm_restart_all":
         # Restart all nodes
         result = await NodeAPI.restart_all_nodes()
+        node_metrics.invalidate()
         
         if result and result.get("eventSent"):
             message = "✅ Команда на перезапуск всех серверов успешно отправлена."
@@ -115,6 +125,9 @@ async def handle_nodes_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await show_nodes_usage(update, context)
         return NODE_MENU
 
+    elif data.startswith("rolling_"):
+        return await handle_rolling_restart(update, context)
+
     elif data == "back_to_nodes":
         await show_nodes_menu(update, context)
         return NODE_MENU
@@ -156,6 +169,17 @@ async def handle_nodes_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
         uuid = data.split("_")[2]
         await show_node_stats(update, context, uuid)
         return NODE_MENU
+    elif data.startswith("node_period_"):
+        _, _, days, uuid = data.split("_", 3)
+        await show_node_stats(update, context, uuid, int(days))
+        return NODE_MENU
+    elif data.startswith("node_chart_"):
+        _, _, days, uuid = data.split("_", 3)
+        await send_node_chart(update, context, uuid, int(days))
+        return NODE_MENU
+    elif data.startswith("nodes_compare_"):
+        await show_nodes_compare(update, context, int(data.split("_")[2]))
+        return NODE_MENU
     elif data.startswith("edit_node_"):
         uuid = data.split("_")[2]
         await start_edit_node(update, context, uuid)
@@ -223,7 +247,7 @@ async def list_nodes(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 async def show_node_details(update: Update, context: ContextTypes.DEFAULT_TYPE, uuid):
     """Show node details"""
-    node = await NodeAPI.get_node_by_uuid(uuid)
+    node = await node_metrics.get_node(uuid)
     
     if not node:
         keyboard = [[InlineKeyboardButton("🔙 Назад", callback_data="back_to_nodes")]]
@@ -260,12 +284,25 @@ async def show_node_details(update: Update, context: ContextTypes.DEFAULT_TYPE,
     
     return NODE_MENU
 
+def format_speed_history(node_uuid: str, indent: str = "") -> str:
+    """Мин/сред/макс скорости и спарклайн из истории фонового опроса"""
+    summary = node_usage_poller.summary(node_uuid)
+    if not summary or summary["samples"] < 2:
+        return ""
+    minutes = max(1, round(summary["span"] / 60))
+    message = (
+        f"{indent}📈 За {minutes} мин: мин {format_bytes(summary['min'])}/с, "
+        f"сред {format_bytes(summary['avg'])}/с, макс {format_bytes(summary['max'])}/с\n"
+    )
+    message += f"{indent}`{summary['sparkline']}`\n"
+    return message
+
 async def show_nodes_usage(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Show nodes usage statistics"""
     logger.info("Requesting nodes realtime usage statistics")
     
-    # Get realtime usage
-    usage = await NodeAPI.get_nodes_realtime_usage()
+    # Последний срез фонового опроса; без опроса — запрос к панели
+    usage = await node_usage_poller.get_realtime_usage()
     
     logger.info(f"Nodes realtime usage API response: {usage}")
     
@@ -298,11 +335,14 @@ async def show_nodes_usage(update: Update, context: ContextTypes.DEFAULT_TYPE):
         message += f"{i+1}. *{node_name}* ({country_code})\n"
         message += f"   📥 Загрузка: {format_bytes(download_bytes)} ({format_bytes(download_speed)}/с)\n"
         message += f"   📤 Выгрузка: {format_bytes(upload_bytes)} ({format_bytes(upload_speed)}/с)\n"
-        message += f"   📊 Всего: {format_bytes(total_bytes)} ({format_bytes(total_speed)}/с)\n\n"
+        message += f"   📊 Всего: {format_bytes(total_bytes)} ({format_bytes(total_speed)}/с)\n"
+        message += format_speed_history(node.get("nodeUuid"), "   ")
+        message += "\n"
     
     # Add action buttons
     keyboard = [
         [InlineKeyboardButton("🔄 Обновить", callback_data="nodes_usage")],
+        [InlineKeyboardButton("⚖️ Сравнить серверы", callback_data="nodes_compare_7")],
         [InlineKeyboardButton("🔙 Назад", callback_data="back_to_nodes")]
     ]
     
@@ -323,6 +363,7 @@ async def enable_node(update: Update, context: ContextTypes.DEFAULT_TYPE, uuid):
     
     try:
         result = await NodeAPI.enable_node(uuid)
+        node_metrics.invalidate()
         logger.info(f"Enable node API result: {result}")
         
         # Проверяем различные варианты успешного ответа
@@ -365,6 +406,7 @@ async def disable_node(update: Update, context: ContextTypes.DEFAULT_TYPE, uuid)
     
     try:
         result = await NodeAPI.disable_node(uuid)
+        node_metrics.invalidate()
         logger.info(f"Disable node API result: {result}")
         
         # Проверяем различные варианты успешного ответа
@@ -404,6 +446,7 @@ async def disable_node(update: Update, context: ContextTypes.DEFAULT_TYPE, uuid)
 async def restart_node(update: Update, context: ContextTypes.DEFAULT_TYPE, uuid):
     """Restart node"""
     result = await NodeAPI.restart_node(uuid)
+    node_metrics.invalidate()
     
     if result and result.get("eventSent"):
         message = "✅ Команда на перезапуск сервера успешно отправлена."
@@ -421,13 +464,217 @@ async def restart_node(update: Update, context: ContextTypes.DEFAULT_TYPE, uuid)
     
     return NODE_MENU
 
-async def show_node_stats(update: Update, context: ContextTypes.DEFAULT_TYPE, uuid):
+# Варианты числа серверов, перезапускаемых за один этап
+ROLLING_BATCH_SIZES = (1, 2, 3, 5)
+# При большем числе серверов выбор только по странам, чтобы клавиатура не упиралась в лимит Telegram
+ROLLING_NODE_BUTTONS_LIMIT = 40
+
+
+def _rolling_selection(context: ContextTypes.DEFAULT_TYPE) -> dict:
+    return context.user_data.setdefault("rolling_restart", {"selected": [], "batch": ROLLING_BATCH_SIZES[0]})
+
+
+async def show_rolling_restart_menu(update: Update, context: ContextTypes.DEFAULT_TYPE, nodes: list):
+    """Выбор серверов и размера этапа для поэтапного перезапуска"""
+    selection = _rolling_selection(context)
+    known = {node["uuid"] for node in nodes}
+    selected = [uuid for uuid in selection["selected"] if uuid in known]
+    selection["selected"] = selected
+    chosen = set(selected)
+
+    countries = {}
+    for node in nodes:
+        countries.setdefault(node.get("countryCode") or "??", []).append(node["uuid"])
+
+    keyboard = []
+    row = []
+    for country, uuids in sorted(countries.items()):
+        count = sum(1 for uuid in uuids if uuid in chosen)
+        row.append(InlineKeyboardButton(f"🌍 {country} ({count}/{len(uuids)})", callback_data=f"rolling_country_{country}"))
+        if len(row) == 3:
+            keyboard.append(row)
+            row = []
+    if row:
+        keyboard.append(row)
+
+    if len(nodes) <= ROLLING_NODE_BUTTONS_LIMIT:
+        row = []
+        for node in nodes:
+            mark = "☑️" if node["uuid"] in chosen else "⬜"
+            row.append(InlineKeyboardButton(f"{mark} {node['name']}", callback_data=f"rolling_toggle_{node['uuid']}"))
+            if len(row) == 2:
+                keyboard.append(row)
+                row = []
+        if row:
+            keyboard.append(row)
+
+    keyboard.append([
+        InlineKeyboardButton(f"{'• ' if size == selection['batch'] else ''}{size} за раз", callback_data=f"rolling_batch_{size}")
+        for size in ROLLING_BATCH_SIZES
+    ])
+    if selected:
+        keyboard.append([InlineKeyboardButton(f"▶️ Перезапустить выбранные ({len(selected)})", callback_data="rolling_confirm")])
+        keyboard.append([InlineKeyboardButton("✖️ Сбросить выбор", callback_data="rolling_clear")])
+    keyboard.append([InlineKeyboardButton("🔙 Назад", callback_data="back_to_nodes")])
+
+    message = "🔁 *Поэтапный перезапуск*\n\n"
+    message += "Выберите серверы или страну целиком. Серверы перезапускаются по несколько за раз; "
+    message += "следующий этап начинается, когда предыдущие снова подключены и Xray запущен.\n\n"
+    message += f"Выбрано серверов: {len(selected)}/{len(nodes)}\n"
+    message += f"За раз: {selection['batch']}"
+
+    await update.callback_query.edit_message_text(
+        text=message,
+        reply_markup=InlineKeyboardMarkup(keyboard),
+        parse_mode="Markdown"
+    )
+    return NODE_MENU
+
+
+async def handle_rolling_restart(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Кнопки поэтапного перезапуска: выбор серверов, размер этапа, подтверждение и запуск"""
+    query = update.callback_query
+    data = query.data
+    selection = _rolling_selection(context)
+
+    nodes = await node_metrics.get_nodes()
+    if not nodes:
+        keyboard = [[InlineKeyboardButton("🔙 Назад", callback_data="back_to_nodes")]]
+        await query.edit_message_text(
+            "❌ Серверы не найдены или ошибка при получении списка.",
+            reply_markup=InlineKeyboardMarkup(keyboard)
+        )
+        return NODE_MENU
+
+    if data.startswith("rolling_toggle_"):
+        uuid = data[len("rolling_toggle_"):]
+        if uuid in selection["selected"]:
+            selection["selected"].remove(uuid)
+        else:
+            selection["selected"].append(uuid)
+
+    elif data.startswith("rolling_country_"):
+        country = data[len("rolling_country_"):]
+        uuids = [node["uuid"] for node in nodes if (node.get("countryCode") or "??") == country]
+        if all(uuid in selection["selected"] for uuid in uuids):
+            selection["selected"] = [uuid for uuid in selection["selected"] if uuid not in uuids]
+        else:
+            selection["selected"] += [uuid for uuid in uuids if uuid not in selection["selected"]]
+
+    elif data.startswith("rolling_batch_"):
+        selection["batch"] = int(data[len("rolling_batch_"):])
+
+    elif data == "rolling_clear":
+        selection["selected"] = []
+
+    elif data == "rolling_confirm" and selection["selected"]:
+        count = len(selection["selected"])
+        batches = -(-count // selection["batch"])
+        keyboard = [
+            [InlineKeyboardButton("✅ Запустить", callback_data="rolling_start")],
+            [InlineKeyboardButton("🔙 Назад", callback_data="rolling_restart")]
+        ]
+        await query.edit_message_text(
+            f"⚠️ Поэтапный перезапуск серверов: {count}\n"
+            f"За раз: {selection['batch']}, этапов: {batches}\n\n"
+            f"Таймаут этапа: {int(ROLLING_RESTART_TIMEOUT)} сек — если серверы не восстановятся, остальные перезапущены не будут.",
+            reply_markup=InlineKeyboardMarkup(keyboard)
+        )
+        return NODE_MENU
+
+    elif data == "rolling_start" and selection["selected"]:
+        chosen = set(selection["selected"])
+        targets = [node for node in nodes if node["uuid"] in chosen]
+        if rolling_restarts.busy(chosen):
+            keyboard = [[InlineKeyboardButton("🔙 Назад", callback_data="rolling_restart")]]
+            await query.edit_message_text(
+                "⚠️ Часть выбранных серверов уже перезапускается, дождитесь окончания.",
+                reply_markup=InlineKeyboardMarkup(keyboard)
+            )
+            return NODE_MENU
+        restart = RollingRestart(
+            targets,
+            selection["batch"],
+            chat_id=update.effective_chat.id,
+            message_id=query.message.message_id,
+            user_id=update.effective_user.id,
+        )
+        logger.info(f"Rolling restart {restart.id} started by {update.effective_user.id}")
+        context.user_data.pop("rolling_restart", None)
+        rolling_restarts.start(context.bot, restart)
+        return NODE_MENU
+
+    return await show_rolling_restart_menu(update, context, nodes)
+
+
+async def handle_cancel_rolling_restart(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Кнопка остановки поэтапного перезапуска; работает вне диалога, поэтому останавливает обработку"""
+    query = update.callback_query
+    if not is_admin_user(update.effective_user.id):
+        await query.answer(INSUFFICIENT_PERMISSIONS_MESSAGE, show_alert=True)
+        raise ApplicationHandlerStop
+
+    restart = rolling_restarts.cancel(query.data[len(CANCEL_ROLLING_PREFIX):])
+    if restart:
+        logger.info(f"Rolling restart {restart.id} cancellation requested by {update.effective_user.id}")
+        await query.answer("⏹ Остановка запрошена, новые серверы перезапускаться не будут")
+    else:
+        await query.answer("Перезапуск уже завершен", show_alert=True)
+    raise ApplicationHandlerStop
+
+
+# Сколько последних дней перечислять построчно на экране статистики сервера
+HISTORY_DAYS_LISTED = 7
+
+
+def _history_period_row(current: int, callback_template: str) -> list:
+    """Кнопки периодов истории; callback_template содержит {days}"""
+    return [
+        InlineKeyboardButton(f"{'• ' if days == current else ''}{days} дней", callback_data=callback_template.format(days=days))
+        for days in HISTORY_PERIODS
+    ]
+
+
+async def show_nodes_compare(update: Update, context: ContextTypes.DEFAULT_TYPE, days: int = 7):
+    """Сравнение серверов по трафику за период из кэша истории"""
+    totals = await node_history.totals(days)
+    snapshot = await node_metrics.get()
+    names = dict(node_history.names)
+    if snapshot:
+        names.update({uuid: node.get("name") for uuid, node in snapshot.by_uuid.items()})
+
+    ranked = sorted(((row[0], uuid) for uuid, row in totals.items() if row[0] > 0), reverse=True)
+    message = f"⚖️ *Сравнение серверов за {days} дней*\n\n"
+    if not ranked:
+        message += "Нет данных о трафике за период."
+    else:
+        overall = sum(total for total, _ in ranked)
+        top = ranked[0][0]
+        message += f"Суммарный трафик: {format_bytes(overall)}, в среднем за день: {format_bytes(overall / days)}\n\n"
+        for i, (total, uuid) in enumerate(ranked, 1):
+            name = escape_markdown(names.get(uuid) or uuid[:8])
+            message += f"{i}. *{name}*: {format_bytes(total)} ({total / overall * 100:.1f}%)\n"
+            message += f"   `{create_progress_bar(total / top * 100, 15)}`\n"
+
+    keyboard = [
+        _history_period_row(days, "nodes_compare_{days}"),
+        [InlineKeyboardButton("🔙 Назад", callback_data="back_to_nodes")]
+    ]
+    await update.callback_query.edit_message_text(
+        text=message,
+        reply_markup=InlineKeyboardMarkup(keyboard),
+        parse_mode="Markdown"
+    )
+    return NODE_MENU
+
+
+async def show_node_stats(update: Update, context: ContextTypes.DEFAULT_TYPE, uuid, days: int = 7):
     """Show node statistics"""
     await update.callback_query.edit_message_text("📊 Загрузка статистики сервера...")
     
     try:
-        # Получаем информацию о узле
-        node = await NodeAPI.get_node_by_uuid(uuid)
+        # Получаем информацию о узле из кэша метрик
+        node = await node_metrics.get_node(uuid)
         if not node:
             keyboard = [[InlineKeyboardButton("🔙 Назад к деталям", callback_data=f"view_node_{uuid}")]]
             reply_markup = InlineKeyboardMarkup(keyboard)
@@ -438,12 +685,8 @@ async def show_node_stats(update: Update, context: ContextTypes.DEFAULT_TYPE, uu
             )
             return NODE_MENU
         
-        # Получаем статистику за последние 7 дней
-        from datetime import datetime, timedelta
-        end_date = datetime.now().strftime("%Y-%m-%dT%H:%M:%S.000Z")
-        start_date = (datetime.now() - timedelta(days=7)).strftime("%Y-%m-%dT%H:%M:%S.000Z")
-        
-        usage_stats = await NodeAPI.get_node_usage_by_range(uuid, start_date, end_date)
+        # Суточные строки из кэша истории: закрытые дни не перезапрашиваются
+        series = await node_history.series(uuid, days)
         
         message = f"📊 *Статистика сервера {node['name']}*\n\n"
         
@@ -457,46 +700,28 @@ async def show_node_stats(update: Update, context: ContextTypes.DEFAULT_TYPE, uu
         message += f"📍 *Адрес*: {node.get('address', 'N/A')}\n\n"
         
         # Статистика использования
-        if usage_stats and len(usage_stats) > 0:
-            message += f"📈 *Статистика за последние 7 дней*:\n"
-            
-            total_usage = 0
-            daily_stats = {}
-            
-            # Группируем данные по дням
-            for entry in usage_stats:
-                date = entry.get("date", "Unknown")
-                total_bytes = entry.get("totalBytes", 0)
-                
-                # Преобразуем в число если это строка
-                if isinstance(total_bytes, str):
-                    try:
-                        total_bytes = int(total_bytes)
-                    except ValueError:
-                        total_bytes = 0
-                
-                if date not in daily_stats:
-                    daily_stats[date] = 0
-                daily_stats[date] += total_bytes
-                total_usage += total_bytes
-            
-            # Общее использование
+        totals = [row[0] for _, row in series]
+        total_usage = sum(totals)
+        if total_usage > 0:
+            message += f"📈 *Статистика за последние {days} дней*:\n"
             message += f"  • Общий трафик: {format_bytes(total_usage)}\n"
-            message += f"  • Среднее в день: {format_bytes(total_usage / 7) if total_usage > 0 else '0 B'}\n\n"
+            message += f"  • Скачано: {format_bytes(sum(row[1] for _, row in series))}\n"
+            message += f"  • Отдано: {format_bytes(sum(row[2] for _, row in series))}\n"
+            message += f"  • Среднее в день: {format_bytes(total_usage / days)}\n"
+            peak_day, peak_row = max(series, key=lambda item: item[1][0])
+            message += f"  • Пиковый день: {peak_day} ({format_bytes(peak_row[0])})\n"
+            message += f"  • По дням: `{sparkline(totals, width=30)}`\n\n"
             
-            # Детальная статистика по дням (показываем последние 5 дней)
-            if daily_stats:
-                message += f"📅 *По дням*:\n"
-                sorted_days = sorted(daily_stats.items(), reverse=True)[:5]
-                for date, bytes_used in sorted_days:
-                    formatted_date = date.split('T')[0] if 'T' in date else date
-                    message += f"  • {formatted_date}: {format_bytes(bytes_used)}\n"
+            # Последние дни подробно
+            message += f"📅 *По дням*:\n"
+            for date, row in reversed(series[-HISTORY_DAYS_LISTED:]):
+                message += f"  • {date}: {format_bytes(row[0])}\n"
         else:
-            message += f"📊 *Статистика*: Нет данных за последние 7 дней\n"
+            message += f"📊 *Статистика*: Нет данных за последние {days} дней\n"
         
         # Попробуем получить realtime статистику
         try:
-            realtime_usage = await NodeAPI.get_nodes_realtime_usage()
+            realtime_usage = await node_usage_poller.get_realtime_usage()
             if realtime_usage:
                 # Найдем данные для нашего узла
                 node_realtime = next((item for item in realtime_usage 
@@ -506,6 +731,7 @@ async def show_node_stats(update: Update, context: ContextTypes.DEFAULT_TYPE, uu
                     message += f"  • Скачивание: {format_bytes(node_realtime.get('downloadSpeedBps', 0))}/с\n"
                     message += f"  • Загрузка: {format_bytes(node_realtime.get('uploadSpeedBps', 0))}/с\n"
                     message += f"  • Общая скорость: {format_bytes(node_realtime.get('totalSpeedBps', 0))}/с\n"
+                    message += format_speed_history(uuid, "  ")
         except Exception as e:
             logger.warning(f"Could not get realtime stats: {e}")
         
@@ -514,7 +740,12 @@ async def show_node_stats(update: Update, context: ContextTypes.DEFAULT_TYPE, uu
         message = "❌ Ошибка при получении статистики сервера."
     
     keyboard = [
-        [InlineKeyboardButton("🔄 Обновить", callback_data=f"node_stats_{uuid}")],
+        _history_period_row(days, f"node_period_{{days}}_{uuid}"),
+        [
+            InlineKeyboardButton("🖼 График", callback_data=f"node_chart_{days}_{uuid}"),
+            InlineKeyboardButton("⚖️ Сравнить серверы", callback_data=f"nodes_compare_{days}"),
+        ],
+        [InlineKeyboardButton("🔄 Обновить", callback_data=f"node_period_{days}_{uuid}")],
         [InlineKeyboardButton("🔙 Назад к деталям", callback_data=f"view_node_{uuid}")]
     ]
     reply_markup = InlineKeyboardMarkup(keyboard)
@@ -527,10 +758,30 @@ async def show_node_stats(update: Update, context: ContextTypes.DEFAULT_TYPE, uu
     
     return NODE_MENU
 
+async def send_node_chart(update: Update, context: ContextTypes.DEFAULT_TYPE, uuid: str, days: int):
+    """График суточного трафика сервера отдельным фото"""
+    series = await node_history.series(uuid, days)
+    node = await node_metrics.get_node(uuid)
+    name = (node or {}).get("name") or node_history.names.get(uuid) or uuid
+    language = resolve_language(update.effective_user.id, update.effective_chat.id)
+    caption = f"📊 {name}: трафик за {days} дней\n"
+    caption += f"🟦 Скачано: {format_bytes(sum(row[1] for _, row in series))}\n"
+    caption += f"🟩 Отдано: {format_bytes(sum(row[2] for _, row in series))}"
+    await chart_cache.send(
+        update.callback_query.message,
+        ("node", uuid, days, hash(tuple(series))),
+        lambda: render_bar_chart(
+            [day for day, _ in series],
+            [[row[1] for _, row in series], [row[2] for _, row in series]],
+            highlight_last=True,
+        ),
+        translate_text(caption, language),
+    )
+
 async def handle_node_pagination(update: Update, context: ContextTypes.DEFAULT_TYPE, page: int):
     """Handle pagination for node list"""
     try:
-        nodes = await NodeAPI.get_all_nodes()
+        nodes = await node_metrics.get_nodes()
         
         if not nodes:
             keyboard = [[InlineKeyboardButton("🔙 Назад", callback_data="back_to_nodes")]]
@@ -649,6 +900,7 @@ async def start_edit_node(update: Update, context: ContextTypes.DEFAULT_TYPE, uu
         )
         return NODE_MENU
 
+@timed_handler
 async def handle_node_edit_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle node edit menu selection"""
     query = update.callback_query
@@ -756,6 +1008,7 @@ async def start_edit_node_field(update: Update, context: ContextTypes.DEFAULT_TY
         await update.callback_query.edit_message_text("❌ Ошибка при подготовке редактирования.")
         return EDIT_NODE
 
+@timed_handler
 @check_admin
 async def handle_node_field_input(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle input for node field editing"""
@@ -860,6 +1113,7 @@ async def handle_node_field_input(update: Update, context: ContextTypes.DEFAULT_
         
         # Send update to API
         result = await NodeAPI.update_node(uuid, update_data)
+        node_metrics.invalidate()
         
         if result:
             # Update stored node data
@@ -900,6 +1154,7 @@ async def handle_node_field_input(update: Update, context: ContextTypes.DEFAULT_
         await update.message.reply_text("❌ Произошла ошибка при обработке ввода.")
         return EDIT_NODE
 
+@timed_handler
 async def handle_cancel_node_edit(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle canceling node edit"""
     query = update.callback_query
@@ -960,6 +1215,7 @@ async def start_create_node(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     return CREATE_NODE
 
+@timed_handler
 @check_admin
 async def handle_node_creation(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle node creation steps"""
@@ -1242,6 +1498,7 @@ async def create_node_final(update: Update, context: ContextTypes.DEFAULT_TYPE):
         
         # Create node via API
         result = await NodeAPI.create_node(api_data)
+        node_metrics.invalidate()
         
         if result and result.get("uuid"):
             node_uuid = result["uuid"]
@@ -1315,6 +1572,7 @@ async def create_node_final(update: Update, context: ContextTypes.DEFAULT_TYPE):
         
         return NODE_MENU
 
+@timed_handler
 async def show_node_certificate(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Show node certificate for copying"""
     try:
@@ -4,8 +4,10 @@ from telegram.ext import ContextTypes
 
 from modules.config import MAIN_MENU, STATS_MENU
 from modules.api.system import SystemAPI
-from modules.api.nodes import NodeAPI
-from modules.utils.formatters import format_system_stats, format_bandwidth_stats, format_bytes, format_nodes_stats
+from modules.utils.formatters import format_system_stats, format_bandwidth_stats, format_bytes, format_nodes_stats_blocks
+from modules.utils.message_pages import edit_paged
+from modules.utils.metrics import timed_handler
+from modules.utils.node_metrics import node_metrics
 from modules.handlers.core.start import show_main_menu
 
 logger = logging.getLogger(__name__)
@@ -29,6 +31,7 @@ async def show_stats_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
         parse_mode="Markdown"
     )
 
+@timed_handler
 async def handle_stats_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle statistics menu selection"""
     query = update.callback_query
@@ -42,7 +45,7 @@ async def handle_stats_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
     elif data == "bandwidth_stats":
         return await show_bandwidth_stats(update, context)
         
-    elif data == "nodes_stats":
+    elif data in ("nodes_stats", "nodes_stats_refresh"):
         return await show_nodes_stats(update, context)
 
     elif data == "back_to_stats":
@@ -143,13 +146,13 @@ async def show_nodes_stats(update: Update, context: ContextTypes.DEFAULT_TYPE):
         logger.info("Starting nodes stats request")
         await query.edit_message_text("📊 Загрузка статистики серверов...")
         
-        # Get all nodes data for detailed statistics
-        logger.info("Calling NodeAPI.get_all_nodes()")
-        nodes_data = await NodeAPI.get_all_nodes()
-        logger.info(f"NodeAPI.get_all_nodes() returned {len(nodes_data) if nodes_data else 0} nodes")
+        # Nodes, nodes/metrics and seven-day stats in one cached batch;
+        # the refresh button bypasses the cache
+        snapshot = await node_metrics.get(force=query.data == "nodes_stats_refresh")
+        logger.info(f"Node metrics snapshot has {len(snapshot.nodes) if snapshot else 0} nodes")
         
-        if not nodes_data:
-            logger.warning("nodes_data is None or empty")
+        if not snapshot or not snapshot.nodes:
+            logger.warning("Node metrics snapshot is None or empty")
             keyboard = [[InlineKeyboardButton("🔙 Назад", callback_data="back_to_stats")]]
             reply_markup = InlineKeyboardMarkup(keyboard)
             
@@ -159,21 +162,16 @@ async def show_nodes_stats(update: Update, context: ContextTypes.DEFAULT_TYPE):
             )
             return STATS_MENU
         
-        # Format nodes statistics using the new enhanced formatter
-        message = format_nodes_stats(nodes_data)
+        # Format nodes statistics; with many nodes the message is split into pages
+        header, blocks = format_nodes_stats_blocks(snapshot.nodes, snapshot.totals)
         
         # Add refresh and back buttons
         keyboard = [
-            [InlineKeyboardButton("🔄 Обновить", callback_data="nodes_stats")],
+            [InlineKeyboardButton("🔄 Обновить", callback_data="nodes_stats_refresh")],
             [InlineKeyboardButton("🔙 Назад", callback_data="back_to_stats")]
         ]
-        reply_markup = InlineKeyboardMarkup(keyboard)
         
-        await query.edit_message_text(
-            text=message,
-            reply_markup=reply_markup,
-            parse_mode="Markdown"
-        )
+        await edit_paged(update, header, [(block, []) for block in blocks], footer_rows=keyboard)
         
         return STATS_MENU
         
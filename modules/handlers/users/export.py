@@ -0,0 +1,122 @@
+import logging
+import os
+import time
+
+from telegram import Update
+from telegram.error import BadRequest, RetryAfter
+from telegram.ext import ApplicationHandlerStop, ContextTypes
+
+from modules.api.users import UserPageError
+from modules.config import BULK_PROGRESS_INTERVAL
+from modules.localization import resolve_language, translate_text
+from modules.utils.auth import INSUFFICIENT_PERMISSIONS_MESSAGE, is_admin_user
+from modules.utils.formatters import escape_markdown, format_bytes
+from modules.utils.user_export import EXPORT_FORMATS, ExportResult, UserExport
+from modules.utils.user_filter import FilterError
+
+logger = logging.getLogger(__name__)
+
+EXPORT_USAGE = (
+    "📤 *Экспорт пользователей*\n\n"
+    "`/export users [csv|jsonl] [фильтр]`\n\n"
+    "*Примеры:*\n"
+    "`/export users`\n"
+    "`/export users jsonl status = ACTIVE`\n"
+    "`/export users csv tag = TRIAL and expire < now+7d`\n\n"
+    "Фильтр записывается так же, как в выборке по фильтру массовых операций."
+)
+
+
+def format_export_stats(result: ExportResult) -> str:
+    message = f"👥 Выгружено: {result.exported}, просмотрено: {result.scanned}\n"
+    message += f"📄 Страниц: {result.pages}\n"
+    message += f"⏱ Секунд: {result.seconds:.1f}, {result.rate:.0f} польз./с\n"
+    if result.file_bytes:
+        message += f"📦 Размер: {format_bytes(result.file_bytes)} (без сжатия {format_bytes(result.raw_bytes)})\n"
+    return message
+
+
+async def handle_export_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """/export users — выгрузка пользователей файлом; работает вне диалога, поэтому останавливает обработку"""
+    message = update.effective_message
+    if not is_admin_user(update.effective_user.id):
+        await message.reply_text(INSUFFICIENT_PERMISSIONS_MESSAGE)
+        raise ApplicationHandlerStop
+
+    args = list(context.args or [])
+    if not args or args[0].lower() != "users":
+        await message.reply_text(EXPORT_USAGE, parse_mode="Markdown")
+        raise ApplicationHandlerStop
+    args.pop(0)
+    fmt = "csv"
+    if args and args[0].lower() in EXPORT_FORMATS:
+        fmt = args.pop(0).lower()
+    expression = " ".join(args).strip() or None
+
+    try:
+        export = UserExport(fmt, expression)
+    except FilterError as e:
+        await message.reply_text(f"❌ Ошибка в фильтре: {escape_markdown(str(e))}", parse_mode="Markdown")
+        raise ApplicationHandlerStop
+
+    language = resolve_language(update.effective_user.id, update.effective_chat.id)
+    title = f"📤 *Экспорт пользователей ({fmt.upper()})*\n"
+    if expression:
+        title += f"🔎 Фильтр: `{expression.replace('`', '')}`\n"
+    status = await message.reply_text(title + "\n⏳ Загрузка...", parse_mode="Markdown")
+    next_edit = time.monotonic() + BULK_PROGRESS_INTERVAL
+
+    async def edit_status(text: str):
+        try:
+            await status.edit_text(translate_text(text, language), parse_mode="Markdown")
+        except RetryAfter:
+            pass
+        except BadRequest as e:
+            if "not modified" not in str(e).lower():
+                logger.warning(f"Failed to update export progress: {e}")
+
+    progress = None
+
+    async def on_page(result: ExportResult):
+        nonlocal next_edit, progress
+        progress = result
+        if time.monotonic() >= next_edit:
+            next_edit = time.monotonic() + BULK_PROGRESS_INTERVAL
+            await edit_status(title + "\n⏳ Загрузка...\n\n" + format_export_stats(result))
+
+    logger.info(f"User export ({fmt}, filter={expression!r}) requested by {update.effective_user.id}")
+    try:
+        result = await export.run(on_page)
+    except UserPageError as e:
+        # Частичный файл уже удален в UserExport.run: неполную выгрузку не отправляем
+        logger.error(f"User export aborted: {e}")
+        text = title + "\n❌ Панель не вернула страницу пользователей, выгрузка прервана. Файл не отправлен."
+        if progress:
+            text += "\n\n" + format_export_stats(progress)
+        await edit_status(text)
+        raise ApplicationHandlerStop
+    except Exception as e:
+        logger.error(f"User export failed: {e}", exc_info=True)
+        await edit_status(title + "\n❌ Не удалось выгрузить пользователей")
+        raise ApplicationHandlerStop
+
+    try:
+        if not result.scanned:
+            await edit_status(title + "\n❌ Панель не вернула пользователей")
+            raise ApplicationHandlerStop
+        with open(result.path, "rb") as document:
+            await context.bot.send_document(
+                chat_id=update.effective_chat.id,
+                document=document,
+                filename=result.filename,
+                caption=translate_text(f"📤 Пользователей: {result.exported}", language),
+            )
+        await edit_status(title + "\n✅ Готово\n\n" + format_export_stats(result))
+    except ApplicationHandlerStop:
+        raise
+    except Exception as e:
+        logger.error(f"Failed to send user export: {e}")
+        await edit_status(title + "\n❌ Не удалось отправить файл\n\n" + format_export_stats(result))
+    finally:
+        os.remove(result.path)
+    raise ApplicationHandlerStop
@@ -1,4 +1,5 @@
 from datetime import datetime, timedelta
+from functools import wraps
 import logging
 import random
 import string
@@ -98,9 +99,14 @@ class Messages:
     CONFIRM_ENABLE = "⚠️ Вы уверены, что хотите включить пользователя?"
     CONFIRM_RESET = "⚠️ Вы уверены, что хотите сбросить трафик пользователя?"
     CONFIRM_REVOKE = "⚠️ Вы уверены, что хотите отозвать подписку пользователя?"
-from modules.api.users import UserAPI
+from modules.api.users import UserAPI, UserPageError
 from modules.utils.formatters import format_bytes, format_user_details, format_user_details_safe, escape_markdown, safe_edit_message
 from modules.utils.selection_helpers import SelectionHelper
+from modules.utils.metrics import record_cache_lookup, timed_handler
+from modules.utils.bulk_executor import BulkExecutor, BulkProgress, bulk_operation
+from modules.utils.user_usage import USER_USAGE_DAYS, user_usage_cache
+from modules.utils.charts import chart_cache, render_bar_chart
+from modules.localization import resolve_language, translate_text
 from modules.utils.auth import (
     check_admin,
     check_authorization,
@@ -115,6 +121,7 @@ logger = logging.getLogger(__name__)
 # Декоратор для проверки авторизации
 def require_authorization(func):
     """Декоратор для проверки авторизации пользователя"""
+    @wraps(func)
     async def wrapper(update: Update, context: ContextTypes.DEFAULT_TYPE, *args, **kwargs):
         if not check_authorization(update.effective_user):
             if update.callback_query:
@@ -134,6 +141,7 @@ def require_authorization(func):
 def log_user_action(action: str):
     """Декоратор для логирования действий пользователей"""
     def decorator(func):
+        @wraps(func)
         async def wrapper(update: Update, context: ContextTypes.DEFAULT_TYPE, *args, **kwargs):
             user_id = update.effective_user.id if update.effective_user else "unknown"
             username = update.effective_user.username if update.effective_user else "unknown"
@@ -266,11 +274,14 @@ class UserCache:
             cached_data = self._cache[cache_key]
             if not self._is_expired(cached_data['timestamp']):
                 logger.debug(f"User {uuid} found in cache")
+                record_cache_lookup("user", True)
                 return cached_data['data']
             else:
                 # Удаляем устаревшие данные
                 del self._cache[cache_key]
         
+        record_cache_lookup("user", False)
+        
         # Периодически очищаем кэш (каждый 10-й запрос)
         if len(self._cache) % 10 == 0:
             self.cleanup_expired()
@@ -297,34 +308,41 @@ class UserCache:
             cached_data = self._cache[cache_key]
             if not self._is_expired(cached_data['timestamp']):
                 logger.debug("All users found in cache")
+                record_cache_lookup("all_users", True)
                 return cached_data['data']
             else:
                 del self._cache[cache_key]
         
-        # Получаем данные из API
+        record_cache_lookup("all_users", False)
+        
+        # Получаем данные из API; в кэш попадает только полный список, чтобы оценки
+        # по снимку (peek_all_users) не занижались из-за сбоя на одной из страниц
+        users = []
         try:
-            response = await UserAPI.get_all_users()
-            users = []
-            
-            if isinstance(response, dict):
-                if 'users' in response:
-                    users = response['users'] or []
-                elif 'response' in response and isinstance(response['response'], dict) and 'users' in response['response']:
-                    users = response['response']['users'] or []
-            elif isinstance(response, list):
-                users = response
-            
-            if users:
-                self._cache[cache_key] = {
-                    'data': users,
-                    'timestamp': datetime.now().timestamp()
-                }
-                logger.debug(f"Cached {len(users)} users")
-            
-            return users
+            async for page in UserAPI.iter_user_pages():
+                users.extend(page)
+        except UserPageError as e:
+            logger.error(f"Users list is incomplete, not caching it: {e}")
+            return users or None
         except Exception as e:
             logger.error(f"Error fetching all users: {e}")
             return None
+        
+        if users:
+            self._cache[cache_key] = {
+                'data': users,
+                'timestamp': datetime.now().timestamp()
+            }
+            logger.debug(f"Cached {len(users)} users")
+        
+        return users
+    
+    def peek_all_users(self) -> Optional[tuple]:
+        """Снимок всех пользователей и время его загрузки без запроса к API"""
+        cached_data = self._cache.get("all_users")
+        if cached_data and not self._is_expired(cached_data['timestamp']):
+            return cached_data['data'], cached_data['timestamp']
+        return None
     
     def invalidate_user(self, uuid: str):
         """Инвалидирует кэш конкретного пользователя"""
@@ -492,55 +510,34 @@ class BulkOperations:
     """Класс для массовых операций с пользователями"""
     
     @staticmethod
-    async def bulk_disable_users(uuids: list[str]) -> Dict[str, bool]:
+    async def _run(operation: str, uuids: list[str], progress: Optional[BulkProgress] = None,
+                   fields: Optional[dict] = None) -> Dict[str, bool]:
+        """Выполнить операцию пачками через users/bulk/* и сбросить кэш пользователей"""
+        # Изменились и карточки, и общий список — сбрасываем кэш целиком
+        executor = BulkExecutor(
+            bulk_operation(operation, fields),
+            progress=progress,
+            on_success=lambda done_uuids: user_cache.invalidate_all_users(),
+        )
+        result = await executor.run(uuids)
+        if progress:
+            await progress.finish(result)
+        return result.as_dict()
+    
+    @staticmethod
+    async def bulk_disable_users(uuids: list[str], progress: Optional[BulkProgress] = None) -> Dict[str, bool]:
         """Массовое отключение пользователей"""
-        results = {}
-        
-        for uuid in uuids:
-            try:
-                result = await UserAPI.disable_user(uuid)
-                results[uuid] = result
-                if result:
-                    user_cache.invalidate_user(uuid)
-            except Exception as e:
-                logger.error(f"Error disabling user {uuid}: {e}")
-                results[uuid] = False
-        
-        return results
+        return await BulkOperations._run("disable", uuids, progress)
     
     @staticmethod
-    async def bulk_enable_users(uuids: list[str]) -> Dict[str, bool]:
+    async def bulk_enable_users(uuids: list[str], progress: Optional[BulkProgress] = None) -> Dict[str, bool]:
         """Массовое включение пользователей"""
-        results = {}
-        
-        for uuid in uuids:
-            try:
-                result = await UserAPI.enable_user(uuid)
-                results[uuid] = result
-                if result:
-                    user_cache.invalidate_user(uuid)
-            except Exception as e:
-                logger.error(f"Error enabling user {uuid}: {e}")
-                results[uuid] = False
-        
-        return results
+        return await BulkOperations._run("enable", uuids, progress)
     
     @staticmethod
-    async def bulk_reset_traffic(uuids: list[str]) -> Dict[str, bool]:
+    async def bulk_reset_traffic(uuids: list[str], progress: Optional[BulkProgress] = None) -> Dict[str, bool]:
         """Массовый сброс трафика"""
-        results = {}
-        
-        for uuid in uuids:
-            try:
-                result = await UserAPI.reset_user_traffic(uuid)
-                results[uuid] = result
-                if result:
-                    user_cache.invalidate_user(uuid)
-            except Exception as e:
-                logger.error(f"Error resetting traffic for user {uuid}: {e}")
-                results[uuid] = False
-        
-        return results
+        return await BulkOperations._run("reset_traffic", uuids, progress)
     
     @staticmethod
     def format_bulk_results(results: Dict[str, bool], operation: str) -> str:
@@ -641,6 +638,7 @@ class DataValidators:
         except ValueError:
             return False, "Лимит устройств должен быть целым числом", 0
 
+@timed_handler
 @require_authorization
 @log_user_action("show_users_menu")
 async def show_users_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -660,6 +658,7 @@ async def show_users_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
         "Markdown"
     )
 
+@timed_handler
 @require_authorization
 @log_user_action("handle_users_menu")
 async def handle_users_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -882,6 +881,7 @@ async def send_users_page(update: Update, context: ContextTypes.DEFAULT_TYPE):
             parse_mode="Markdown"
         )
 
+@timed_handler
 async def handle_user_selection(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle user selection with improved UI"""
     # Проверяем авторизацию
@@ -1019,6 +1019,7 @@ async def show_user_details(update: Update, context: ContextTypes.DEFAULT_TYPE,
     context.user_data["current_user"] = user
     return SELECTING_USER
 
+@timed_handler
 async def handle_user_action(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle user action with improved SelectionHelper support"""
     # Проверяем авторизацию
@@ -1228,6 +1229,10 @@ async def handle_user_action(update: Update, context: ContextTypes.DEFAULT_TYPE)
         uuid = data.split("_")[1]
         return await show_user_hwid_devices(update, context, uuid)
         
+    elif data.startswith("stats_chart_"):
+        uuid = data[len("stats_chart_"):]
+        return await send_user_chart(update, context, uuid)
+        
     elif data.startswith("stats_"):
         uuid = data.split("_")[1]
         return await show_user_stats(update, context, uuid)
@@ -1240,6 +1245,7 @@ async def handle_user_action(update: Update, context: ContextTypes.DEFAULT_TYPE)
 
     return SELECTING_USER
 
+@timed_handler
 @check_admin
 async def handle_action_confirmation(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle action confirmation"""
@@ -1309,6 +1315,7 @@ async def handle_action_confirmation(update: Update, context: ContextTypes.DEFAU
 
     return SELECTING_USER
 
+@timed_handler
 async def handle_text_input(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle text input"""
     # Check if we're waiting for HWID input
@@ -2004,6 +2011,7 @@ async def ask_for_field(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     return CREATE_USER_FIELD
 
+@timed_handler
 @check_admin
 async def handle_create_user_input(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle user input when creating a user"""
@@ -2595,13 +2603,10 @@ async def show_user_stats(update: Update, context: ContextTypes.DEFAULT_TYPE, uu
     """Show user statistics"""
     user = context.user_data.get("current_user") or await UserAPI.get_user_by_uuid(uuid)
     
-    # Get usage for last 30 days
-    end_date = datetime.now().strftime("%Y-%m-%dT%H:%M:%S.000Z")
-    start_date = (datetime.now() - timedelta(days=30)).strftime("%Y-%m-%dT%H:%M:%S.000Z")
-    
-    usage = await UserAPI.get_user_usage_by_range(uuid, start_date, end_date)
+    # Usage for the last 30 days, grouped by node; closed days come from the cache
+    node_totals = await user_usage_cache.node_totals(uuid, USER_USAGE_DAYS)
     
-    if not usage:
+    if not node_totals:
         keyboard = [[InlineKeyboardButton("🔙 Назад", callback_data=f"view_{uuid}")]]
         reply_markup = InlineKeyboardMarkup(keyboard)
         
@@ -2625,33 +2630,14 @@ async def show_user_stats(update: Update, context: ContextTypes.DEFAULT_TYPE, uu
     
     message += f"  • За все время: {format_bytes(user['lifetimeUsedTrafficBytes'])}\n\n"
     
-    # Usage by node
-    if usage:
-        message += f"📊 *Использование по серверам (за 30 дней)*:\n"
-        
-        # Group by node
-        node_usage = {}
-        for entry in usage:
-            node_uuid = entry.get("nodeUuid")
-            node_name = entry.get("nodeName", "Неизвестный сервер")
-            total = entry.get("total", 0)
-            
-            if node_uuid not in node_usage:
-                node_usage[node_uuid] = {
-                    "name": node_name,
-                    "total": 0
-                }
-            
-            node_usage[node_uuid]["total"] += total
-        
-        # Sort by usage
-        sorted_nodes = sorted(node_usage.values(), key=lambda x: x["total"], reverse=True)
-        
-        for i, node in enumerate(sorted_nodes):
-            message += f"  • {escape_markdown(node['name'])}: {format_bytes(node['total'])}\n"
+    # Usage by node, already sorted by traffic
+    message += f"📊 *Использование по серверам (за 30 дней)*:\n"
+    for _, node_name, total in node_totals:
+        message += f"  • {escape_markdown(node_name)}: {format_bytes(total)}\n"
     
     # Add action buttons
     keyboard = [
+        [InlineKeyboardButton("🖼 График по дням", callback_data=f"stats_chart_{uuid}")],
         [InlineKeyboardButton("🔙 Назад к пользователю", callback_data=f"view_{uuid}")],
         [InlineKeyboardButton("🔄 Обновить статистику", callback_data=f"stats_{uuid}")]
     ]
@@ -2666,6 +2652,25 @@ async def show_user_stats(update: Update, context: ContextTypes.DEFAULT_TYPE, uu
     
     return SELECTING_USER
 
+async def send_user_chart(update: Update, context: ContextTypes.DEFAULT_TYPE, uuid):
+    """График суточного трафика пользователя отдельным фото"""
+    series = await user_usage_cache.daily(uuid, USER_USAGE_DAYS)
+    if not series:
+        await update.callback_query.message.reply_text("❌ Статистика не найдена или ошибка при получении данных.")
+        return SELECTING_USER
+    user = context.user_data.get("current_user")
+    username = user["username"] if user and user.get("uuid") == uuid else uuid
+    language = resolve_language(update.effective_user.id, update.effective_chat.id)
+    caption = f"📊 {username}: трафик за {USER_USAGE_DAYS} дней\n"
+    caption += f"📈 Всего: {format_bytes(sum(total for _, total in series))}"
+    await chart_cache.send(
+        update.callback_query.message,
+        ("user", uuid, USER_USAGE_DAYS, hash(tuple(series))),
+        lambda: render_bar_chart([day for day, _ in series], [[total for _, total in series]], highlight_last=True),
+        translate_text(caption, language),
+    )
+    return SELECTING_USER
+
 async def start_add_hwid(update: Update, context: ContextTypes.DEFAULT_TYPE, uuid):
     """Start adding a HWID device"""
     user = context.user_data.get("current_user") or await UserAPI.get_user_by_uuid(uuid)
@@ -2965,6 +2970,7 @@ async def start_edit_user(update: Update, context: ContextTypes.DEFAULT_TYPE, uu
     
     return EDIT_USER
 
+@timed_handler
 @check_admin
 async def handle_edit_field_selection(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle edit field selection"""
@@ -3092,6 +3098,7 @@ async def handle_edit_field_selection(update: Update, context: ContextTypes.DEFA
     
     return EDIT_USER
 
+@timed_handler
 @check_admin
 async def handle_edit_field_value(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle edit field value input"""
@@ -3360,6 +3367,7 @@ async def handle_edit_field_value(update: Update, context: ContextTypes.DEFAULT_
     
     return EDIT_USER
 
+@timed_handler
 @check_admin
 async def handle_cancel_user_creation(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle cancel user creation"""
@@ -0,0 +1,379 @@
+import asyncio
+import io
+import logging
+import time
+from typing import Awaitable, Callable, Dict, Hashable, Iterable, List, Optional
+
+from telegram import InlineKeyboardMarkup
+from telegram.error import BadRequest, RetryAfter
+
+from modules.api.bulk import BulkAPI
+from modules.api.users import UserAPI
+from modules.config import BULK_CHUNK_SIZE, BULK_CONCURRENCY, BULK_PROGRESS_INTERVAL
+from modules.localization import localize_markup, resolve_language, translate_text
+from modules.utils.bulk_update import UpdatePlan
+from modules.utils.formatters import create_progress_bar, escape_markdown
+from modules.utils.metrics import record_bulk_run
+
+logger = logging.getLogger(__name__)
+
+# Сколько неудачных UUID показывать в сообщении; полный список уходит файлом
+FAILED_PREVIEW_LIMIT = 10
+
+
+class BulkOperation:
+    """Массовое действие: вызов users/bulk/* для пачки и поштучный вызов для повтора.
+
+    group_key разбивает пачки так, чтобы в одной пачке были только UUID с одинаковым ключом.
+    """
+
+    def __init__(
+        self,
+        title: str,
+        chunk_call: Optional[Callable[[List[str]], Awaitable]],
+        single_call: Callable[[str], Awaitable],
+        name: str = "custom",
+        group_key: Optional[Callable[[str], Hashable]] = None,
+    ):
+        self.title = title
+        self.chunk_call = chunk_call
+        self.single_call = single_call
+        self.name = name
+        self.group_key = group_key
+
+
+def bulk_operation(name: str, fields: Optional[dict] = None, diff: Optional[Dict[str, dict]] = None) -> BulkOperation:
+    """Собрать операцию по имени: disable, enable, reset_traffic, revoke, delete, update, update_diff"""
+    if name == "disable":
+        operation = BulkOperation(
+            "Отключение пользователей",
+            lambda uuids: BulkAPI.bulk_update_users(uuids, {"status": "DISABLED"}),
+            UserAPI.disable_user,
+        )
+    elif name == "enable":
+        operation = BulkOperation(
+            "Включение пользователей",
+            lambda uuids: BulkAPI.bulk_update_users(uuids, {"status": "ACTIVE"}),
+            UserAPI.enable_user,
+        )
+    elif name == "reset_traffic":
+        operation = BulkOperation("Сброс трафика", BulkAPI.bulk_reset_user_traffic, UserAPI.reset_user_traffic)
+    elif name == "revoke":
+        operation = BulkOperation("Отзыв подписок", BulkAPI.bulk_revoke_users_subscription, UserAPI.revoke_user_subscription)
+    elif name == "delete":
+        operation = BulkOperation("Удаление пользователей", BulkAPI.bulk_delete_users, UserAPI.delete_user)
+    elif name == "update":
+        if not fields:
+            raise ValueError("bulk update requires fields")
+        operation = BulkOperation(
+            "Обновление пользователей",
+            lambda uuids: BulkAPI.bulk_update_users(uuids, fields),
+            lambda uuid: UserAPI.update_user(uuid, dict(fields)),
+        )
+    elif name == "update_diff":
+        if not diff:
+            raise ValueError("bulk diff update requires per-user fields")
+        # Пачки не смешивают группы, поэтому поля первого UUID общие для всей пачки
+        operation = BulkOperation(
+            "Обновление пользователей",
+            lambda uuids: BulkAPI.bulk_update_users(uuids, diff[uuids[0]]),
+            lambda uuid: UserAPI.update_user(uuid, dict(diff[uuid])),
+            group_key=lambda uuid: UpdatePlan.group_key(diff[uuid]),
+        )
+    else:
+        raise ValueError(f"Unknown bulk operation: {name}")
+    operation.name = name
+    return operation
+
+
+class BulkResult:
+    """Итог массовой операции по каждому UUID"""
+
+    def __init__(self, title: str, total: int):
+        self.title = title
+        self.total = total
+        self.succeeded: List[str] = []
+        self.failed: Dict[str, str] = {}
+        self.started = time.monotonic()
+        self.finished: Optional[float] = None
+        self.cancelled = False
+        # Сколько было обработано до возобновления — не учитывается в оценке скорости
+        self.resumed_from = 0
+        # Пропущены при планировании: значения уже совпадают с целевыми
+        self.skipped = 0
+        self.requests = 0
+
+    @property
+    def done(self) -> int:
+        return len(self.succeeded) + len(self.failed)
+
+    @property
+    def elapsed(self) -> float:
+        return (self.finished or time.monotonic()) - self.started
+
+    @property
+    def rate(self) -> float:
+        """Пользователей в секунду в текущем запуске"""
+        processed = self.done - self.resumed_from
+        return processed / self.elapsed if self.elapsed > 0 else 0.0
+
+    def eta(self) -> Optional[float]:
+        """Оценка оставшегося времени в секундах"""
+        processed = self.done - self.resumed_from
+        if processed <= 0 or self.done >= self.total:
+            return None
+        return self.elapsed / processed * (self.total - self.done)
+
+    def as_dict(self) -> Dict[str, bool]:
+        """Формат BulkOperations: UUID -> успех"""
+        results = {uuid: True for uuid in self.succeeded}
+        results.update({uuid: False for uuid in self.failed})
+        return results
+
+    def failure_report(self) -> str:
+        """Полный список неудачных UUID с причинами, по одному на строку"""
+        return "\n".join(f"{uuid}\t{reason}" for uuid, reason in self.failed.items())
+
+
+def _format_duration(seconds: float) -> str:
+    seconds = int(seconds)
+    if seconds < 60:
+        return f"{seconds} с"
+    minutes, seconds = divmod(seconds, 60)
+    if minutes < 60:
+        return f"{minutes} мин {seconds} с"
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours} ч {minutes} мин"
+
+
+def format_bulk_progress(result: BulkResult) -> str:
+    """Текст сообщения с прогрессом"""
+    percentage = result.done / result.total * 100 if result.total else 100
+    message = f"⏳ *{result.title}*\n\n"
+    message += f"`{create_progress_bar(percentage, 16)}` {percentage:.0f}%\n"
+    message += f"✅ Выполнено: {len(result.succeeded)}/{result.total}\n"
+    message += f"❌ Ошибок: {len(result.failed)}\n"
+    if result.done > result.resumed_from:
+        message += f"⚡ Скорость: {result.rate:.1f} польз./с\n"
+    eta = result.eta()
+    if eta is not None:
+        message += f"⏱ Осталось: ~{_format_duration(eta)}\n"
+    return message
+
+
+def format_bulk_summary(result: BulkResult) -> str:
+    """Итоговое сообщение с отчетом по неудачным UUID"""
+    if result.cancelled:
+        message = f"⏹ *{result.title}: отменено*\n\n"
+    else:
+        status = "✅" if not result.failed else "⚠️"
+        message = f"{status} *{result.title}: завершено*\n\n"
+    message += f"✅ Выполнено: {len(result.succeeded)}/{result.total}\n"
+    message += f"❌ Ошибок: {len(result.failed)}\n"
+    if result.skipped:
+        message += f"⏭ Без изменений: {result.skipped}\n"
+    if result.cancelled:
+        message += f"⏸ Не обработано: {result.total - result.done}\n"
+    message += f"⏱ Время: {_format_duration(result.elapsed)}\n"
+    if result.requests:
+        message += f"⚡ Скорость: {result.rate:.1f} польз./с, запросов к панели: {result.requests}\n"
+    if result.failed:
+        message += "\n*Неудачные UUID:*\n"
+        for uuid, reason in list(result.failed.items())[:FAILED_PREVIEW_LIMIT]:
+            message += f"• `{uuid}` — {escape_markdown(reason)}\n"
+        if len(result.failed) > FAILED_PREVIEW_LIMIT:
+            message += f"…и еще {len(result.failed) - FAILED_PREVIEW_LIMIT}, полный список в файле\n"
+    return message
+
+
+class BulkProgress:
+    """Одно сообщение с прогрессом, которое редактируется не чаще раза в interval секунд"""
+
+    def __init__(self, bot, chat_id: int, message_id: int, user_id: Optional[int] = None,
+                 interval: float = BULK_PROGRESS_INTERVAL):
+        self.bot = bot
+        self.chat_id = chat_id
+        self.message_id = message_id
+        self.language = resolve_language(user_id, chat_id)
+        self.interval = interval
+        self.reply_markup: Optional[InlineKeyboardMarkup] = None
+        self._next_edit = 0.0
+        self._editing = False
+        self._last_text = None
+
+    async def _edit(self, text: str, reply_markup: Optional[InlineKeyboardMarkup] = None):
+        text = translate_text(text, self.language)
+        if text == self._last_text and reply_markup is None:
+            return
+        try:
+            await self.bot.edit_message_text(
+                text=text,
+                chat_id=self.chat_id,
+                message_id=self.message_id,
+                reply_markup=localize_markup(None, reply_markup, self.language),
+                parse_mode="Markdown",
+            )
+            self._last_text = text
+        except RetryAfter as e:
+            self._next_edit = time.monotonic() + float(e.retry_after)
+        except BadRequest as e:
+            if "not modified" not in str(e).lower():
+                logger.warning(f"Failed to update bulk progress message: {e}")
+        except Exception as e:
+            # Сбой правки прогресса не должен прерывать саму операцию
+            logger.warning(f"Failed to update bulk progress message: {e}")
+
+    async def update(self, result: BulkResult, force: bool = False):
+        """Обновить прогресс, если прошло достаточно времени с прошлой правки"""
+        now = time.monotonic()
+        if self._editing or (not force and now < self._next_edit):
+            return
+        self._editing = True
+        self._next_edit = now + self.interval
+        try:
+            await self._edit(format_bulk_progress(result), self.reply_markup)
+        finally:
+            self._editing = False
+
+    async def finish(self, result: BulkResult, reply_markup: Optional[InlineKeyboardMarkup] = None):
+        """Показать итог и отправить полный отчет файлом, если ошибок много"""
+        await self._edit(format_bulk_summary(result), reply_markup)
+        if len(result.failed) > FAILED_PREVIEW_LIMIT:
+            await send_failure_report(self.bot, self.chat_id, result)
+
+
+async def send_failure_report(bot, chat_id: int, result: BulkResult):
+    """Отправить список неудачных UUID текстовым файлом"""
+    report = io.BytesIO(result.failure_report().encode("utf-8"))
+    try:
+        await bot.send_document(
+            chat_id=chat_id,
+            document=report,
+            filename="bulk_failures.tsv",
+            caption=translate_text(f"❌ {result.title}: {len(result.failed)} ошибок", resolve_language(None, chat_id)),
+        )
+    except Exception as e:
+        logger.error(f"Failed to send bulk failure report: {e}")
+
+
+class BulkExecutor:
+    """Выполняет массовую операцию пачками с ограниченной параллельностью"""
+
+    def __init__(
+        self,
+        operation: BulkOperation,
+        chunk_size: int = BULK_CHUNK_SIZE,
+        concurrency: int = BULK_CONCURRENCY,
+        progress: Optional[BulkProgress] = None,
+        on_success: Optional[Callable[[List[str]], None]] = None,
+        on_chunk_done: Optional[Callable[[int, BulkResult], Awaitable]] = None,
+        cancel_event: Optional[asyncio.Event] = None,
+    ):
+        self.operation = operation
+        self.chunk_size = max(1, chunk_size)
+        self.concurrency = max(1, concurrency)
+        self.progress = progress
+        self.on_success = on_success
+        self.on_chunk_done = on_chunk_done
+        self.cancel_event = cancel_event
+
+    @property
+    def cancelled(self) -> bool:
+        return self.cancel_event is not None and self.cancel_event.is_set()
+
+    def chunks(self, uuids: Iterable[str]) -> List[List[str]]:
+        """Разбить UUID на пачки; номера пачек стабильны для одного и того же списка"""
+        uuids = list(dict.fromkeys(uuids))
+        group_key = self.operation.group_key
+        if group_key is None:
+            return [uuids[i:i + self.chunk_size] for i in range(0, len(uuids), self.chunk_size)]
+
+        chunks, current, current_key = [], [], None
+        for uuid in uuids:
+            key = group_key(uuid)
+            if current and (key != current_key or len(current) >= self.chunk_size):
+                chunks.append(current)
+                current = []
+            current.append(uuid)
+            current_key = key
+        if current:
+            chunks.append(current)
+        return chunks
+
+    async def run(self, uuids: Iterable[str], result: Optional[BulkResult] = None) -> BulkResult:
+        """Выполнить операцию; result с уже обработанными пользователями позволяет продолжить прерванный запуск"""
+        chunks = self.chunks(uuids)
+        if result is None:
+            result = BulkResult(self.operation.title, sum(len(chunk) for chunk in chunks))
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        if self.progress:
+            await self.progress.update(result, force=True)
+
+        await asyncio.gather(*(
+            self._run_chunk(index, chunk, result, semaphore)
+            for index, chunk in enumerate(chunks)
+        ))
+        result.finished = time.monotonic()
+        result.cancelled = self.cancelled
+        record_bulk_run(self.operation.name, result)
+
+        logger.info(
+            f"Bulk '{self.operation.title}': {len(result.succeeded)} ok, {len(result.failed)} failed "
+            f"of {result.total} in {result.elapsed:.1f}s ({result.rate:.1f} users/s, {result.requests} requests)"
+        )
+        return result
+
+    async def _run_chunk(self, index: int, chunk: List[str], result: BulkResult, semaphore: asyncio.Semaphore):
+        if self.operation.chunk_call is not None:
+            async with semaphore:
+                if self.cancelled:
+                    return
+                result.requests += 1
+                try:
+                    response = await self.operation.chunk_call(chunk)
+                except Exception as e:
+                    logger.error(f"Bulk chunk of {len(chunk)} failed: {e}")
+                    response = None
+            if response is not None:
+                affected = response.get("affectedRows") if isinstance(response, dict) else None
+                if affected is not None and affected < len(chunk):
+                    logger.info(f"Bulk chunk affected {affected} of {len(chunk)} users")
+                await self._record(result, chunk)
+                await self._chunk_done(index, result)
+                return
+            # Пачка не прошла — повторяем поштучно, чтобы узнать, какие именно UUID сбоят
+            logger.warning(f"Bulk chunk of {len(chunk)} failed, retrying one by one")
+
+        outcomes = await asyncio.gather(*(self._run_single(uuid, result, semaphore) for uuid in chunk))
+        if all(outcomes):
+            await self._chunk_done(index, result)
+
+    async def _chunk_done(self, index: int, result: BulkResult):
+        if self.on_chunk_done:
+            await self.on_chunk_done(index, result)
+
+    async def _run_single(self, uuid: str, result: BulkResult, semaphore: asyncio.Semaphore) -> bool:
+        """Обработать один UUID; False — пропущен из-за отмены"""
+        async with semaphore:
+            if self.cancelled:
+                return False
+            result.requests += 1
+            try:
+                response = await self.operation.single_call(uuid)
+                error = None if response else "панель вернула ошибку"
+            except Exception as e:
+                error = str(e) or type(e).__name__
+        await self._record(result, [uuid], error)
+        return True
+
+    async def _record(self, result: BulkResult, uuids: List[str], error: Optional[str] = None):
+        if error is None:
+            result.succeeded.extend(uuids)
+            if self.on_success:
+                self.on_success(uuids)
+        else:
+            for uuid in uuids:
+                result.failed[uuid] = error
+        if self.progress:
+            await self.progress.update(result)
@@ -0,0 +1,342 @@
+import asyncio
+import json
+import logging
+import os
+import secrets
+import time
+from typing import Dict, List, Optional
+
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+
+from modules.api.bulk import BulkAPI
+from modules.config import BULK_CHUNK_SIZE, BULK_JOB_WORKERS, BULK_JOBS_DIR
+from modules.utils.bulk_executor import BulkExecutor, BulkProgress, BulkResult, bulk_operation
+
+logger = logging.getLogger(__name__)
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_CANCELLED = "cancelled"
+JOB_FAILED = "failed"
+UNFINISHED_STATUSES = (JOB_QUEUED, JOB_RUNNING)
+
+CANCEL_JOB_PREFIX = "cancel_job_"
+# Контрольная точка пишется не чаще раза в секунду; после сбоя повторятся только последние пачки
+CHECKPOINT_INTERVAL = 1.0
+
+# Операции над всей базой: один вызов панели без списка UUID
+PANEL_WIDE_OPERATIONS = {
+    "reset_all_traffic": ("Сброс трафика всем пользователям", lambda params: BulkAPI.bulk_reset_all_users_traffic()),
+    "delete_by_status": ("Удаление пользователей по статусу", lambda params: BulkAPI.bulk_delete_users_by_status(params["status"])),
+    "update_all": ("Обновление всех пользователей", lambda params: BulkAPI.bulk_update_all_users(params["fields"])),
+}
+
+
+class BulkJob:
+    """Фоновая массовая задача и ее контрольная точка"""
+
+    def __init__(
+        self,
+        operation: str,
+        chat_id: int,
+        message_id: int,
+        user_id: Optional[int] = None,
+        uuids: Optional[List[str]] = None,
+        params: Optional[dict] = None,
+        title: Optional[str] = None,
+        job_id: Optional[str] = None,
+        diff: Optional[Dict[str, dict]] = None,
+    ):
+        self.id = job_id or secrets.token_hex(4)
+        self.operation = operation
+        self.params = params or {}
+        self.uuids = list(dict.fromkeys(uuids or []))
+        # Поля для каждого UUID в операции update_diff
+        self.diff = diff or {}
+        self.title = title or self._default_title()
+        self.chat_id = chat_id
+        self.message_id = message_id
+        self.user_id = user_id
+        self.status = JOB_QUEUED
+        # UUID, обработанные до контрольной точки; от размера пачек не зависят
+        self.done: set = set()
+        # Номера пачек из контрольных точек старого формата и размер пачки, к которому они относятся
+        self.legacy_chunks: set = set()
+        self.legacy_chunk_size: Optional[int] = None
+        self.failed: Dict[str, str] = {}
+        self.created_at = time.time()
+        self.updated_at = self.created_at
+        self.cancel_event = asyncio.Event()
+
+    def _default_title(self) -> str:
+        if self.operation in PANEL_WIDE_OPERATIONS:
+            return PANEL_WIDE_OPERATIONS[self.operation][0]
+        return bulk_operation(self.operation, self.params.get("fields"), self.diff).title
+
+    @property
+    def panel_wide(self) -> bool:
+        return self.operation in PANEL_WIDE_OPERATIONS
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "operation": self.operation,
+            "params": self.params,
+            "title": self.title,
+            "chat_id": self.chat_id,
+            "message_id": self.message_id,
+            "user_id": self.user_id,
+            "status": self.status,
+            "total": len(self.uuids),
+            "done": [uuid for uuid in self.uuids if uuid in self.done],
+            "failed": self.failed,
+            "created_at": self.created_at,
+            "updated_at": self.updated_at,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict, uuids: List[str], diff: Optional[Dict[str, dict]] = None) -> "BulkJob":
+        job = cls(
+            data["operation"],
+            data["chat_id"],
+            data["message_id"],
+            user_id=data.get("user_id"),
+            uuids=uuids,
+            params=data.get("params"),
+            title=data.get("title"),
+            job_id=data["id"],
+            diff=diff,
+        )
+        job.status = data.get("status", JOB_QUEUED)
+        job.done = set(data.get("done", []))
+        job.legacy_chunks = set(data.get("done_chunks", []))
+        job.legacy_chunk_size = data.get("chunk_size")
+        job.failed = dict(data.get("failed", {}))
+        job.created_at = data.get("created_at", job.created_at)
+        job.updated_at = data.get("updated_at", job.updated_at)
+        return job
+
+
+class BulkJobStore:
+    """Контрольные точки задач в локальном каталоге: <id>.json, список UUID в <id>.uuids.json
+    и поля по пользователям в <id>.diff.json"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def _path(self, job_id: str, suffix: str = ".json") -> str:
+        return os.path.join(self.directory, f"{job_id}{suffix}")
+
+    def _write(self, path: str, data):
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def _read(self, path: str):
+        if not os.path.exists(path):
+            return None
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def save(self, job: BulkJob, with_uuids: bool = False):
+        """Записать состояние задачи; список UUID пишется один раз при постановке в очередь"""
+        job.updated_at = time.time()
+        if with_uuids:
+            self._write(self._path(job.id, ".uuids.json"), job.uuids)
+            if job.diff:
+                self._write(self._path(job.id, ".diff.json"), job.diff)
+        self._write(self._path(job.id), job.to_dict())
+
+    def delete(self, job_id: str):
+        for suffix in (".json", ".uuids.json", ".diff.json"):
+            try:
+                os.remove(self._path(job_id, suffix))
+            except FileNotFoundError:
+                pass
+
+    def load_unfinished(self) -> List[BulkJob]:
+        """Задачи, прерванные перезапуском, в порядке создания"""
+        if not os.path.isdir(self.directory):
+            return []
+        jobs = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".json") or name.endswith((".uuids.json", ".diff.json")):
+                continue
+            try:
+                with open(os.path.join(self.directory, name), encoding="utf-8") as f:
+                    data = json.load(f)
+                if data.get("status") not in UNFINISHED_STATUSES:
+                    continue
+                uuids = self._read(self._path(data["id"], ".uuids.json")) or []
+                diff = self._read(self._path(data["id"], ".diff.json"))
+                jobs.append(BulkJob.from_dict(data, uuids, diff))
+            except Exception as e:
+                logger.error(f"Failed to load bulk job checkpoint {name}: {e}")
+        return sorted(jobs, key=lambda job: job.created_at)
+
+
+def cancel_job_keyboard(job_id: str) -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup([[InlineKeyboardButton("⏹ Отменить задачу", callback_data=f"{CANCEL_JOB_PREFIX}{job_id}")]])
+
+
+class BulkJobQueue:
+    """Очередь массовых задач с пулом фоновых воркеров"""
+
+    def __init__(self, store: BulkJobStore, workers: int = BULK_JOB_WORKERS):
+        self.store = store
+        self.workers = max(1, workers)
+        self.jobs: Dict[str, BulkJob] = {}
+        self.bot = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._save_lock = asyncio.Lock()
+
+    async def start(self, bot):
+        """Запустить воркеров и вернуть в очередь задачи, прерванные перезапуском"""
+        self.bot = bot
+        self._queue = asyncio.Queue()
+        for job in await asyncio.to_thread(self.store.load_unfinished):
+            logger.info(f"Resuming bulk job {job.id} ({job.operation}, {len(job.done)}/{len(job.uuids)} users done)")
+            self.jobs[job.id] = job
+            self._queue.put_nowait(job)
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+
+    async def stop(self):
+        """Остановить воркеров; незавершенные задачи продолжатся при следующем запуске"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def enqueue(self, job: BulkJob) -> BulkJob:
+        if self._queue is None:
+            raise RuntimeError("Bulk job queue is not started")
+        self.jobs[job.id] = job
+        async with self._save_lock:
+            await asyncio.to_thread(self.store.save, job, True)
+        self._queue.put_nowait(job)
+        logger.info(f"Bulk job {job.id} queued: {job.operation}, {len(job.uuids)} users")
+        return job
+
+    def cancel(self, job_id: str) -> Optional[BulkJob]:
+        """Запросить отмену; задача остановится после пачек, которые уже отправлены"""
+        job = self.jobs.get(job_id)
+        if job is None or job.status not in UNFINISHED_STATUSES:
+            return None
+        job.cancel_event.set()
+        return job
+
+    async def _save(self, job: BulkJob):
+        async with self._save_lock:
+            await asyncio.to_thread(self.store.save, job)
+
+    async def _worker(self, number: int):
+        while True:
+            job = await self._queue.get()
+            try:
+                await self._run(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Bulk job {job.id} failed: {e}", exc_info=True)
+                job.status = JOB_FAILED
+                await self._save(job)
+            finally:
+                self._queue.task_done()
+                if job.status not in UNFINISHED_STATUSES:
+                    self.jobs.pop(job.id, None)
+                    await asyncio.to_thread(self.store.delete, job.id)
+
+    async def _run(self, job: BulkJob):
+        progress = BulkProgress(self.bot, job.chat_id, job.message_id, job.user_id)
+        progress.reply_markup = cancel_job_keyboard(job.id)
+
+        if job.cancel_event.is_set():
+            result = BulkResult(job.title, len(job.uuids))
+            result.cancelled = True
+            job.status = JOB_CANCELLED
+            await progress.finish(result)
+            return
+
+        job.status = JOB_RUNNING
+        await self._save(job)
+
+        if job.panel_wide:
+            await self._run_panel_wide(job, progress)
+        else:
+            await self._run_users(job, progress)
+        self._invalidate_user_cache()
+
+    async def _run_panel_wide(self, job: BulkJob, progress: BulkProgress):
+        await progress.update(BulkResult(job.title, 1), force=True)
+        call = PANEL_WIDE_OPERATIONS[job.operation][1]
+        result = BulkResult(job.title, 1)
+        response = await call(job.params)
+
+        if response is not None:
+            result.succeeded.append(job.operation)
+            affected = response.get("affectedRows") if isinstance(response, dict) else None
+            if affected is not None:
+                result.title = f"{job.title} ({affected})"
+        else:
+            result.failed[job.operation] = "панель вернула ошибку"
+        result.finished = time.monotonic()
+        job.status = JOB_DONE if response is not None else JOB_FAILED
+        await progress.finish(result)
+
+    async def _run_users(self, job: BulkJob, progress: BulkProgress):
+        last_checkpoint = 0.0
+        operation = bulk_operation(job.operation, job.params.get("fields"), job.diff)
+
+        if job.legacy_chunks:
+            # Старая контрольная точка хранила номера пачек: переводим в UUID по размеру пачки,
+            # с которым они были записаны (если он не сохранен — по текущему)
+            legacy = BulkExecutor(operation, chunk_size=job.legacy_chunk_size or BULK_CHUNK_SIZE)
+            for index, chunk in enumerate(legacy.chunks(job.uuids)):
+                if index in job.legacy_chunks:
+                    job.done.update(chunk)
+            job.legacy_chunks = set()
+
+        # Остаток заново режется на пачки, поэтому смена BULK_CHUNK_SIZE между запусками безопасна
+        remaining = [uuid for uuid in job.uuids if uuid not in job.done]
+        executor = BulkExecutor(operation, progress=progress, cancel_event=job.cancel_event)
+        chunks = executor.chunks(remaining)
+
+        async def checkpoint(index: int, result: BulkResult):
+            nonlocal last_checkpoint
+            job.done.update(chunks[index])
+            now = time.monotonic()
+            if now - last_checkpoint >= CHECKPOINT_INTERVAL:
+                last_checkpoint = now
+                job.failed = dict(result.failed)
+                await self._save(job)
+
+        executor.on_chunk_done = checkpoint
+
+        # Восстанавливаем итог по пользователям, обработанным до перезапуска
+        result = BulkResult(job.title, len(job.uuids))
+        result.skipped = job.params.get("skipped", 0)
+        for uuid in job.uuids:
+            if uuid in job.done:
+                if uuid in job.failed:
+                    result.failed[uuid] = job.failed[uuid]
+                else:
+                    result.succeeded.append(uuid)
+        result.resumed_from = result.done
+
+        result = await executor.run(remaining, result=result)
+        job.failed = dict(result.failed)
+        job.status = JOB_CANCELLED if result.cancelled else JOB_DONE
+        await progress.finish(result)
+
+    @staticmethod
+    def _invalidate_user_cache():
+        from modules.handlers.users.handlers import user_cache
+        user_cache.invalidate_all_users()
+
+
+# Глобальная очередь задач
+bulk_jobs = BulkJobQueue(BulkJobStore(BULK_JOBS_DIR))
@@ -0,0 +1,107 @@
+import logging
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+TRAFFIC_STRATEGIES = ("NO_RESET", "DAY", "WEEK", "MONTH")
+
+# Поля мастера массового обновления -> подпись
+UPDATE_FIELDS = {
+    "trafficLimitBytes": "Лимит трафика",
+    "trafficLimitStrategy": "Стратегия сброса",
+    "expireShiftDays": "Сдвиг срока",
+    "hwidDeviceLimit": "Лимит устройств",
+}
+
+
+def shift_expire_at(expire_at: Optional[str], days: int) -> Optional[str]:
+    """Сдвинуть expireAt на days дней в формате панели; None, если даты нет"""
+    if not expire_at:
+        return None
+    try:
+        expire_date = datetime.fromisoformat(str(expire_at).replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    if expire_date.tzinfo is None:
+        expire_date = expire_date.replace(tzinfo=timezone.utc)
+    shifted = (expire_date + timedelta(days=days)).astimezone(timezone.utc)
+    return shifted.strftime("%Y-%m-%dT%H:%M:%S.") + f"{shifted.microsecond // 1000:03d}Z"
+
+
+def _same_number(current, target: int) -> bool:
+    try:
+        return current is not None and int(float(current)) == target
+    except (TypeError, ValueError):
+        return False
+
+
+def user_update_fields(user: dict, targets: dict) -> dict:
+    """Поля, которые реально изменятся у пользователя; пустой dict — уже совпадает"""
+    fields = {}
+    for name in ("trafficLimitBytes", "hwidDeviceLimit"):
+        if name in targets and not _same_number(user.get(name), targets[name]):
+            fields[name] = targets[name]
+    strategy = targets.get("trafficLimitStrategy")
+    if strategy and user.get("trafficLimitStrategy") != strategy:
+        fields["trafficLimitStrategy"] = strategy
+    shift = targets.get("expireShiftDays")
+    if shift:
+        expire_at = shift_expire_at(user.get("expireAt"), shift)
+        if expire_at:
+            fields["expireAt"] = expire_at
+    return fields
+
+
+class UpdatePlan:
+    """Разница между снимком пользователей и целевыми значениями.
+
+    Пользователи с одинаковым набором новых полей собираются в группу: одна группа —
+    один вызов users/bulk/update на пачку. Значения абсолютные (expireAt уже сдвинут
+    по снимку), поэтому повтор пачки после сбоя или перезапуска безопасен.
+    """
+
+    def __init__(self, users: List[dict], targets: dict):
+        self.targets = dict(targets)
+        self.total = len(users)
+        self.diff: Dict[str, dict] = {}
+        self.changes: Counter = Counter()
+        groups: Dict[tuple, List[str]] = {}
+        for user in users:
+            uuid = user.get("uuid")
+            fields = user_update_fields(user, self.targets)
+            if not uuid or not fields:
+                continue
+            self.diff[uuid] = fields
+            self.changes.update(fields.keys())
+            groups.setdefault(self.group_key(fields), []).append(uuid)
+        self.groups = groups
+        self.skipped = self.total - len(self.diff)
+
+    @staticmethod
+    def group_key(fields: dict) -> tuple:
+        return tuple(sorted(fields.items()))
+
+    def ordered_uuids(self) -> List[str]:
+        """UUID подряд по группам, чтобы пачки не смешивали разные наборы полей"""
+        return [uuid for uuids in self.groups.values() for uuid in uuids]
+
+    def uniform_fields(self) -> Optional[dict]:
+        """Одинаковые поля для всех пользователей — можно одним users/bulk/all/update"""
+        if self.skipped or len(self.groups) != 1:
+            return None
+        return dict(next(iter(self.groups)))
+
+    def estimated_requests(self, chunk_size: int) -> int:
+        if self.uniform_fields() is not None:
+            return 1
+        return sum(-(-len(uuids) // chunk_size) for uuids in self.groups.values())
+
+    def fragmented(self, chunk_size: int) -> bool:
+        """Группы выродились: запросов больше половины изменяемых пользователей.
+
+        Так бывает при сдвиге срока — у каждого свой expireAt, и пачка собирается
+        почти из одного пользователя.
+        """
+        return len(self.diff) > 1 and self.estimated_requests(chunk_size) * 2 > len(self.diff)
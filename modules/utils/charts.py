@@ -0,0 +1,213 @@
+import asyncio
+import logging
+import struct
+import zlib
+from collections import OrderedDict
+from typing import Callable, Hashable, List, Optional, Sequence, Tuple
+
+from modules.config import CHART_CACHE_SIZE
+
+logger = logging.getLogger(__name__)
+
+Color = Tuple[int, int, int]
+
+BACKGROUND: Color = (255, 255, 255)
+GRID: Color = (228, 231, 236)
+AXIS: Color = (150, 156, 166)
+TEXT: Color = (70, 76, 86)
+# Цвета рядов столбцов снизу вверх
+SERIES_COLORS: List[Color] = [(66, 133, 244), (52, 168, 83), (251, 188, 5)]
+
+# Растровый шрифт 5x7 для подписей осей: только цифры, даты и единицы объема
+FONT = {
+    "0": ["01110", "10001", "10011", "10101", "11001", "10001", "01110"],
+    "1": ["00100", "01100", "00100", "00100", "00100", "00100", "01110"],
+    "2": ["01110", "10001", "00001", "00010", "00100", "01000", "11111"],
+    "3": ["11110", "00001", "00001", "01110", "00001", "00001", "11110"],
+    "4": ["00010", "00110", "01010", "10010", "11111", "00010", "00010"],
+    "5": ["11111", "10000", "11110", "00001", "00001", "10001", "01110"],
+    "6": ["00110", "01000", "10000", "11110", "10001", "10001", "01110"],
+    "7": ["11111", "00001", "00010", "00100", "01000", "01000", "01000"],
+    "8": ["01110", "10001", "10001", "01110", "10001", "10001", "01110"],
+    "9": ["01110", "10001", "10001", "01111", "00001", "00010", "01100"],
+    ".": ["00000", "00000", "00000", "00000", "00000", "01100", "01100"],
+    "-": ["00000", "00000", "00000", "11111", "00000", "00000", "00000"],
+    " ": ["00000"] * 7,
+    "B": ["11110", "10001", "10001", "11110", "10001", "10001", "11110"],
+    "K": ["10001", "10010", "10100", "11000", "10100", "10010", "10001"],
+    "M": ["10001", "11011", "10101", "10101", "10001", "10001", "10001"],
+    "G": ["01110", "10001", "10000", "10111", "10001", "10001", "01111"],
+    "T": ["11111", "00100", "00100", "00100", "00100", "00100", "00100"],
+    "P": ["11110", "10001", "10001", "11110", "10000", "10000", "10000"],
+}
+GLYPH_WIDTH, GLYPH_HEIGHT = 5, 7
+
+
+class Canvas:
+    """RGB-холст в памяти с записью в PNG средствами стандартной библиотеки"""
+
+    def __init__(self, width: int, height: int, background: Color = BACKGROUND):
+        self.width = width
+        self.height = height
+        self.rows = [bytearray(bytes(background) * width) for _ in range(height)]
+
+    def rect(self, x0: int, y0: int, x1: int, y1: int, color: Color):
+        """Закрасить прямоугольник [x0, x1) x [y0, y1)"""
+        x0, x1 = max(0, x0), min(self.width, x1)
+        y0, y1 = max(0, y0), min(self.height, y1)
+        if x0 >= x1 or y0 >= y1:
+            return
+        span = bytes(color) * (x1 - x0)
+        for y in range(y0, y1):
+            self.rows[y][x0 * 3:x1 * 3] = span
+
+    def text(self, x: int, y: int, text: str, color: Color = TEXT, scale: int = 1):
+        """Написать строку шрифтом 5x7; неизвестные символы пропускаются"""
+        for char in text.upper():
+            glyph = FONT.get(char)
+            if glyph is None:
+                continue
+            for row, bits in enumerate(glyph):
+                for column, bit in enumerate(bits):
+                    if bit == "1":
+                        self.rect(x + column * scale, y + row * scale, x + (column + 1) * scale, y + (row + 1) * scale, color)
+            x += (GLYPH_WIDTH + 1) * scale
+
+    @staticmethod
+    def text_width(text: str, scale: int = 1) -> int:
+        return max(0, len(text) * (GLYPH_WIDTH + 1) - 1) * scale
+
+    def to_png(self) -> bytes:
+        def chunk(kind: bytes, data: bytes) -> bytes:
+            return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data) & 0xFFFFFFFF)
+
+        # Каждая строка с фильтром 0 (без предсказания): одноцветные заливки сжимаются и так
+        raw = b"".join(b"\x00" + bytes(row) for row in self.rows)
+        header = struct.pack(">IIBBBBB", self.width, self.height, 8, 2, 0, 0, 0)
+        return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header) + chunk(b"IDAT", zlib.compress(raw, 6)) + chunk(b"IEND", b"")
+
+
+def short_bytes(value: float) -> str:
+    """Компактный объем для подписи оси: 512M, 1.5G"""
+    for unit in ("B", "K", "M", "G", "T"):
+        if abs(value) < 1024 or unit == "T":
+            break
+        value /= 1024
+    if unit == "B":
+        return f"{int(value)}B"
+    return f"{value:.1f}{unit}" if value < 10 else f"{int(round(value))}{unit}"
+
+
+def _nice_step(maximum: float, ticks: int) -> float:
+    """Шаг сетки 1/2/5 x 1024^n, чтобы подписи были круглыми"""
+    raw = maximum / ticks
+    scale = 1
+    while raw >= 1024 * scale:
+        scale *= 1024
+    for step in (1, 2, 5, 10, 20, 50, 100, 200, 500, 1024):
+        if step * scale >= raw:
+            return step * scale
+    return 1024 * scale
+
+
+def render_bar_chart(
+    labels: Sequence[str],
+    series: Sequence[Sequence[float]],
+    width: int = 720,
+    height: int = 360,
+    highlight_last: bool = False,
+) -> bytes:
+    """Столбчатая диаграмма по дням в PNG; series — ряды одинаковой длины, складываются в стопку"""
+    canvas = Canvas(width, height)
+    count = len(labels)
+    totals = [sum(values[i] for values in series) for i in range(count)]
+    maximum = max(totals, default=0) or 1
+    ticks = 4
+    step = _nice_step(maximum, ticks)
+    top_value = step * max(1, -(-maximum // step))
+
+    scale = 2
+    left = Canvas.text_width(short_bytes(top_value), scale) + 16
+    # Справа место под половину подписи последней даты
+    right, top, bottom = Canvas.text_width("00-00", scale) // 2 + 4, 14, height - (GLYPH_HEIGHT * scale + 16)
+    plot_width = width - left - right
+
+    # Горизонтальная сетка с подписями
+    value = 0.0
+    while value <= top_value:
+        y = bottom - int((bottom - top) * value / top_value)
+        canvas.rect(left, y, width - right, y + 1, AXIS if value == 0 else GRID)
+        label = short_bytes(value)
+        canvas.text(left - 8 - Canvas.text_width(label, scale), y - GLYPH_HEIGHT * scale // 2, label, TEXT, scale)
+        value += step
+
+    if count:
+        slot = plot_width / count
+        bar = max(1, int(slot * 0.7))
+        for index in range(count):
+            x = left + int(slot * index + (slot - bar) / 2)
+            base = bottom
+            for number, values in enumerate(series):
+                bar_height = int((bottom - top) * values[index] / top_value)
+                color = SERIES_COLORS[number % len(SERIES_COLORS)]
+                if highlight_last and index == count - 1:
+                    # Текущий день еще не закончился — бледнее
+                    color = tuple(c + (255 - c) // 2 for c in color)
+                canvas.rect(x, base - bar_height, x + bar, base, color)
+                base -= bar_height
+
+        # Подписи дат: столько, сколько помещается без наложения
+        label_width = Canvas.text_width("00-00", scale) + 12
+        every = max(1, -(-count * label_width // plot_width))
+        for index in range(count - 1, -1, -every):
+            label = labels[index][5:10] if len(labels[index]) >= 10 else labels[index]
+            x = left + int(slot * index + slot / 2) - Canvas.text_width(label, scale) // 2
+            canvas.text(max(0, x), bottom + 8, label, TEXT, scale)
+
+    return canvas.to_png()
+
+
+class ChartCache:
+    """Готовые картинки по ключу (сущность, период, версия данных).
+
+    После первой отправки запоминается file_id фото в Telegram, поэтому
+    повторный показ не рисует и не загружает картинку заново.
+    """
+
+    def __init__(self, capacity: int = CHART_CACHE_SIZE):
+        self.capacity = max(1, capacity)
+        self.entries: "OrderedDict[Hashable, list]" = OrderedDict()
+        self.renders = 0
+
+    def get(self, key: Hashable) -> Optional[list]:
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.entries.move_to_end(key)
+        return entry
+
+    def put(self, key: Hashable, png: bytes) -> list:
+        entry = self.entries[key] = [png, None]
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+        return entry
+
+    async def send(self, message, key: Hashable, render: Callable[[], bytes], caption: str, **kwargs):
+        """Ответить фото из кэша или отрисовать его в отдельном потоке"""
+        entry = self.get(key)
+        if entry is None:
+            entry = self.put(key, await asyncio.to_thread(render))
+            self.renders += 1
+        if entry[1]:
+            try:
+                return await message.reply_photo(photo=entry[1], caption=caption, **kwargs)
+            except Exception as e:
+                logger.warning(f"Cached chart file_id rejected, uploading again: {e}")
+        sent = await message.reply_photo(photo=entry[0], caption=caption, **kwargs)
+        if sent and sent.photo:
+            entry[1] = sent.photo[-1].file_id
+        return sent
+
+
+# Глобальный кэш графиков
+chart_cache = ChartCache()
@@ -1,7 +1,11 @@
 from datetime import datetime
 
 import logging
+import re
 from datetime import datetime
+from functools import lru_cache
+
+from modules.utils.templates import Template
 
 logger = logging.getLogger(__name__)
 
@@ -65,27 +69,81 @@ def create_progress_bar(percentage, length=20):
     bar = "█" * filled_length + "░" * (length - filled_length)
     return bar
 
+# Экранированные значения запоминаются: одни и те же имена, теги и адреса
+# выводятся на каждой странице списка и в каждой сводке. Длинные тексты
+# (описания) не кэшируются, чтобы не держать их в памяти.
+ESCAPE_CACHE_SIZE = 4096
+ESCAPE_CACHE_MAX_LENGTH = 256
+
+# Спецсимволы MarkdownV2: https://core.telegram.org/bots/api#markdownv2-style
+_MARKDOWN_V2_SPECIAL = re.compile(r"[\\_*\[\]()~`>#+\-=|{}.!]")
+
+def escape_markdown_uncached(text: str) -> str:
+    """escape_markdown без кэша: для строки, которая больше не встретится"""
+    # Упрощенное экранирование только основных символов для обычного текста.
+    # Для шести символов цепочка replace быстрее одного прохода translate/regex;
+    # backslash должен быть первым
+    return (
+        text.replace('\\', '\\\\')
+        .replace('_', '\\_')
+        .replace('*', '\\*')
+        .replace('[', '\\[')
+        .replace(']', '\\]')
+        .replace('`', '\\`')
+    )
+
+def escape_markdown_v2_uncached(text: str) -> str:
+    """escape_markdown_v2 без кэша: для строки, которая больше не встретится"""
+    return _MARKDOWN_V2_SPECIAL.sub(lambda match: '\\' + match.group(), text)
+
+_escape_markdown_cached = lru_cache(maxsize=ESCAPE_CACHE_SIZE)(escape_markdown_uncached)
+_escape_markdown_v2_cached = lru_cache(maxsize=ESCAPE_CACHE_SIZE)(escape_markdown_v2_uncached)
+
 def escape_markdown(text):
     """Escape Markdown special characters for Telegram (simplified for text, not URLs)"""
     if text is None:
         return ""
     
     text = str(text)
+    if len(text) > ESCAPE_CACHE_MAX_LENGTH:
+        return escape_markdown_uncached(text)
+    return _escape_markdown_cached(text)
+
+def escape_markdown_v2(text):
+    """Escape every MarkdownV2 special character in one regex pass (for parse_mode="MarkdownV2")"""
+    if text is None:
+        return ""
     
-    # Упрощенное экранирование только основных символов для обычного текста
-    escape_chars = [
-        ('\\', '\\\\'),  # Backslash должен быть первым
-        ('_', '\\_'),
-        ('*', '\\*'),
-        ('[', '\\['),
-        (']', '\\]'),
-        ('`', '\\`')
-    ]
-    
-    for char, escaped in escape_chars:
-        text = text.replace(char, escaped)
-    
-    return text
+    text = str(text)
+    if len(text) > ESCAPE_CACHE_MAX_LENGTH:
+        return escape_markdown_v2_uncached(text)
+    return _escape_markdown_v2_cached(text)
+
+_USER_DETAILS = Template(
+    "👤 *Пользователь:* {username}\n"
+    "🆔 *UUID:* `{uuid}`\n"
+    "{short_uuid}{subscription_uuid}\n"
+    "{subscription_url}"
+    "📊 *Статус:* {status_emoji} {status}\n"
+    "📈 *Трафик:* {used}/{limit}\n"
+    "🔄 *Стратегия сброса:* {strategy}\n"
+    "{expire_status} *Истекает:* {expire_text}\n\n"
+    "{optional}{created}{updated}"
+)
+_USER_SHORT_UUID = Template("🔑 *Короткий UUID:* `{value}`\n")
+_USER_SUBSCRIPTION_UUID = Template("📝 *UUID подписки:* `{value}`\n")
+_USER_SUBSCRIPTION_URL = Template("🔗 *URL подписки:*\n`{url}`\n\n")
+_USER_NO_SUBSCRIPTION_URL = "🔗 *URL подписки:* Не указан\n\n"
+# Необязательные поля пользователя: ключ, шаблон строки, нужно ли экранирование
+_USER_OPTIONAL_FIELDS = [
+    ("description", Template("📝 *Описание:* {value}\n"), True),
+    ("tag", Template("🏷️ *Тег:* {value}\n"), True),
+    ("telegramId", Template("📱 *Telegram ID:* {value}\n"), False),
+    ("email", Template("📧 *Email:* {value}\n"), True),
+    ("hwidDeviceLimit", Template("📱 *Лимит устройств:* {value}\n"), False),
+]
+_USER_CREATED = Template("\n⏱️ *Создан:* {date}\n")
+_USER_UPDATED = Template("🔄 *Обновлен:* {date}\n")
 
 def format_user_details(user):
     """Format user details for display with enhanced error handling"""
@@ -103,49 +161,29 @@ def format_user_details(user):
     status_emoji = "✅" if user["status"] == "ACTIVE" else "❌"
     
     try:
-        message = f"👤 *Пользователь:* {escape_markdown(user.get('username',''))}\n"
-        message += f"🆔 *UUID:* `{user.get('uuid','')}`\n"
-        if user.get('shortUuid'):
-            message += f"🔑 *Короткий UUID:* `{user.get('shortUuid')}`\n"
-        if user.get('subscriptionUuid'):
-            message += f"📝 *UUID подписки:* `{user.get('subscriptionUuid')}`\n"
-        message += "\n"
-        
-        # Безопасно форматируем URL подписки
         subscription_url = user.get('subscriptionUrl', '')
-        if subscription_url:
-            # Используем блок кода Markdown для безопасного отображения URL
-            safe_url = escape_markdown(subscription_url)
-            message += f"🔗 *URL подписки:*\n`{safe_url}`\n\n"
-        else:
-            message += f"🔗 *URL подписки:* Не указан\n\n"
-        
-        message += f"📊 *Статус:* {status_emoji} {user['status']}\n"
-        message += f"📈 *Трафик:* {format_bytes(user['usedTrafficBytes'])}/{format_bytes(user['trafficLimitBytes'])}\n"
-        message += f"🔄 *Стратегия сброса:* {user['trafficLimitStrategy']}\n"
-        message += f"{expire_status} *Истекает:* {expire_text}\n\n"
-        
-        if user.get('description'):
-            message += f"📝 *Описание:* {escape_markdown(str(user['description']))}\n"
-        
-        if user.get('tag'):
-            message += f"🏷️ *Тег:* {escape_markdown(str(user['tag']))}\n"
-        
-        if user.get('telegramId'):
-            message += f"📱 *Telegram ID:* {user['telegramId']}\n"
-        
-        if user.get('email'):
-            message += f"📧 *Email:* {escape_markdown(str(user['email']))}\n"
-        
-        if user.get('hwidDeviceLimit'):
-            message += f"📱 *Лимит устройств:* {user['hwidDeviceLimit']}\n"
-        
-        if user.get('createdAt'):
-            message += f"\n⏱️ *Создан:* {user['createdAt'][:10]}\n"
-        if user.get('updatedAt'):
-            message += f"🔄 *Обновлен:* {user['updatedAt'][:10]}\n"
-        
-        return message
+        return _USER_DETAILS.render(
+            username=escape_markdown(user.get('username','')),
+            uuid=user.get('uuid',''),
+            short_uuid=_USER_SHORT_UUID.render(value=user['shortUuid']) if user.get('shortUuid') else "",
+            subscription_uuid=_USER_SUBSCRIPTION_UUID.render(value=user['subscriptionUuid']) if user.get('subscriptionUuid') else "",
+            # Безопасно форматируем URL подписки (блок кода Markdown)
+            subscription_url=_USER_SUBSCRIPTION_URL.render(url=escape_markdown(subscription_url)) if subscription_url else _USER_NO_SUBSCRIPTION_URL,
+            status_emoji=status_emoji,
+            status=user['status'],
+            used=format_bytes(user['usedTrafficBytes']),
+            limit=format_bytes(user['trafficLimitBytes']),
+            strategy=user['trafficLimitStrategy'],
+            expire_status=expire_status,
+            expire_text=expire_text,
+            optional="".join(
+                template.render(value=escape_markdown(user[key]) if escape else user[key])
+                for key, template, escape in _USER_OPTIONAL_FIELDS
+                if user.get(key)
+            ),
+            created=_USER_CREATED.render(date=user['createdAt'][:10]) if user.get('createdAt') else "",
+            updated=_USER_UPDATED.render(date=user['updatedAt'][:10]) if user.get('updatedAt') else "",
+        )
     except Exception as e:
         # Fallback форматирование без Markdown
         logger.warning(f"Error in format_user_details: {e}")
@@ -247,93 +285,130 @@ def format_user_details_safe(user):
     
     return message
 
+_NODE_DETAILS = Template(
+    "*🖥️ Информация о сервере*\n\n"
+    "{status_emoji} *Имя*: {name}\n"
+    "🆔 *UUID*: `{uuid}`\n"
+    "🌐 *Адрес*: {address}:{port}\n\n"
+    "📊 *Статус сервера*:\n"
+    "  • Подключен: {connected}\n"
+    "  • Отключен: {disabled}\n"
+    "  • Онлайн: {online}\n"
+    "  • Xray запущен: {xray}\n"
+    "  • Отслеживание трафика: {tracking}\n\n"
+    "{versions}{uptime}"
+    "🌍 *Расположение*: {country}\n"
+    "📊 *Множитель потребления*: {multiplier}x\n"
+    "{reset_day}\n"
+    "{traffic}{users}{io}{system}{status_change}"
+    "🏥 *Состояние сервера*:\n"
+    "  • Общее состояние: {health}\n"
+    "{traffic_health}"
+)
+_NODE_VERSIONS = Template("📦 *Версии*:\n  • Xray: {xray}\n{node}\n")
+_NODE_VERSION = Template("  • Node: {version}\n")
+_NODE_UPTIME = Template(
+    "⏱️ *Время работы Xray*:\n"
+    "  • {days}д {hours}ч {minutes}м\n"
+    "  • Всего секунд: {seconds:,}\n\n"
+)
+_NODE_RESET_DAY = Template("🔄 *День сброса трафика*: {day}\n")
+_NODE_TRAFFIC = Template(
+    "📈 *Использование трафика*:\n"
+    "  • Использовано: {used}\n"
+    "  • Лимит: {limit}\n"
+    "  • Осталось: {left}\n"
+    "  • Процент: {percent:.1f}%\n"
+    "  • Прогресс: `{bar}` {percent:.1f}%\n\n"
+)
+_NODE_USERS = Template("👥 *Пользователи*:\n  • Сейчас онлайн: {online}\n{notify}\n")
+_NODE_NOTIFY = Template("  • Уведомления при: {percent}% использования\n")
+_NODE_IO = Template(
+    "📶 *Трафик по inbound/outbound*:\n"
+    "  • Inbound: ⬇️ {inbound_down} ⬆️ {inbound_up}\n"
+    "  • Outbound: ⬇️ {outbound_down} ⬆️ {outbound_up}\n"
+    "{seven_days}\n"
+)
+_NODE_SEVEN_DAYS = Template("  • За 7 дней: {total}\n")
+_NODE_SYSTEM = Template("💻 *Системные ресурсы*:\n  • CPU: {model} ({count} ядер)\n{ram}\n")
+_NODE_RAM = Template("  • RAM: {ram}\n")
+_NODE_STATUS_CHANGE = Template("🔗 *Последние изменения*:\n  • Статус изменен: {changed}\n{message}\n")
+_NODE_STATUS_MESSAGE = Template("  • Сообщение: {text}\n")
+_NODE_TRAFFIC_HEALTH = Template("  • Использование трафика: {status} ({percent:.1f}%)\n")
+
 def format_node_details(node):
     """Format node details for display with enhanced system information"""
     status_emoji = "🟢" if node["isConnected"] and not node["isDisabled"] else "🔴"
 
-    message = f"*🖥️ Информация о сервере*\n\n"
-    message += f"{status_emoji} *Имя*: {escape_markdown(node['name'])}\n"
-    message += f"🆔 *UUID*: `{node['uuid']}`\n"
-    message += f"🌐 *Адрес*: {escape_markdown(node['address'])}:{node['port']}\n\n"
-
-    # Enhanced Status Information
-    message += f"📊 *Статус сервера*:\n"
-    message += f"  • Подключен: {'✅' if node['isConnected'] else '❌'}\n"
-    message += f"  • Отключен: {'✅' if node['isDisabled'] else '❌'}\n"
-    message += f"  • Онлайн: {'✅' if node['isNodeOnline'] else '❌'}\n"
-    message += f"  • Xray запущен: {'✅' if node['isXrayRunning'] else '❌'}\n"
-    message += f"  • Отслеживание трафика: {'✅' if node.get('isTrafficTrackingActive', False) else '❌'}\n\n"
-
     # Version Information
+    versions = ""
     if node.get("xrayVersion"):
-        message += f"📦 *Версии*:\n"
-        message += f"  • Xray: {escape_markdown(node['xrayVersion'])}\n"
-        if node.get("nodeVersion"):
-            message += f"  • Node: {escape_markdown(node['nodeVersion'])}\n"
-        message += "\n"
+        versions = _NODE_VERSIONS.render(
+            xray=escape_markdown(node['xrayVersion']),
+            node=_NODE_VERSION.render(version=escape_markdown(node['nodeVersion'])) if node.get("nodeVersion") else "",
+        )
 
     # Enhanced Uptime Information
+    uptime = ""
     if node.get("xrayUptime"):
         uptime_seconds = int(node['xrayUptime'])
-        uptime_days = uptime_seconds // (24 * 3600)
-        uptime_hours = (uptime_seconds % (24 * 3600)) // 3600
-        uptime_minutes = (uptime_seconds % 3600) // 60
-        
-        message += f"⏱️ *Время работы Xray*:\n"
-        message += f"  • {uptime_days}д {uptime_hours}ч {uptime_minutes}м\n"
-        message += f"  • Всего секунд: {uptime_seconds:,}\n\n"
-    
-    # Location and Configuration
-    message += f"🌍 *Расположение*: {node['countryCode']}\n"
-    message += f"📊 *Множитель потребления*: {node['consumptionMultiplier']}x\n"
-    if node.get("trafficResetDay"):
-        message += f"🔄 *День сброса трафика*: {node['trafficResetDay']}\n"
-    message += "\n"
+        uptime = _NODE_UPTIME.render(
+            days=uptime_seconds // (24 * 3600),
+            hours=(uptime_seconds % (24 * 3600)) // 3600,
+            minutes=(uptime_seconds % 3600) // 60,
+            seconds=uptime_seconds,
+        )
 
     # Traffic Information with Progress Bar
+    traffic = ""
     if node.get("trafficLimitBytes") is not None:
         used_bytes = node.get('trafficUsedBytes', 0)
         limit_bytes = node['trafficLimitBytes']
         traffic_percent = (used_bytes / limit_bytes) * 100 if limit_bytes > 0 else 0
-        
-        message += f"📈 *Использование трафика*:\n"
-        message += f"  • Использовано: {format_bytes(used_bytes)}\n"
-        message += f"  • Лимит: {format_bytes(limit_bytes)}\n"
-        message += f"  • Осталось: {format_bytes(limit_bytes - used_bytes)}\n"
-        message += f"  • Процент: {traffic_percent:.1f}%\n"
-        
-        # Traffic usage bar
-        traffic_bar = create_progress_bar(traffic_percent, 15)
-        message += f"  • Прогресс: `{traffic_bar}` {traffic_percent:.1f}%\n\n"
+        traffic = _NODE_TRAFFIC.render(
+            used=format_bytes(used_bytes),
+            limit=format_bytes(limit_bytes),
+            left=format_bytes(limit_bytes - used_bytes),
+            percent=traffic_percent,
+            bar=create_progress_bar(traffic_percent, 15),
+        )
 
     # Users Information
+    users = ""
     if node.get("usersOnline") is not None:
-        users_online = node['usersOnline']
-        message += f"👥 *Пользователи*:\n"
-        message += f"  • Сейчас онлайн: {users_online}\n"
-        if node.get("notifyPercent"):
-            message += f"  • Уведомления при: {node['notifyPercent']}% использования\n"
-        message += "\n"
+        users = _NODE_USERS.render(
+            online=node['usersOnline'],
+            notify=_NODE_NOTIFY.render(percent=node['notifyPercent']) if node.get("notifyPercent") else "",
+        )
+
+    # Inbound/outbound traffic from system/nodes/metrics (present when read via node_metrics)
+    io = ""
+    if node.get("inboundDownloadBytes") is not None:
+        io = _NODE_IO.render(
+            inbound_down=format_bytes(node['inboundDownloadBytes']),
+            inbound_up=format_bytes(node['inboundUploadBytes']),
+            outbound_down=format_bytes(node['outboundDownloadBytes']),
+            outbound_up=format_bytes(node['outboundUploadBytes']),
+            seven_days=_NODE_SEVEN_DAYS.render(total=format_bytes(node['sevenDaysBytes'])) if node.get("sevenDaysBytes") else "",
+        )
 
     # Enhanced System Information
+    system = ""
     if node.get("cpuCount") and node.get("cpuModel"):
-        message += f"💻 *Системные ресурсы*:\n"
-        message += f"  • CPU: {escape_markdown(node['cpuModel'])} ({node['cpuCount']} ядер)\n"
-        if node.get("totalRam"):
-            message += f"  • RAM: {escape_markdown(node['totalRam'])}\n"
-        message += "\n"
+        system = _NODE_SYSTEM.render(
+            model=escape_markdown(node['cpuModel']),
+            count=node['cpuCount'],
+            ram=_NODE_RAM.render(ram=escape_markdown(node['totalRam'])) if node.get("totalRam") else "",
+        )
 
     # Connection Information
+    status_change = ""
     if node.get("lastStatusChange"):
-        message += f"🔗 *Последние изменения*:\n"
-        message += f"  • Статус изменен: {node['lastStatusChange'][:19]}\n"
-        if node.get("lastStatusMessage"):
-            message += f"  • Сообщение: {escape_markdown(node['lastStatusMessage'])}\n"
-        message += "\n"
+        status_change = _NODE_STATUS_CHANGE.render(
+            changed=node['lastStatusChange'][:19],
+            message=_NODE_STATUS_MESSAGE.render(text=escape_markdown(node['lastStatusMessage'])) if node.get("lastStatusMessage") else "",
+        )
 
-    # Health Status
-    message += f"🏥 *Состояние сервера*:\n"
-    
     # Overall health based on multiple factors
     health_score = 0
     if node.get("isConnected", False):
@@ -352,9 +427,8 @@ def format_node_details(node):
     else:
         health_status = "🔴 Проблемы"
     
-    message += f"  • Общее состояние: {health_status}\n"
-    
     # Traffic health
+    traffic_health = ""
     if node.get("trafficLimitBytes") and node.get("trafficUsedBytes"):
         traffic_percent = (node['trafficUsedBytes'] / node['trafficLimitBytes']) * 100
         if traffic_percent > 90:
@@ -363,47 +437,79 @@ def format_node_details(node):
             traffic_status = "🟡 Высокое"
         else:
             traffic_status = "🟢 Нормальное"
-        message += f"  • Использование трафика: {traffic_status} ({traffic_percent:.1f}%)\n"
-
-    return message
+        traffic_health = _NODE_TRAFFIC_HEALTH.render(status=traffic_status, percent=traffic_percent)
+
+    return _NODE_DETAILS.render(
+        status_emoji=status_emoji,
+        name=escape_markdown(node['name']),
+        uuid=node['uuid'],
+        address=escape_markdown(node['address']),
+        port=node['port'],
+        connected='✅' if node['isConnected'] else '❌',
+        disabled='✅' if node['isDisabled'] else '❌',
+        online='✅' if node['isNodeOnline'] else '❌',
+        xray='✅' if node['isXrayRunning'] else '❌',
+        tracking='✅' if node.get('isTrafficTrackingActive', False) else '❌',
+        versions=versions,
+        uptime=uptime,
+        # Location and Configuration
+        country=node['countryCode'],
+        multiplier=node['consumptionMultiplier'],
+        reset_day=_NODE_RESET_DAY.render(day=node['trafficResetDay']) if node.get("trafficResetDay") else "",
+        traffic=traffic,
+        users=users,
+        io=io,
+        system=system,
+        status_change=status_change,
+        health=health_status,
+        traffic_health=traffic_health,
+    )
+
+_HOST_DETAILS = Template(
+    "*Информация о хосте*\n\n"
+    "{status_emoji} *Название*: {remark}\n"
+    "🆔 *UUID*: `{uuid}`\n"
+    "🌐 *Адрес*: {address}:{port}\n\n"
+    "{inbound}{optional}"
+    "🛡️ *Security Layer*: {security}\n"
+)
+_HOST_INBOUND = Template("🔌 *Inbound*: cp=`{profile}` inbound=`{inbound}`\n")
+# Необязательные поля хоста, все экранируются
+_HOST_OPTIONAL_FIELDS = [
+    ("path", Template("🛣️ *Путь*: {value}\n")),
+    ("sni", Template("🔒 *SNI*: {value}\n")),
+    ("host", Template("🏠 *Host*: {value}\n")),
+    ("alpn", Template("🔄 *ALPN*: {value}\n")),
+    ("fingerprint", Template("👆 *Fingerprint*: {value}\n")),
+]
 
 def format_host_details(host):
     """Format host details for display"""
     status_emoji = "🟢" if not host["isDisabled"] else "🔴"
 
-    message = f"*Информация о хосте*\n\n"
-    message += f"{status_emoji} *Название*: {escape_markdown(host['remark'])}\n"
-    message += f"🆔 *UUID*: `{host['uuid']}`\n"
-    message += f"🌐 *Адрес*: {escape_markdown(host['address'])}:{host['port']}\n\n"
-    
     # v208: inbound is an object with configProfileUuid/configProfileInboundUuid
     inbound = host.get('inbound') or {}
     config_profile_uuid = inbound.get('configProfileUuid')
     config_profile_inbound_uuid = inbound.get('configProfileInboundUuid')
+    inbound_line = ""
     if config_profile_uuid or config_profile_inbound_uuid:
-        cp = config_profile_uuid or '—'
-        cpi = config_profile_inbound_uuid or '—'
-        message += f"🔌 *Inbound*: cp=`{cp}` inbound=`{cpi}`\n"
-    
-    if host.get("path"):
-        message += f"🛣️ *Путь*: {escape_markdown(host['path'])}\n"
-    
-    if host.get("sni"):
-        message += f"🔒 *SNI*: {escape_markdown(host['sni'])}\n"
-    
-    if host.get("host"):
-        message += f"🏠 *Host*: {escape_markdown(host['host'])}\n"
-    
-    if host.get("alpn"):
-        message += f"🔄 *ALPN*: {escape_markdown(host['alpn'])}\n"
-    
-    if host.get("fingerprint"):
-        message += f"👆 *Fingerprint*: {escape_markdown(host['fingerprint'])}\n"
-    
-    # allowInsecure removed in v208; keep Security Layer
-    message += f"🛡️ *Security Layer*: {host.get('securityLayer', 'DEFAULT')}\n"
-    
-    return message
+        inbound_line = _HOST_INBOUND.render(profile=config_profile_uuid or '—', inbound=config_profile_inbound_uuid or '—')
+    
+    return _HOST_DETAILS.render(
+        status_emoji=status_emoji,
+        remark=escape_markdown(host['remark']),
+        uuid=host['uuid'],
+        address=escape_markdown(host['address']),
+        port=host['port'],
+        inbound=inbound_line,
+        optional="".join(
+            template.render(value=escape_markdown(host[key]))
+            for key, template in _HOST_OPTIONAL_FIELDS
+            if host.get(key)
+        ),
+        # allowInsecure removed in v208; keep Security Layer
+        security=host.get('securityLayer', 'DEFAULT'),
+    )
 
 def format_system_stats(stats):
     """Format system statistics for display with detailed resource information"""
@@ -570,19 +676,27 @@ def format_bandwidth_stats(stats):
 
     return message
 
-def format_nodes_stats(nodes_data):
-    """Format nodes statistics with system resources"""
+def format_nodes_stats(nodes_data, totals):
+    """Format nodes statistics with system resources.
+
+    nodes_data and totals come from NodeMetricsSnapshot: sizes are already numeric bytes.
+    """
+    header, blocks = format_nodes_stats_blocks(nodes_data, totals)
+    return header + "".join(blocks)
+
+def format_nodes_stats_blocks(nodes_data, totals):
+    """Same as format_nodes_stats, split into the summary header and one block per node"""
     if not nodes_data or len(nodes_data) == 0:
-        return "*🖥️ Статистика серверов*\n\n❌ Нет данных о серверах"
+        return "*🖥️ Статистика серверов*\n\n❌ Нет данных о серверах", []
     
     message = f"*🖥️ Статистика серверов*\n\n"
     
     # Summary statistics
-    total_nodes = len(nodes_data)
-    connected_nodes = sum(1 for node in nodes_data if node.get('isConnected', False))
-    online_nodes = sum(1 for node in nodes_data if node.get('isNodeOnline', False))
-    running_xray = sum(1 for node in nodes_data if node.get('isXrayRunning', False))
-    disabled_nodes = sum(1 for node in nodes_data if node.get('isDisabled', False))
+    total_nodes = totals['nodes']
+    connected_nodes = totals['connected']
+    online_nodes = totals['online']
+    running_xray = totals['xray_running']
+    disabled_nodes = totals['disabled']
     
     message += f"📊 *Общая статистика*:\n"
     message += f"  • Всего серверов: {total_nodes}\n"
@@ -592,41 +706,15 @@ def format_nodes_stats(nodes_data):
     message += f"  • Отключено: {disabled_nodes} ({disabled_nodes/total_nodes*100:.1f}%)\n\n"
     
     # System resources summary
-    total_ram = 0
-    total_cpu_cores = 0
-    total_traffic_used = 0
-    total_traffic_limit = 0
-    total_users_online = 0
-    
-    for node in nodes_data:
-        if node.get('totalRam'):
-            try:
-                # Parse RAM string like "1.01 GB"
-                ram_str = node['totalRam'].replace(' GB', '').replace(' MB', '')
-                if 'GB' in node['totalRam']:
-                    total_ram += float(ram_str) * 1024  # Convert GB to MB
-                elif 'MB' in node['totalRam']:
-                    total_ram += float(ram_str)
-            except:
-                pass
-        
-        if node.get('cpuCount'):
-            total_cpu_cores += node['cpuCount']
-        
-        if node.get('trafficUsedBytes'):
-            total_traffic_used += node['trafficUsedBytes']
-        
-        if node.get('trafficLimitBytes'):
-            total_traffic_limit += node['trafficLimitBytes']
-        
-        if node.get('usersOnline'):
-            total_users_online += node['usersOnline']
+    total_ram = totals['ram_bytes']
+    total_traffic_used = totals['traffic_used']
+    total_traffic_limit = totals['traffic_limit']
     
     if total_ram > 0:
         message += f"💻 *Системные ресурсы*:\n"
-        message += f"  • Общая RAM: {total_ram/1024:.1f} GB\n"
-        message += f"  • Общие CPU ядра: {total_cpu_cores}\n"
-        message += f"  • Пользователей онлайн: {total_users_online}\n\n"
+        message += f"  • Общая RAM: {total_ram / 1024 ** 3:.1f} GB\n"
+        message += f"  • Общие CPU ядра: {totals['cpu_cores']}\n"
+        message += f"  • Пользователей онлайн: {totals['users_online']}\n\n"
     
     if total_traffic_limit > 0:
         traffic_percent = (total_traffic_used / total_traffic_limit) * 100
@@ -640,96 +728,117 @@ def format_nodes_stats(nodes_data):
         traffic_bar = create_progress_bar(traffic_percent, 20)
         message += f"  • Прогресс: `{traffic_bar}` {traffic_percent:.1f}%\n\n"
     
+    if totals.get('seven_days_bytes'):
+        message += f"📅 *Трафик за 7 дней*: {format_bytes(totals['seven_days_bytes'])}\n\n"
+    
     # Individual node details
     message += f"🖥️ *Детали серверов*:\n"
     
+    blocks = []
     for i, node in enumerate(nodes_data, 1):
         status_emoji = "🟢" if node.get('isConnected', False) and not node.get('isDisabled', False) else "🔴"
         
-        message += f"\n{i}. {status_emoji} *{escape_markdown(node.get('name', 'Unknown'))}*\n"
-        message += f"   • Адрес: {escape_markdown(node.get('address', 'N/A'))}:{node.get('port', 'N/A')}\n"
-        message += f"   • Статус: {'Подключен' if node.get('isConnected', False) else 'Отключен'}\n"
-        message += f"   • Xray: {'Запущен' if node.get('isXrayRunning', False) else 'Остановлен'}\n"
+        block = f"\n{i}. {status_emoji} *{escape_markdown(node.get('name', 'Unknown'))}*\n"
+        block += f"   • Адрес: {escape_markdown(node.get('address', 'N/A'))}:{node.get('port', 'N/A')}\n"
+        block += f"   • Статус: {'Подключен' if node.get('isConnected', False) else 'Отключен'}\n"
+        block += f"   • Xray: {'Запущен' if node.get('isXrayRunning', False) else 'Остановлен'}\n"
         
         if node.get('usersOnline') is not None:
-            message += f"   • Пользователей онлайн: {node['usersOnline']}\n"
+            block += f"   • Пользователей онлайн: {node['usersOnline']}\n"
         
-        if node.get('totalRam'):
-            message += f"   • RAM: {escape_markdown(node['totalRam'])}\n"
+        if node.get('totalRamBytes'):
+            block += f"   • RAM: {format_bytes(node['totalRamBytes'])}\n"
         
         if node.get('cpuCount'):
-            message += f"   • CPU: {node['cpuCount']} ядер\n"
+            block += f"   • CPU: {node['cpuCount']} ядер\n"
         
         if node.get('trafficLimitBytes') and node.get('trafficUsedBytes'):
             used = node['trafficUsedBytes']
             limit = node['trafficLimitBytes']
             percent = (used / limit) * 100 if limit > 0 else 0
-            message += f"   • Трафик: {format_bytes(used)}/{format_bytes(limit)} ({percent:.1f}%)\n"
-    
-    return message
+            block += f"   • Трафик: {format_bytes(used)}/{format_bytes(limit)} ({percent:.1f}%)\n"
+        
+        if node.get('inboundDownloadBytes') is not None:
+            block += f"   • Inbound: ⬇️ {format_bytes(node['inboundDownloadBytes'])} ⬆️ {format_bytes(node['inboundUploadBytes'])}\n"
+        
+        if node.get('sevenDaysBytes'):
+            block += f"   • За 7 дней: {format_bytes(node['sevenDaysBytes'])}\n"
+        
+        blocks.append(block)
+    
+    return message, blocks
+
+_INBOUND_DETAILS = Template(
+    "🔌 *Детальная информация об Inbound*\n\n"
+    "📋 *Основные данные:*\n"
+    "  🏷️ *Тег*: {tag}\n"
+    "  🆔 *UUID*: `{uuid}`\n"
+    "  🔌 *Тип*: {type}\n"
+    "  🔢 *Порт*: {port}\n"
+    "  📊 *Статус*: {status_emoji} {status_text}\n"
+    "{network}{security}{users}{nodes}{created}{updated}{settings}"
+)
+_INBOUND_NETWORK = Template("  🌐 *Сеть*: {value}\n")
+_INBOUND_SECURITY = Template("  🔒 *Безопасность*: {value}\n")
+# Счетчики пользователей и серверов выводятся одинаково
+_INBOUND_COUNTS = Template(
+    "\n{title}:\n"
+    "  • Активных: {enabled}\n"
+    "  • Отключенных: {disabled}\n"
+    "  • Всего: {total}\n"
+    "{activity}"
+)
+_INBOUND_ACTIVITY = Template("  • Активность: {percent:.1f}%\n")
+_INBOUND_CREATED = Template("\n📅 *Создан*: {date}\n")
+_INBOUND_UPDATED = Template("🔄 *Обновлен*: {date}\n")
+_INBOUND_SETTING = Template("  • {key}: {value}\n")
+_INBOUND_SETTING_GROUP = Template("  • {key}:\n")
+_INBOUND_SUB_SETTING = Template("    - {key}: {value}\n")
+
+def _format_inbound_counts(title, counts):
+    """Users or nodes block of an inbound: enabled, disabled, total and activity"""
+    enabled = counts.get('enabled', 0)
+    total = enabled + counts.get('disabled', 0)
+    return _INBOUND_COUNTS.render(
+        title=title,
+        enabled=enabled,
+        disabled=counts.get('disabled', 0),
+        total=total,
+        activity=_INBOUND_ACTIVITY.render(percent=(enabled / total) * 100) if total > 0 else "",
+    )
 
 def format_inbound_details(inbound):
     """Format inbound details for display with enhanced formatting"""
-    message = f"🔌 *Детальная информация об Inbound*\n\n"
-    
-    # Basic information
-    message += f"📋 *Основные данные:*\n"
-    message += f"  🏷️ *Тег*: {escape_markdown(inbound['tag'])}\n"
-    message += f"  🆔 *UUID*: `{inbound['uuid']}`\n"
-    message += f"  🔌 *Тип*: {inbound['type']}\n"
-    message += f"  🔢 *Порт*: {inbound['port']}\n"
-    
-    # Status information
-    status_emoji = "🟢" if inbound.get('enabled', True) else "🔴"
-    status_text = "Активен" if inbound.get('enabled', True) else "Отключен"
-    message += f"  📊 *Статус*: {status_emoji} {status_text}\n"
-    
-    # Network and security
-    if inbound.get('network'):
-        message += f"  🌐 *Сеть*: {inbound['network']}\n"
-    
-    if inbound.get('security'):
-        message += f"  🔒 *Безопасность*: {inbound['security']}\n"
-    
-    # User statistics
-    if 'users' in inbound:
-        users = inbound['users']
-        total_users = users.get('enabled', 0) + users.get('disabled', 0)
-        message += f"\n👥 *Пользователи*:\n"
-        message += f"  • Активных: {users.get('enabled', 0)}\n"
-        message += f"  • Отключенных: {users.get('disabled', 0)}\n"
-        message += f"  • Всего: {total_users}\n"
-        if total_users > 0:
-            active_percentage = (users.get('enabled', 0) / total_users) * 100
-            message += f"  • Активность: {active_percentage:.1f}%\n"
-    
-    # Node statistics
-    if 'nodes' in inbound:
-        nodes = inbound['nodes']
-        total_nodes = nodes.get('enabled', 0) + nodes.get('disabled', 0)
-        message += f"\n🖥️ *Серверы*:\n"
-        message += f"  • Активных: {nodes.get('enabled', 0)}\n"
-        message += f"  • Отключенных: {nodes.get('disabled', 0)}\n"
-        message += f"  • Всего: {total_nodes}\n"
-        if total_nodes > 0:
-            active_percentage = (nodes.get('enabled', 0) / total_nodes) * 100
-            message += f"  • Активность: {active_percentage:.1f}%\n"
-    
-    # Additional information
-    if inbound.get('createdAt'):
-        message += f"\n📅 *Создан*: {inbound['createdAt']}\n"
-    if inbound.get('updatedAt'):
-        message += f"🔄 *Обновлен*: {inbound['updatedAt']}\n"
+    enabled = inbound.get('enabled', True)
     
     # Configuration details
+    settings = ""
     if inbound.get('settings'):
-        message += f"\n⚙️ *Настройки конфигурации:*\n"
+        lines = ["\n⚙️ *Настройки конфигурации:*\n"]
         for key, value in inbound['settings'].items():
             if isinstance(value, dict):
-                message += f"  • {key}:\n"
+                lines.append(_INBOUND_SETTING_GROUP.render(key=key))
                 for sub_key, sub_value in value.items():
-                    message += f"    - {sub_key}: {sub_value}\n"
+                    lines.append(_INBOUND_SUB_SETTING.render(key=sub_key, value=sub_value))
             else:
-                message += f"  • {key}: {value}\n"
-    
-    return message
+                lines.append(_INBOUND_SETTING.render(key=key, value=value))
+        settings = "".join(lines)
+    
+    return _INBOUND_DETAILS.render(
+        tag=escape_markdown(inbound['tag']),
+        uuid=inbound['uuid'],
+        type=inbound['type'],
+        port=inbound['port'],
+        status_emoji="🟢" if enabled else "🔴",
+        status_text="Активен" if enabled else "Отключен",
+        # Network and security
+        network=_INBOUND_NETWORK.render(value=inbound['network']) if inbound.get('network') else "",
+        security=_INBOUND_SECURITY.render(value=inbound['security']) if inbound.get('security') else "",
+        # User and node statistics
+        users=_format_inbound_counts("👥 *Пользователи*", inbound['users']) if 'users' in inbound else "",
+        nodes=_format_inbound_counts("🖥️ *Серверы*", inbound['nodes']) if 'nodes' in inbound else "",
+        # Additional information
+        created=_INBOUND_CREATED.render(date=inbound['createdAt']) if inbound.get('createdAt') else "",
+        updated=_INBOUND_UPDATED.render(date=inbound['updatedAt']) if inbound.get('updatedAt') else "",
+        settings=settings,
+    )
@@ -0,0 +1,85 @@
+import asyncio
+import logging
+import threading
+import time
+from typing import Optional
+
+from modules.config import HOST_METRICS_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+
+class HostMetricsSampler:
+    """Метрики хоста бота (psutil) для запасного блока «Система» на дашборде.
+
+    psutil делает блокирующие системные вызовы, поэтому опрос идет в
+    отдельном потоке с фиксированным интервалом, а дашборд только читает
+    последний снимок. Снимок — неизменяемый словарь, который целиком
+    подменяется одной операцией присваивания, так что блокировки не нужны.
+    """
+
+    def __init__(self, interval: float = HOST_METRICS_INTERVAL):
+        self.interval = interval
+        self._latest: Optional[dict] = None
+        self._static: Optional[dict] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+    @property
+    def enabled(self) -> bool:
+        return self.interval > 0
+
+    def start(self):
+        if self.enabled and self._thread is None:
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._run, name="host-metrics", daemon=True)
+            self._thread.start()
+            logger.info(f"Host metrics sampler started: every {self.interval}s")
+
+    async def stop(self):
+        if self._thread:
+            self._stopped.set()
+            await asyncio.to_thread(self._thread.join, 5)
+            self._thread = None
+
+    def sample(self) -> dict:
+        """Снять метрики (блокирующий вызов — только из потока)"""
+        import psutil
+
+        # Число ядер и время загрузки не меняются, их достаточно прочитать один раз
+        if self._static is None:
+            self._static = {
+                "cpu_cores": psutil.cpu_count(),
+                "cpu_physical_cores": psutil.cpu_count(logical=False),
+                "boot_time": psutil.boot_time(),
+            }
+        memory = psutil.virtual_memory()
+        self._latest = {
+            **self._static,
+            "memory_used": memory.used,
+            "memory_total": memory.total,
+            "memory_percent": memory.percent,
+            "sampled_at": time.time(),
+        }
+        return self._latest
+
+    def latest(self) -> Optional[dict]:
+        return self._latest
+
+    async def get(self) -> dict:
+        """Последний снимок; если опрос отключен или еще не прошел — снять в потоке"""
+        if self.enabled and self._latest is not None:
+            return self._latest
+        return await asyncio.to_thread(self.sample)
+
+    def _run(self):
+        while not self._stopped.is_set():
+            try:
+                self.sample()
+            except Exception as e:
+                logger.error(f"Error sampling host metrics: {e}")
+            self._stopped.wait(self.interval)
+
+
+# Глобальный опрос метрик хоста
+host_metrics = HostMetricsSampler()
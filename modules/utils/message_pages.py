@@ -0,0 +1,258 @@
+import logging
+import secrets
+from collections import OrderedDict
+from typing import List, Optional, Sequence, Tuple
+
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Update
+from telegram.error import BadRequest
+from telegram.ext import ApplicationHandlerStop, ContextTypes
+
+from modules.localization import resolve_language, translate_text
+
+logger = logging.getLogger(__name__)
+
+# Лимит Telegram на текст сообщения; меряем в единицах UTF-16, как и сам Telegram
+MESSAGE_LIMIT = 4096
+# Запас под разметку и подпись страницы
+PAGE_LIMIT = 3800
+# Кнопок элементов на одной странице (Telegram принимает до 100 кнопок)
+PAGE_MAX_ROWS = 30
+PAGE_CALLBACK_PREFIX = "msgpage_"
+PAGE_NOOP = "msgpage_noop"
+PAGE_CACHE_SIZE = 256
+
+# Элемент раскладки: блок текста и кнопки, которые должны оказаться на той же странице
+PageItem = Tuple[str, List[List[InlineKeyboardButton]]]
+
+
+def text_length(text: str) -> int:
+    return len(text.encode("utf-16-le")) // 2
+
+
+# Разметка, которую можно закрыть в конце куска и открыть заново в начале следующего
+_ENTITY_CLOSE = {"*": "*", "_": "_", "`": "`", "```": "```"}
+_ENTITY_OPEN = {"*": "*", "_": "_", "`": "`", "```": "```\n"}
+# Запас под закрывающую и открывающую разметку в куске
+_ENTITY_RESERVE = 8
+# Позиции, где резать нельзя: внутри экранирования, маркера ``` или ссылки
+_NO_CUT = ("\\", "[", "(")
+
+
+def _markdown_states(text: str) -> List[Optional[str]]:
+    """Состояние разметки Markdown перед каждой позицией text и в конце.
+
+    None — вне сущностей; "*", "_", "`", "```" — открытое выделение или код;
+    "\\" — середина экранирования или маркера ```; "[" и "(" — текст и адрес ссылки.
+    """
+    states: List[Optional[str]] = []
+    state, index, length = None, 0, len(text)
+    while index < length:
+        states.append(state)
+        char = text[index]
+        if state in (None, "*", "_") and char == "\\" and index + 1 < length:
+            states.append("\\")
+            index += 2
+            continue
+        if state in (None, "```") and text.startswith("```", index):
+            states.extend(["\\", "\\"])
+            state = "```" if state is None else None
+            index += 3
+            continue
+        if state is None:
+            if char in "*_`[":
+                state = char
+        elif state == "[":
+            if char == "]":
+                state = "(" if text.startswith("](", index) else None
+        elif state == "(":
+            if char == ")":
+                state = None
+        elif state != "```" and char == state:
+            state = None
+        index += 1
+    states.append(state)
+    return states
+
+
+def _split_oversized(block: str, limit: int, markdown: bool = True) -> List[str]:
+    """Разрезать блок длиннее страницы на куски не длиннее limit.
+
+    Режем по переводу строки, затем по пробелу вне сущностей Markdown. Если
+    так не выходит, кусок режется внутри выделения или кода: сущность
+    закрывается в его конце и открывается заново в следующем. Ссылку режем,
+    только если она одна длиннее страницы.
+    """
+    states = _markdown_states(block) if markdown else [None] * (len(block) + 1)
+    budget = max(1, limit - _ENTITY_RESERVE)
+    pieces, start, opener = [], 0, ""
+    while text_length(opener) + text_length(block[start:]) > limit:
+        # Самая дальняя позиция, до которой кусок помещается в бюджет
+        end, used = start, text_length(opener)
+        while end < len(block) and used + text_length(block[end]) <= budget:
+            used += text_length(block[end])
+            end += 1
+        end = max(end, start + 1)
+        cut = None
+        for separators, closable in (("\n", False), (" ", False), ("\n", True), (" ", True)):
+            cut = next((
+                position for position in range(end, start, -1)
+                if block[position - 1] in separators
+                and (states[position] is None or closable and states[position] in _ENTITY_CLOSE)
+            ), None)
+            if cut:
+                break
+        if cut is None:
+            # Не сразу после открывающего маркера, чтобы не оставить пустую сущность
+            cut = next((
+                position for position in range(end, start, -1)
+                if states[position] not in _NO_CUT and states[position] in (None, states[position - 1])
+            ), end)
+        state = states[cut]
+        piece = block[start:cut]
+        if state in _ENTITY_CLOSE:
+            # Закрывающий маркер ставим перед пробелом или переводом строки в конце куска
+            body = piece.rstrip(" \n")
+            piece = body + _ENTITY_CLOSE[state] + piece[len(body):]
+        pieces.append(opener + piece)
+        opener, start = _ENTITY_OPEN.get(state, ""), cut
+    if start < len(block):
+        pieces.append(opener + block[start:])
+    return pieces
+
+
+def layout_pages(
+    header: str,
+    items: Sequence[PageItem],
+    limit: int = PAGE_LIMIT,
+    max_rows: int = PAGE_MAX_ROWS,
+    continuation: Optional[str] = None,
+    markdown: bool = True,
+) -> Tuple[List[str], List[List[List[InlineKeyboardButton]]]]:
+    """Разложить заголовок и элементы по страницам, не разрывая элементы.
+
+    Заголовок идет на первую страницу, на следующих — continuation
+    (по умолчанию первая строка заголовка). Новая страница начинается,
+    когда не помещается текст или кнопки очередного элемента.
+    """
+    if continuation is None:
+        continuation = header.split("\n", 1)[0] + "\n\n"
+    room = limit - text_length(continuation)
+    pages, page_rows = [], []
+    text, rows = header, []
+    for block, block_rows in items:
+        parts = _split_oversized(block, room, markdown) if text_length(block) > room else [block]
+        for number, part in enumerate(parts):
+            part_rows = block_rows if number == 0 else []
+            overflow = text_length(text) + text_length(part) > limit or len(rows) + len(part_rows) > max_rows
+            # Пустую страницу (только продолжение заголовка) не закрываем
+            if overflow and (text != continuation or rows):
+                pages.append(text)
+                page_rows.append(rows)
+                text, rows = continuation, []
+            text += part
+            rows = rows + part_rows
+    pages.append(text)
+    page_rows.append(rows)
+    return pages, page_rows
+
+
+class PagedMessage:
+    """Готовые страницы одного экрана: листание только меняет текст и кнопки"""
+
+    def __init__(self, pages: List[str], page_rows: List[list], footer_rows: List[list], parse_mode: Optional[str]):
+        self.token = secrets.token_hex(4)
+        self.pages = pages
+        self.page_rows = page_rows
+        self.footer_rows = footer_rows
+        self.parse_mode = parse_mode
+
+    def markup(self, index: int) -> InlineKeyboardMarkup:
+        keyboard = list(self.page_rows[index])
+        if len(self.pages) > 1:
+            navigation = []
+            if index > 0:
+                navigation.append(InlineKeyboardButton("◀️", callback_data=f"{PAGE_CALLBACK_PREFIX}{self.token}_{index - 1}"))
+            navigation.append(InlineKeyboardButton(f"{index + 1}/{len(self.pages)}", callback_data=PAGE_NOOP))
+            if index < len(self.pages) - 1:
+                navigation.append(InlineKeyboardButton("▶️", callback_data=f"{PAGE_CALLBACK_PREFIX}{self.token}_{index + 1}"))
+            keyboard.append(navigation)
+        return InlineKeyboardMarkup(keyboard + list(self.footer_rows))
+
+
+class PageCache:
+    """Последние разбитые на страницы экраны (LRU)"""
+
+    def __init__(self, capacity: int = PAGE_CACHE_SIZE):
+        self.capacity = capacity
+        self.entries: "OrderedDict[str, PagedMessage]" = OrderedDict()
+
+    def put(self, paged: PagedMessage):
+        self.entries[paged.token] = paged
+        while len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+
+    def get(self, token: str) -> Optional[PagedMessage]:
+        paged = self.entries.get(token)
+        if paged is not None:
+            self.entries.move_to_end(token)
+        return paged
+
+
+page_cache = PageCache()
+
+
+async def edit_paged(
+    update: Update,
+    header: str,
+    items: Sequence[PageItem],
+    footer_rows: Optional[List[list]] = None,
+    parse_mode: Optional[str] = "Markdown",
+    continuation: Optional[str] = None,
+) -> PagedMessage:
+    """Показать экран постранично, если он не помещается в одно сообщение.
+
+    Длина меряется по уже переведенному тексту, так что перевод не выведет
+    страницу за лимит.
+    """
+    query = update.callback_query
+    language = resolve_language(update.effective_user.id if update.effective_user else None, update.effective_chat.id if update.effective_chat else None)
+    translated_items = [(translate_text(block, language), rows) for block, rows in items]
+    pages, page_rows = layout_pages(
+        translate_text(header, language),
+        translated_items,
+        continuation=translate_text(continuation, language),
+        markdown=parse_mode == "Markdown",
+    )
+    paged = PagedMessage(pages, page_rows, footer_rows or [], parse_mode)
+    if len(pages) > 1:
+        page_cache.put(paged)
+    await query.edit_message_text(text=pages[0], reply_markup=paged.markup(0), parse_mode=parse_mode)
+    return paged
+
+
+async def handle_page_flip(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Листание страниц из кэша; работает вне диалога, поэтому останавливает обработку"""
+    from modules.utils.auth import NOT_AUTHORIZED_MESSAGE, is_authorized_user
+
+    query = update.callback_query
+    if not is_authorized_user(update.effective_user.id):
+        await query.answer(NOT_AUTHORIZED_MESSAGE, show_alert=True)
+        raise ApplicationHandlerStop
+    if query.data == PAGE_NOOP:
+        await query.answer()
+        raise ApplicationHandlerStop
+
+    token, _, index = query.data[len(PAGE_CALLBACK_PREFIX):].rpartition("_")
+    paged = page_cache.get(token)
+    if paged is None or not index.isdigit() or int(index) >= len(paged.pages):
+        await query.answer("Страницы устарели, откройте экран заново", show_alert=True)
+        raise ApplicationHandlerStop
+
+    await query.answer()
+    index = int(index)
+    try:
+        await query.edit_message_text(text=paged.pages[index], reply_markup=paged.markup(index), parse_mode=paged.parse_mode)
+    except BadRequest as e:
+        if "not modified" not in str(e).lower():
+            logger.warning(f"Failed to flip page: {e}")
+    raise ApplicationHandlerStop
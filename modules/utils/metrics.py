@@ -0,0 +1,577 @@
+"""
+Lightweight Prometheus-compatible metrics registry and /metrics HTTP exporter
+"""
+import asyncio
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+import traceback
+from bisect import bisect_left
+from contextvars import ContextVar
+from functools import wraps
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from telegram.request import HTTPXRequest
+
+from modules.config import LOOP_BLOCK_THRESHOLD_MS, SLOW_HANDLER_THRESHOLD_MS
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _format_labels(labelnames: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape_label(value)}"' for name, value in zip(labelnames, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape_label(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    """Base class for labelled metrics"""
+
+    metric_type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def _header(self) -> List[str]:
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.metric_type}",
+        ]
+
+    def render(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """Monotonically increasing counter"""
+
+    metric_type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def get(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def render(self) -> List[str]:
+        lines = self._header()
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Gauge(_Metric):
+    """Value that can go up and down"""
+
+    metric_type = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = float(value)
+
+    def get(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def render(self) -> List[str]:
+        lines = self._header()
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Histogram(_Metric):
+    """Cumulative histogram with fixed buckets"""
+
+    metric_type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # key -> [bucket counts..., +Inf count, sum]
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = [0.0] * (len(self.buckets) + 2)
+                self._values[key] = series
+            series[index] += 1
+            series[-1] += value
+
+    def count(self, **labels) -> int:
+        series = self._values.get(self._key(labels))
+        return int(sum(series[:-1])) if series else 0
+
+    def render(self) -> List[str]:
+        lines = self._header()
+        with self._lock:
+            for key, series in sorted(self._values.items()):
+                cumulative = 0.0
+                for bound, amount in zip(self.buckets + (float("inf"),), series[:-1]):
+                    cumulative += amount
+                    le = f'le="{_format_value(bound)}"'
+                    lines.append(
+                        f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {_format_value(cumulative)}"
+                    )
+                labels = _format_labels(self.labelnames, key)
+                lines.append(f"{self.name}_sum{labels} {_format_value(series[-1])}")
+                lines.append(f"{self.name}_count{labels} {_format_value(cumulative)}")
+        return lines
+
+
+class MetricsRegistry:
+    """Collection of metrics rendered in the Prometheus text format"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+PANEL_REQUESTS = REGISTRY.register(Counter(
+    "remnabot_panel_requests_total",
+    "Remnawave panel API requests by endpoint and status",
+    ("method", "endpoint", "status"),
+))
+PANEL_REQUEST_DURATION = REGISTRY.register(Histogram(
+    "remnabot_panel_request_duration_seconds",
+    "Remnawave panel API request latency",
+    ("method", "endpoint", "status"),
+))
+HANDLER_DURATION = REGISTRY.register(Histogram(
+    "remnabot_handler_duration_seconds",
+    "Wall time of a handler invocation, including nested panel calls, by callback pattern",
+    ("handler", "pattern"),
+))
+CACHE_REQUESTS = REGISTRY.register(Counter(
+    "remnabot_cache_requests_total",
+    "Cache lookups by cache name and result",
+    ("cache", "result"),
+))
+CACHE_HIT_RATIO = REGISTRY.register(Gauge(
+    "remnabot_cache_hit_ratio",
+    "Share of cache lookups served from cache",
+    ("cache",),
+))
+TELEGRAM_REQUEST_DURATION = REGISTRY.register(Histogram(
+    "remnabot_telegram_request_duration_seconds",
+    "Telegram Bot API call latency by method",
+    ("method", "status"),
+))
+EVENT_LOOP_LAG = REGISTRY.register(Histogram(
+    "remnabot_event_loop_lag_seconds",
+    "Delay between scheduled and actual wake-up of the event loop",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+))
+EVENT_LOOP_LAG_LAST = REGISTRY.register(Gauge(
+    "remnabot_event_loop_lag_last_seconds",
+    "Most recent event loop lag sample",
+))
+LOOP_BLOCKED = REGISTRY.register(Counter(
+    "remnabot_event_loop_blocked_total",
+    "Event loop stalls longer than LOOP_BLOCK_THRESHOLD_MS by the innermost bot frame that was running",
+    ("site",),
+))
+LOOP_BLOCKED_DURATION = REGISTRY.register(Histogram(
+    "remnabot_event_loop_blocked_seconds",
+    "Duration of event loop stalls longer than LOOP_BLOCK_THRESHOLD_MS",
+    buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0),
+))
+HANDLER_PANEL_CALLS = REGISTRY.register(Counter(
+    "remnabot_handler_panel_calls_total",
+    "Panel API calls made while serving a handler",
+    ("handler",),
+))
+HANDLER_PANEL_BYTES = REGISTRY.register(Counter(
+    "remnabot_handler_panel_bytes_total",
+    "Panel API response bytes received while serving a handler",
+    ("handler",),
+))
+SLOW_HANDLERS = REGISTRY.register(Counter(
+    "remnabot_handler_slow_total",
+    "Handler invocations that exceeded SLOW_HANDLER_THRESHOLD_MS",
+    ("handler",),
+))
+
+BULK_USERS = REGISTRY.register(Counter(
+    "remnabot_bulk_users_total",
+    "Users processed by bulk operations by operation and result",
+    ("operation", "result"),
+))
+BULK_PANEL_REQUESTS = REGISTRY.register(Counter(
+    "remnabot_bulk_panel_requests_total",
+    "Panel requests issued by bulk operations",
+    ("operation",),
+))
+BULK_THROUGHPUT = REGISTRY.register(Gauge(
+    "remnabot_bulk_users_per_second",
+    "Throughput of the most recent bulk run",
+    ("operation",),
+))
+
+_UUID_RE = re.compile(r"[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}")
+_LOOKUP_RE = re.compile(r"(by-(?:username|email|tag|telegram-id|short-uuid|uuid))/[^/]+")
+_NUMBER_RE = re.compile(r"/\d+(?=/|$)")
+
+
+def normalize_endpoint(endpoint: str) -> str:
+    """Collapse identifiers in an API path so that metric labels stay bounded"""
+    path = "/" + endpoint.strip("/").split("?", 1)[0]
+    path = _UUID_RE.sub("{uuid}", path)
+    path = _LOOKUP_RE.sub(r"\1/{value}", path)
+    path = _NUMBER_RE.sub("/{id}", path)
+    return path
+
+
+class HandlerTrace:
+    """Panel calls collected during one handler invocation"""
+
+    __slots__ = ("handler", "started", "calls")
+
+    def __init__(self, handler: str):
+        self.handler = handler
+        self.started = time.perf_counter()
+        self.calls: List[Tuple[str, str, str, float, int]] = []
+
+    @property
+    def response_bytes(self) -> int:
+        return sum(call[4] for call in self.calls)
+
+    def breakdown(self) -> List[Dict[str, object]]:
+        """Aggregate calls per method and endpoint, slowest first"""
+        grouped: Dict[Tuple[str, str], Dict[str, object]] = {}
+        for method, endpoint, status, duration, size in self.calls:
+            entry = grouped.setdefault((method, endpoint), {
+                "method": method, "endpoint": endpoint, "calls": 0,
+                "total_ms": 0.0, "bytes": 0, "statuses": {},
+            })
+            entry["calls"] += 1
+            entry["total_ms"] += duration * 1000
+            entry["bytes"] += size
+            entry["statuses"][status] = entry["statuses"].get(status, 0) + 1
+        result = sorted(grouped.values(), key=lambda item: item["total_ms"], reverse=True)
+        for entry in result:
+            entry["total_ms"] = round(entry["total_ms"], 1)
+        return result
+
+
+_current_trace: ContextVar[Optional[HandlerTrace]] = ContextVar("remnabot_handler_trace", default=None)
+
+
+def observe_panel_request(method: str, endpoint: str, status, duration: float, response_bytes: int = 0):
+    """Record a single panel API round trip"""
+    labels = {"method": method.upper(), "endpoint": normalize_endpoint(endpoint), "status": str(status)}
+    PANEL_REQUESTS.inc(**labels)
+    PANEL_REQUEST_DURATION.observe(duration, **labels)
+
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.calls.append((labels["method"], labels["endpoint"], labels["status"], duration, response_bytes))
+
+
+def observe_connection_test(status, duration: float):
+    """Record the connectivity probe under its own endpoint label and outside handler traces"""
+    labels = {"method": "GET", "endpoint": "connection_test", "status": str(status)}
+    PANEL_REQUESTS.inc(**labels)
+    PANEL_REQUEST_DURATION.observe(duration, **labels)
+
+
+def record_cache_lookup(cache: str, hit: bool):
+    """Record a cache hit or miss and refresh the hit ratio gauge"""
+    CACHE_REQUESTS.inc(cache=cache, result="hit" if hit else "miss")
+    hits = CACHE_REQUESTS.get(cache=cache, result="hit")
+    total = hits + CACHE_REQUESTS.get(cache=cache, result="miss")
+    CACHE_HIT_RATIO.set(hits / total if total else 0.0, cache=cache)
+
+
+def record_bulk_run(operation: str, result):
+    """Record users, panel requests and throughput of a finished bulk run"""
+    BULK_USERS.inc(len(result.succeeded), operation=operation, result="ok")
+    BULK_USERS.inc(len(result.failed), operation=operation, result="failed")
+    BULK_PANEL_REQUESTS.inc(result.requests, operation=operation)
+    BULK_THROUGHPUT.set(result.rate, operation=operation)
+
+
+def _handler_name(func) -> str:
+    # modules.handlers.<section>.handlers -> <section>.<function>
+    parts = getattr(func, "__module__", "").split(".")
+    section = parts[2] if len(parts) > 2 and parts[1] == "handlers" else parts[-1]
+    return f"{section}.{getattr(func, '__name__', 'handler')}"
+
+
+async def _run_traced(func, name: str, pattern: str, update, context, *args, **kwargs):
+    trace = HandlerTrace(name)
+    token = _current_trace.set(trace)
+    try:
+        return await func(update, context, *args, **kwargs)
+    finally:
+        _current_trace.reset(token)
+        _finish_trace(trace, update, pattern)
+
+
+def track_handler_latency(callback, pattern: str):
+    """Wrap a conversation handler callback: one trace and one latency sample per update, labelled by pattern"""
+    name = _handler_name(callback)
+
+    @wraps(callback)
+    async def wrapper(update, context, *args, **kwargs):
+        if _current_trace.get() is not None:
+            return await callback(update, context, *args, **kwargs)
+        return await _run_traced(callback, name, pattern, update, context, *args, **kwargs)
+
+    return wrapper
+
+
+def timed_handler(func):
+    """Decorator recording wall time, panel calls and bytes received per handler invocation.
+
+    Inside the conversation the trace is already opened by track_handler_latency, so
+    nested decorated handlers are attributed to it; handlers registered outside the
+    conversation get their own trace with an empty pattern label. Invocations slower than
+    SLOW_HANDLER_THRESHOLD_MS produce a structured warning with a per-endpoint breakdown.
+    """
+    name = _handler_name(func)
+
+    @wraps(func)
+    async def wrapper(update, context, *args, **kwargs):
+        if _current_trace.get() is not None:
+            return await func(update, context, *args, **kwargs)
+        return await _run_traced(func, name, "", update, context, *args, **kwargs)
+
+    return wrapper
+
+
+def _finish_trace(trace: HandlerTrace, update, pattern: str = ""):
+    elapsed = time.perf_counter() - trace.started
+    response_bytes = trace.response_bytes
+    HANDLER_DURATION.observe(elapsed, handler=trace.handler, pattern=pattern)
+    HANDLER_PANEL_CALLS.inc(len(trace.calls), handler=trace.handler)
+    HANDLER_PANEL_BYTES.inc(response_bytes, handler=trace.handler)
+
+    if SLOW_HANDLER_THRESHOLD_MS <= 0 or elapsed * 1000 < SLOW_HANDLER_THRESHOLD_MS:
+        return
+
+    SLOW_HANDLERS.inc(handler=trace.handler)
+    callback_query = getattr(update, "callback_query", None)
+    user = getattr(update, "effective_user", None)
+    payload = {
+        "handler": trace.handler,
+        "pattern": pattern,
+        "wall_ms": round(elapsed * 1000, 1),
+        "panel_ms": round(sum(call[3] for call in trace.calls) * 1000, 1),
+        "panel_calls": len(trace.calls),
+        "panel_bytes": response_bytes,
+        "callback_data": callback_query.data if callback_query else None,
+        "user_id": user.id if user else None,
+        "breakdown": trace.breakdown(),
+    }
+    logger.warning(f"Slow handler: {json.dumps(payload, ensure_ascii=False)}")
+
+
+class InstrumentedHTTPXRequest(HTTPXRequest):
+    """HTTPXRequest that records Telegram Bot API call latency"""
+
+    async def do_request(self, url: str, method: str, *args, **kwargs):
+        api_method = url.rsplit("/", 1)[-1]
+        started = time.perf_counter()
+        status = "error"
+        try:
+            code, payload = await super().do_request(url, method, *args, **kwargs)
+            status = str(code)
+            return code, payload
+        finally:
+            TELEGRAM_REQUEST_DURATION.observe(time.perf_counter() - started, method=api_method, status=status)
+
+
+async def monitor_event_loop_lag(interval: float = 1.0):
+    """Sample event loop lag forever by measuring how late a sleep wakes up"""
+    loop = asyncio.get_running_loop()
+    while True:
+        expected = loop.time() + interval
+        await asyncio.sleep(interval)
+        lag = max(0.0, loop.time() - expected)
+        EVENT_LOOP_LAG.observe(lag)
+        EVENT_LOOP_LAG_LAST.set(lag)
+
+
+_PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+_PROJECT_SOURCES = (os.path.join(_PROJECT_ROOT, "modules") + os.sep, os.path.join(_PROJECT_ROOT, "main.py"))
+
+
+def _blocking_site(frame) -> str:
+    """Innermost bot frame of a stack as module.function, so the metric label stays bounded"""
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.startswith(_PROJECT_SOURCES):
+            module = os.path.relpath(filename, _PROJECT_ROOT)[:-3].replace(os.sep, ".")
+            return f"{module}.{frame.f_code.co_name}"
+        frame = frame.f_back
+    return "other"
+
+
+class LoopBlockingDetector:
+    """Detect callbacks that block the event loop and log where they are stuck.
+
+    The loop reschedules a heartbeat callback every threshold / 2; a watchdog
+    thread checks it and, once it is older than the threshold, takes the loop
+    thread's stack from sys._current_frames() while the blocking code is
+    still running. Unlike asyncio debug mode this names the exact line and
+    costs one timer callback per beat.
+    """
+
+    def __init__(self, threshold_ms: float = LOOP_BLOCK_THRESHOLD_MS, stack_limit: int = 20):
+        self.threshold = threshold_ms / 1000
+        self.beat_interval = self.threshold / 2
+        self.stack_limit = stack_limit
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[int] = None
+        self._last_beat = 0.0
+        self._reported_beat: Optional[float] = None
+        self._handle: Optional[asyncio.TimerHandle] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+    @property
+    def enabled(self) -> bool:
+        return self.threshold > 0
+
+    def start(self):
+        """Start on the running loop; must be called from the loop thread"""
+        if not self.enabled or self._thread is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._handle = self._loop.call_later(self.beat_interval, self._beat)
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._watch, name="loop-blocking-detector", daemon=True)
+        self._thread.start()
+        logger.info(f"Event loop blocking detector started: threshold {self.threshold * 1000:.0f} ms")
+
+    def stop(self):
+        if self._handle:
+            self._handle.cancel()
+            self._handle = None
+        if self._thread:
+            self._stopped.set()
+            self._thread.join(1)
+            self._thread = None
+
+    def _beat(self):
+        now = time.monotonic()
+        stalled = now - self._last_beat - self.beat_interval
+        if stalled >= self.threshold:
+            LOOP_BLOCKED_DURATION.observe(stalled)
+            if self._reported_beat == self._last_beat:
+                logger.warning(f"Event loop was blocked for {stalled * 1000:.0f} ms")
+        self._last_beat = now
+        self._handle = self._loop.call_later(self.beat_interval, self._beat)
+
+    def _watch(self):
+        while not self._stopped.wait(self.beat_interval):
+            beat = self._last_beat
+            stalled = time.monotonic() - beat - self.beat_interval
+            if stalled < self.threshold or self._reported_beat == beat:
+                continue
+            # One report per stall: the stack is taken while the loop is still stuck
+            self._reported_beat = beat
+            frame = sys._current_frames().get(self._loop_thread)
+            if frame is None:
+                continue
+            site = _blocking_site(frame)
+            LOOP_BLOCKED.inc(site=site)
+            stack = "".join(traceback.format_stack(frame, limit=self.stack_limit))
+            logger.warning(f"Event loop blocked for over {stalled * 1000:.0f} ms in {site}:\n{stack}")
+
+
+loop_blocking_detector = LoopBlockingDetector()
+
+
+async def _handle_metrics_connection(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    try:
+        request_line = await asyncio.wait_for(reader.readline(), timeout=5.0)
+        # Drain headers, we do not need them
+        while True:
+            line = await asyncio.wait_for(reader.readline(), timeout=5.0)
+            if not line or line in (b"\r\n", b"\n"):
+                break
+
+        parts = request_line.decode("latin-1").split()
+        path = parts[1].split("?", 1)[0] if len(parts) >= 2 else ""
+        if len(parts) >= 2 and parts[0] == "GET" and path == "/metrics":
+            body = REGISTRY.render().encode("utf-8")
+            status = "200 OK"
+            content_type = "text/plain; version=0.0.4; charset=utf-8"
+        else:
+            body = b"Not Found\n"
+            status = "404 Not Found"
+            content_type = "text/plain; charset=utf-8"
+
+        writer.write(
+            f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode("latin-1") + body
+        )
+        await writer.drain()
+    except Exception as e:
+        logger.debug(f"Metrics request failed: {e}")
+    finally:
+        writer.close()
+
+
+async def start_metrics_server(host: str, port: int) -> asyncio.AbstractServer:
+    """Start the /metrics HTTP endpoint on the running event loop"""
+    server = await asyncio.start_server(_handle_metrics_connection, host, port)
+    logger.info(f"Metrics endpoint listening on http://{host}:{port}/metrics")
+    return server
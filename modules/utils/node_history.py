@@ -0,0 +1,191 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+from modules.config import NODE_HISTORY_FILE, NODE_HISTORY_MAX_DAYS, NODE_HISTORY_TODAY_TTL
+
+logger = logging.getLogger(__name__)
+
+# Периоды истории на экранах серверов, дни
+HISTORY_PERIODS = (7, 30, 90)
+# Панель досчитывает вчерашний день еще некоторое время после полуночи (UTC)
+DAY_CLOSE_GRACE = timedelta(minutes=15)
+# Длинные диапазоны запрашиваются окнами, чтобы ограничение панели на длину диапазона
+# не превратилось в навсегда закэшированные пустые дни
+FETCH_WINDOW_DAYS = 31
+
+# Суточная строка сервера: (всего, скачано, отдано)
+DayRow = Tuple[int, int, int]
+
+
+def utc_now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def usage_range_params(start: date, end: date) -> Tuple[str, str]:
+    return f"{start.isoformat()}T00:00:00.000Z", f"{end.isoformat()}T23:59:59.999Z"
+
+
+class NodeHistory:
+    """Суточный трафик серверов из nodes/usage/range с постоянным кэшем закрытых дней.
+
+    Закрытые дни не меняются, поэтому хранятся в памяти и в файле и больше не
+    запрашиваются; сегодняшний (и вчерашний сразу после полуночи) день
+    перечитывается не чаще раза в today_ttl секунд.
+    Один запрос nodes/usage/range возвращает все серверы сразу, так что история
+    одного сервера и сравнение серверов читают один и тот же кэш.
+    """
+
+    def __init__(self, path: str = NODE_HISTORY_FILE, max_days: int = NODE_HISTORY_MAX_DAYS,
+                 today_ttl: float = NODE_HISTORY_TODAY_TTL):
+        self.path = path
+        self.max_days = max(max(HISTORY_PERIODS), max_days)
+        self.today_ttl = today_ttl
+        # Дата -> UUID сервера -> строка; присутствие даты означает, что день закрыт и загружен
+        self.closed: Dict[str, Dict[str, DayRow]] = {}
+        # Дни, которые еще могут измениться, с начала открытого хвоста
+        self.recent: Dict[str, Dict[str, DayRow]] = {}
+        self._recent_from: Optional[date] = None
+        self.names: Dict[str, str] = {}
+        self._recent_fetched = 0.0
+        self._loaded = False
+        self._lock = asyncio.Lock()
+
+    def _load(self):
+        if self._loaded:
+            return
+        self._loaded = True
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+            self.closed = {day: {uuid: tuple(row) for uuid, row in rows.items()} for day, rows in data.get("days", {}).items()}
+            self.names = data.get("names", {})
+            logger.info(f"Node history loaded: {len(self.closed)} closed days")
+        except Exception as e:
+            logger.error(f"Failed to load node history from {self.path}: {e}")
+
+    def _save(self):
+        if not self.path:
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"days": self.closed, "names": self.names}, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def _closed_before(self, now: datetime) -> date:
+        """Первый день, который еще может измениться"""
+        return (now - DAY_CLOSE_GRACE).date()
+
+    async def _fetch(self, start: date, end: date) -> Optional[Dict[str, Dict[str, DayRow]]]:
+        from modules.api.nodes import NodeAPI
+
+        usage = await NodeAPI.get_nodes_usage_by_range(*usage_range_params(start, end))
+        if not isinstance(usage, list):
+            return None
+        days: Dict[str, Dict[str, DayRow]] = {}
+        for entry in usage:
+            uuid = entry.get("nodeUuid")
+            day = str(entry.get("date") or "")[:10]
+            if not uuid or not start.isoformat() <= day <= end.isoformat():
+                continue
+            if entry.get("nodeName"):
+                self.names[uuid] = entry["nodeName"]
+            total, download, upload = days.setdefault(day, {}).get(uuid, (0, 0, 0))
+            days[day][uuid] = (
+                total + int(entry.get("total") or 0),
+                download + int(entry.get("totalDownload") or 0),
+                upload + int(entry.get("totalUpload") or 0),
+            )
+        return days
+
+    async def ensure(self, days: int):
+        """Догрузить недостающие закрытые дни и, если устарел, открытый хвост — одним запросом"""
+        async with self._lock:
+            self._load()
+            now = utc_now()
+            today = now.date()
+            open_from = self._closed_before(now)
+            start = today - timedelta(days=days - 1)
+
+            missing = [
+                start + timedelta(days=offset)
+                for offset in range((open_from - start).days)
+                if (start + timedelta(days=offset)).isoformat() not in self.closed
+            ]
+            recent_stale = (
+                self._recent_from != open_from
+                or time.monotonic() - self._recent_fetched >= self.today_ttl
+            )
+            if not missing and not recent_stale:
+                return
+
+            fetch_start = missing[0] if missing else open_from
+            windows = []
+            window_start = fetch_start
+            while window_start <= today:
+                window_end = min(today, window_start + timedelta(days=FETCH_WINDOW_DAYS - 1))
+                windows.append((window_start, window_end))
+                window_start = window_end + timedelta(days=1)
+            results = await asyncio.gather(*(self._fetch(a, b) for a, b in windows))
+            if any(result is None for result in results):
+                logger.warning(f"Node history fetch {fetch_start}..{today} failed")
+                return
+            fetched = {day: rows for result in results for day, rows in result.items()}
+
+            day = fetch_start
+            while day < open_from:
+                self.closed[day.isoformat()] = fetched.get(day.isoformat(), {})
+                day += timedelta(days=1)
+            self.recent = {}
+            while day <= today:
+                self.recent[day.isoformat()] = fetched.get(day.isoformat(), {})
+                day += timedelta(days=1)
+            self._recent_from = open_from
+            self._recent_fetched = time.monotonic()
+
+            if missing:
+                for stale in sorted(self.closed)[:-self.max_days]:
+                    del self.closed[stale]
+                try:
+                    await asyncio.to_thread(self._save)
+                except Exception as e:
+                    logger.error(f"Failed to save node history to {self.path}: {e}")
+                logger.info(f"Node history: fetched {fetch_start}..{today}, {len(missing)} closed days added")
+
+    def _day_rows(self, day: str) -> Dict[str, DayRow]:
+        if day in self.recent:
+            return self.recent[day]
+        return self.closed.get(day, {})
+
+    def _dates(self, days: int) -> List[str]:
+        today = utc_now().date()
+        return [(today - timedelta(days=offset)).isoformat() for offset in range(days - 1, -1, -1)]
+
+    async def series(self, node_uuid: str, days: int = 7) -> List[Tuple[str, DayRow]]:
+        """Суточные строки сервера от старых к новым"""
+        await self.ensure(days)
+        return [(day, self._day_rows(day).get(node_uuid, (0, 0, 0))) for day in self._dates(days)]
+
+    async def totals(self, days: int = 7) -> Dict[str, DayRow]:
+        """Сумма по каждому серверу за период — для сравнения серверов"""
+        await self.ensure(days)
+        totals: Dict[str, list] = {}
+        for day in self._dates(days):
+            for uuid, row in self._day_rows(day).items():
+                acc = totals.setdefault(uuid, [0, 0, 0])
+                for i, value in enumerate(row):
+                    acc[i] += value
+        return {uuid: tuple(row) for uuid, row in totals.items()}
+
+
+# Глобальный кэш истории трафика серверов
+node_history = NodeHistory()
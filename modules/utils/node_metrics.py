@@ -0,0 +1,186 @@
+import asyncio
+import logging
+import re
+import time
+from typing import Dict, List, Optional
+
+from modules.config import NODE_METRICS_TTL
+
+logger = logging.getLogger(__name__)
+
+# Множители единиц, в которых панель отдает размеры строками ("1.01 GB", "512 MiB")
+SIZE_UNITS = {
+    "": 1, "B": 1,
+    "KB": 1024, "KIB": 1024,
+    "MB": 1024 ** 2, "MIB": 1024 ** 2,
+    "GB": 1024 ** 3, "GIB": 1024 ** 3,
+    "TB": 1024 ** 4, "TIB": 1024 ** 4,
+    "PB": 1024 ** 5, "PIB": 1024 ** 5,
+}
+SIZE_PATTERN = re.compile(r"^\s*([-+]?\d+(?:[.,]\d+)?)\s*([a-zA-Z]*)\s*$")
+
+
+def parse_size(value) -> int:
+    """Размер в байтах из числа или строки вида "1.01 GB"; 0, если разобрать не удалось"""
+    if value is None or isinstance(value, bool):
+        return 0
+    if isinstance(value, (int, float)):
+        return int(value)
+    match = SIZE_PATTERN.match(str(value))
+    if not match:
+        return 0
+    multiplier = SIZE_UNITS.get(match.group(2).upper())
+    if multiplier is None:
+        return 0
+    return int(float(match.group(1).replace(",", ".")) * multiplier)
+
+
+def _sum_stats(stats: Optional[list]) -> tuple:
+    upload = download = 0
+    for item in stats or []:
+        upload += parse_size(item.get("upload"))
+        download += parse_size(item.get("download"))
+    return upload, download
+
+
+class NodeMetricsSnapshot:
+    """Серверы вместе с system/nodes/metrics и system/stats/nodes, размеры уже в байтах.
+
+    К каждому серверу добавлены числовые поля totalRamBytes, inboundUploadBytes,
+    inboundDownloadBytes, outboundUploadBytes, outboundDownloadBytes и sevenDaysBytes;
+    trafficUsedBytes, trafficLimitBytes и usersOnline приведены к int.
+    """
+
+    def __init__(self, nodes: List[dict], metrics: Optional[dict] = None, seven_days: Optional[dict] = None, fetched_at: Optional[float] = None):
+        self.fetched_at = fetched_at or time.time()
+
+        # Суточный трафик за 7 дней: имя сервера -> дата -> байты
+        self.seven_days: Dict[str, Dict[str, int]] = {}
+        for item in (seven_days or {}).get("lastSevenDays") or []:
+            days = self.seven_days.setdefault(item.get("nodeName"), {})
+            date = str(item.get("date") or "")[:10]
+            days[date] = days.get(date, 0) + parse_size(item.get("totalBytes"))
+
+        metrics_by_uuid = {
+            item.get("nodeUuid"): item
+            for item in (metrics or {}).get("nodes") or []
+            if item.get("nodeUuid")
+        }
+
+        self.nodes: List[dict] = [self._normalize(node, metrics_by_uuid.get(node.get("uuid"))) for node in nodes or []]
+        self.by_uuid: Dict[str, dict] = {node.get("uuid"): node for node in self.nodes}
+        self.totals = self._totals()
+
+    def _normalize(self, node: dict, metrics: Optional[dict]) -> dict:
+        node = dict(node)
+        node["totalRamBytes"] = parse_size(node.get("totalRam"))
+        node["trafficUsedBytes"] = parse_size(node.get("trafficUsedBytes"))
+        if node.get("trafficLimitBytes") is not None:
+            node["trafficLimitBytes"] = parse_size(node.get("trafficLimitBytes"))
+        if metrics:
+            node["usersOnline"] = metrics.get("usersOnline", node.get("usersOnline"))
+            node["inboundUploadBytes"], node["inboundDownloadBytes"] = _sum_stats(metrics.get("inboundsStats"))
+            node["outboundUploadBytes"], node["outboundDownloadBytes"] = _sum_stats(metrics.get("outboundsStats"))
+        if node.get("usersOnline") is not None:
+            node["usersOnline"] = int(node["usersOnline"] or 0)
+        days = self.seven_days.get(node.get("name"))
+        if days is not None:
+            node["sevenDaysBytes"] = sum(days.values())
+        return node
+
+    def _totals(self) -> dict:
+        nodes = self.nodes
+        return {
+            "nodes": len(nodes),
+            "connected": sum(1 for node in nodes if node.get("isConnected")),
+            "online": sum(1 for node in nodes if node.get("isNodeOnline")),
+            "xray_running": sum(1 for node in nodes if node.get("isXrayRunning")),
+            "disabled": sum(1 for node in nodes if node.get("isDisabled")),
+            "ram_bytes": sum(node["totalRamBytes"] for node in nodes),
+            "cpu_cores": sum(node.get("cpuCount") or 0 for node in nodes),
+            "traffic_used": sum(node["trafficUsedBytes"] for node in nodes),
+            "traffic_limit": sum(node.get("trafficLimitBytes") or 0 for node in nodes),
+            "users_online": sum(node.get("usersOnline") or 0 for node in nodes),
+            "seven_days_bytes": sum(sum(days.values()) for days in self.seven_days.values()),
+        }
+
+
+class NodeMetrics:
+    """Кэш метрик серверов с коротким TTL.
+
+    nodes, system/nodes/metrics и system/stats/nodes запрашиваются одним
+    параллельным пакетом; одновременные запросы экранов ждут одну и ту же загрузку.
+    """
+
+    def __init__(self, ttl: float = NODE_METRICS_TTL):
+        self.ttl = ttl
+        self._snapshot: Optional[NodeMetricsSnapshot] = None
+        self._expires_at = 0.0
+        self._lock = asyncio.Lock()
+
+    def invalidate(self):
+        """Сбросить кэш после изменения серверов"""
+        self._expires_at = 0.0
+
+    def _fresh(self) -> Optional[NodeMetricsSnapshot]:
+        if self._snapshot is not None and time.monotonic() < self._expires_at:
+            return self._snapshot
+        return None
+
+    async def get(self, force: bool = False) -> Optional[NodeMetricsSnapshot]:
+        """Снимок метрик; None, если панель не вернула список серверов"""
+        if not force:
+            snapshot = self._fresh()
+            if snapshot is not None:
+                return snapshot
+
+        async with self._lock:
+            # Пока ждали блокировку, снимок мог обновить другой экран
+            snapshot = None if force else self._fresh()
+            if snapshot is not None:
+                return snapshot
+            return await self._fetch()
+
+    async def _fetch(self) -> Optional[NodeMetricsSnapshot]:
+        from modules.api.nodes import NodeAPI
+        from modules.api.system import SystemAPI
+
+        started = time.monotonic()
+        nodes, metrics, seven_days = await asyncio.gather(
+            NodeAPI.get_all_nodes(),
+            SystemAPI.get_nodes_metrics(),
+            SystemAPI.get_nodes_statistics(),
+            return_exceptions=True,
+        )
+        if isinstance(nodes, Exception) or not isinstance(nodes, list):
+            if isinstance(nodes, Exception):
+                logger.error(f"Failed to fetch nodes: {nodes}")
+            return None
+        if not isinstance(metrics, dict):
+            logger.warning(f"Nodes metrics unavailable: {metrics}")
+            metrics = None
+        if not isinstance(seven_days, dict):
+            logger.warning(f"Nodes seven-day stats unavailable: {seven_days}")
+            seven_days = None
+
+        snapshot = NodeMetricsSnapshot(nodes, metrics, seven_days)
+        self._snapshot = snapshot
+        self._expires_at = time.monotonic() + self.ttl
+        logger.debug(f"Node metrics refreshed: {len(snapshot.nodes)} nodes in {time.monotonic() - started:.3f}s")
+        return snapshot
+
+    async def get_nodes(self) -> Optional[List[dict]]:
+        snapshot = await self.get()
+        return snapshot.nodes if snapshot else None
+
+    async def get_node(self, uuid: str) -> Optional[dict]:
+        """Сервер из снимка; если его там нет (новый сервер) — напрямую из панели"""
+        snapshot = await self.get()
+        if snapshot and uuid in snapshot.by_uuid:
+            return snapshot.by_uuid[uuid]
+        from modules.api.nodes import NodeAPI
+        return await NodeAPI.get_node_by_uuid(uuid)
+
+
+# Глобальный кэш метрик серверов
+node_metrics = NodeMetrics()
@@ -0,0 +1,170 @@
+import asyncio
+import logging
+import time
+from array import array
+from typing import Dict, List, Optional
+
+from modules.config import NODE_USAGE_HISTORY_MINUTES, NODE_USAGE_POLL_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+SPARK_CHARS = "▁▂▃▄▅▆▇█"
+
+
+class RingBuffer:
+    """Фиксированный буфер чисел на array('d'): новые значения вытесняют самые старые"""
+
+    def __init__(self, capacity: int):
+        self.capacity = max(1, capacity)
+        self._data = array("d", bytes(8 * self.capacity))
+        self._next = 0
+        self._count = 0
+
+    def append(self, value: float):
+        self._data[self._next] = value
+        self._next = (self._next + 1) % self.capacity
+        self._count = min(self._count + 1, self.capacity)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def values(self) -> List[float]:
+        """Значения от старых к новым"""
+        if self._count < self.capacity:
+            return self._data[:self._count].tolist()
+        return (self._data[self._next:] + self._data[:self._next]).tolist()
+
+
+def sparkline(values: List[float], width: int = 24) -> str:
+    """Строка из блоков ▁..█; длинные ряды усредняются до width точек"""
+    if not values:
+        return ""
+    if len(values) > width:
+        step = len(values) / width
+        values = [
+            sum(values[int(i * step):int((i + 1) * step)]) / max(1, int((i + 1) * step) - int(i * step))
+            for i in range(width)
+        ]
+    low, high = min(values), max(values)
+    if high == low:
+        return SPARK_CHARS[0] * len(values)
+    scale = (len(SPARK_CHARS) - 1) / (high - low)
+    return "".join(SPARK_CHARS[int((value - low) * scale)] for value in values)
+
+
+class NodeSeries:
+    """История скоростей одного сервера"""
+
+    def __init__(self, capacity: int):
+        self.timestamps = RingBuffer(capacity)
+        self.download = RingBuffer(capacity)
+        self.upload = RingBuffer(capacity)
+        self.total = RingBuffer(capacity)
+        self.last: Optional[dict] = None
+
+    def add(self, timestamp: float, reading: dict):
+        self.timestamps.append(timestamp)
+        self.download.append(float(reading.get("downloadSpeedBps") or 0))
+        self.upload.append(float(reading.get("uploadSpeedBps") or 0))
+        self.total.append(float(reading.get("totalSpeedBps") or 0))
+        self.last = reading
+
+    def summary(self) -> Optional[dict]:
+        """Мин/сред/макс общей скорости, спарклайн и охват окна в секундах"""
+        values = self.total.values()
+        if not values:
+            return None
+        timestamps = self.timestamps.values()
+        return {
+            "min": min(values),
+            "avg": sum(values) / len(values),
+            "max": max(values),
+            "samples": len(values),
+            "span": timestamps[-1] - timestamps[0],
+            "sparkline": sparkline(values),
+        }
+
+
+class NodeUsagePoller:
+    """Фоновый опрос nodes/usage/realtime в кольцевые буферы по серверам"""
+
+    def __init__(self, interval: float = NODE_USAGE_POLL_INTERVAL, history_minutes: float = NODE_USAGE_HISTORY_MINUTES):
+        self.interval = interval
+        self.capacity = max(1, int(history_minutes * 60 / interval)) if interval > 0 else 1
+        self.nodes: Dict[str, NodeSeries] = {}
+        self.last_poll: Optional[float] = None
+        self._latest: Optional[list] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.interval > 0
+
+    def start(self):
+        if self.enabled and self._task is None:
+            self._task = asyncio.create_task(self._run())
+            logger.info(f"Node usage poller started: every {self.interval}s, {self.capacity} samples per node")
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def record(self, usage: list, timestamp: Optional[float] = None):
+        """Добавить срез nodes/usage/realtime в историю"""
+        timestamp = timestamp or time.time()
+        for reading in usage:
+            uuid = reading.get("nodeUuid")
+            if not uuid:
+                continue
+            series = self.nodes.get(uuid)
+            if series is None:
+                series = self.nodes[uuid] = NodeSeries(self.capacity)
+            series.add(timestamp, reading)
+        self._latest = usage
+        self.last_poll = timestamp
+
+    async def poll_once(self) -> Optional[list]:
+        from modules.api.nodes import NodeAPI
+
+        usage = await NodeAPI.get_nodes_realtime_usage()
+        if isinstance(usage, list):
+            self.record(usage)
+        return usage
+
+    async def _run(self):
+        next_tick = time.monotonic()
+        while True:
+            try:
+                await self.poll_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Node usage poll failed: {e}")
+            # Интервал отсчитывается от расписания, а не от конца запроса, чтобы не копился дрейф
+            next_tick += self.interval
+            await asyncio.sleep(max(0.0, next_tick - time.monotonic()))
+
+    def latest(self) -> Optional[list]:
+        """Последний срез, если он не старше двух интервалов опроса"""
+        if self._latest is None or self.last_poll is None:
+            return None
+        if not self.enabled or time.time() - self.last_poll > self.interval * 2:
+            return None
+        return self._latest
+
+    async def get_realtime_usage(self) -> Optional[list]:
+        """Текущая нагрузка: из последнего опроса или напрямую из панели"""
+        usage = self.latest()
+        if usage is not None:
+            return usage
+        return await self.poll_once()
+
+    def summary(self, node_uuid: str) -> Optional[dict]:
+        series = self.nodes.get(node_uuid)
+        return series.summary() if series else None
+
+
+# Глобальный опросчик нагрузки серверов
+node_usage_poller = NodeUsagePoller()
@@ -0,0 +1,209 @@
+import asyncio
+import logging
+import time
+from typing import Dict, List, Optional, Tuple
+
+from modules.config import (
+    ADMIN_USER_IDS,
+    NODE_WATCHDOG_CONFIRM_POLLS,
+    NODE_WATCHDOG_COOLDOWN,
+    NODE_WATCHDOG_FAST_INTERVAL,
+    NODE_WATCHDOG_INTERVAL,
+)
+
+logger = logging.getLogger(__name__)
+
+# Отслеживаемые флаги сервера -> (подпись при True, подпись при False)
+WATCHED_FLAGS = {
+    "isConnected": ("🟢 соединение восстановлено", "🔴 соединение потеряно"),
+    "isXrayRunning": ("🟢 Xray запущен", "🔴 Xray остановлен"),
+    "isDisabled": ("⏸ отключен в панели", "▶️ включен в панели"),
+}
+
+
+def node_flags(node: dict) -> Tuple[bool, ...]:
+    return tuple(bool(node.get(flag)) for flag in WATCHED_FLAGS)
+
+
+def describe_transition(old: Tuple[bool, ...], new: Tuple[bool, ...]) -> List[str]:
+    """Подписи изменившихся флагов"""
+    return [
+        labels[0] if now else labels[1]
+        for (flag, labels), was, now in zip(WATCHED_FLAGS.items(), old, new)
+        if was != now
+    ]
+
+
+class NodeHealth:
+    """Состояние одного сервера: подтвержденные флаги, кандидат на смену и последнее оповещение"""
+
+    def __init__(self, name: str, flags: Tuple[bool, ...]):
+        self.name = name
+        self.stable = flags
+        self.alerted = flags
+        self.candidate: Optional[Tuple[bool, ...]] = None
+        self.candidate_polls = 0
+        self.last_alert = 0.0
+        # Подтвержденные смены состояния с последнего оповещения
+        self.flaps = 0
+
+    @property
+    def settling(self) -> bool:
+        """Есть неподтвержденная смена или подавленное оповещение"""
+        return self.candidate is not None or self.stable != self.alerted
+
+
+class NodeWatchdog:
+    """Фоновый опрос nodes с оповещением администраторов о смене состояния серверов.
+
+    Срабатывание по фронту: оповещение уходит только при смене isConnected,
+    isXrayRunning или isDisabled, причем новое состояние должно продержаться
+    confirm_polls опросов подряд. Для одного сервера оповещения не чаще раза
+    в cooldown секунд; если за это время сервер вернулся в прежнее состояние,
+    оповещения не будет. Пока есть неподтвержденные смены, опрос идет с
+    интервалом fast_interval.
+    """
+
+    def __init__(
+        self,
+        interval: float = NODE_WATCHDOG_INTERVAL,
+        fast_interval: float = NODE_WATCHDOG_FAST_INTERVAL,
+        confirm_polls: int = NODE_WATCHDOG_CONFIRM_POLLS,
+        cooldown: float = NODE_WATCHDOG_COOLDOWN,
+    ):
+        self.interval = interval
+        self.fast_interval = min(fast_interval, interval) if fast_interval > 0 else interval
+        self.confirm_polls = max(1, confirm_polls)
+        self.cooldown = cooldown
+        self.nodes: Dict[str, NodeHealth] = {}
+        # Серверы на плановом обслуживании (поэтапный перезапуск): их смены не учитываются
+        self.maintenance: set = set()
+        self.bot = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.interval > 0
+
+    def start(self, bot):
+        if self.enabled and self._task is None:
+            if not ADMIN_USER_IDS:
+                logger.warning("Node watchdog is enabled but ADMIN_USER_IDS is empty, alerts will not be sent")
+            self.bot = bot
+            self._task = asyncio.create_task(self._run())
+            logger.info(f"Node watchdog started: every {self.interval}s ({self.fast_interval}s while nodes are unstable)")
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def next_interval(self) -> float:
+        if any(health.settling for health in self.nodes.values()):
+            return self.fast_interval
+        return self.interval
+
+    def observe(self, nodes: List[dict], now: Optional[float] = None) -> List[str]:
+        """Учесть очередной снимок серверов; вернуть строки оповещения"""
+        now = now if now is not None else time.monotonic()
+        seen = set()
+        lines = []
+        for node in nodes:
+            uuid = node.get("uuid")
+            if not uuid:
+                continue
+            seen.add(uuid)
+            if uuid in self.maintenance:
+                continue
+            flags = node_flags(node)
+            health = self.nodes.get(uuid)
+            if health is None:
+                # Первый опрос и новые серверы задают исходное состояние без оповещения
+                self.nodes[uuid] = NodeHealth(node.get("name") or uuid, flags)
+                continue
+            health.name = node.get("name") or health.name
+
+            if flags == health.stable:
+                health.candidate = None
+                health.candidate_polls = 0
+            elif flags == health.candidate:
+                health.candidate_polls += 1
+            else:
+                health.candidate = flags
+                health.candidate_polls = 1
+
+            if health.candidate is not None and health.candidate_polls >= self.confirm_polls:
+                health.stable = health.candidate
+                health.candidate = None
+                health.candidate_polls = 0
+                health.flaps += 1
+
+            line = self._alert_line(health, now)
+            if line:
+                lines.append(line)
+
+        for uuid in set(self.nodes) - seen:
+            del self.nodes[uuid]
+        return lines
+
+    def _alert_line(self, health: NodeHealth, now: float) -> Optional[str]:
+        if health.stable == health.alerted:
+            if health.flaps:
+                logger.info(f"Node {health.name} flapped {health.flaps} times and settled back, alert suppressed")
+                health.flaps = 0
+            return None
+        if health.last_alert and now - health.last_alert < self.cooldown:
+            return None
+
+        from modules.utils.formatters import escape_markdown
+
+        line = f"*{escape_markdown(health.name)}*: {', '.join(describe_transition(health.alerted, health.stable))}"
+        if health.flaps > 1:
+            line += f" (переключений: {health.flaps})"
+        health.alerted = health.stable
+        health.last_alert = now
+        health.flaps = 0
+        return line
+
+    async def poll_once(self) -> List[str]:
+        from modules.api.nodes import NodeAPI
+
+        nodes = await NodeAPI.get_all_nodes()
+        if not isinstance(nodes, list):
+            logger.warning("Node watchdog: panel did not return nodes")
+            return []
+        lines = self.observe(nodes)
+        if lines:
+            from modules.utils.node_metrics import node_metrics
+            node_metrics.invalidate()
+            await self.notify(lines)
+        return lines
+
+    async def notify(self, lines: List[str]):
+        from modules.localization import resolve_language, translate_text
+
+        text = "🛰 *Мониторинг серверов*\n\n" + "\n".join(lines)
+        for admin_id in ADMIN_USER_IDS:
+            try:
+                await self.bot.send_message(
+                    chat_id=admin_id,
+                    text=translate_text(text, resolve_language(admin_id, admin_id)),
+                    parse_mode="Markdown",
+                )
+            except Exception as e:
+                logger.warning(f"Failed to send node alert to {admin_id}: {e}")
+
+    async def _run(self):
+        while True:
+            try:
+                await self.poll_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Node watchdog poll failed: {e}")
+            await asyncio.sleep(self.next_interval())
+
+
+# Глобальный монитор состояния серверов
+node_watchdog = NodeWatchdog()
@@ -0,0 +1,240 @@
+import asyncio
+import logging
+import secrets
+import time
+from typing import Dict, List, Optional
+
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.error import BadRequest, RetryAfter
+
+from modules.config import (
+    BULK_PROGRESS_INTERVAL,
+    ROLLING_RESTART_POLL_INTERVAL,
+    ROLLING_RESTART_SETTLE,
+    ROLLING_RESTART_TIMEOUT,
+)
+from modules.localization import localize_markup, resolve_language, translate_text
+from modules.utils.formatters import escape_markdown
+
+logger = logging.getLogger(__name__)
+
+CANCEL_ROLLING_PREFIX = "cancel_rolling_"
+
+NODE_PENDING = "pending"
+NODE_RESTARTING = "restarting"
+NODE_UP = "up"
+NODE_FAILED = "failed"
+NODE_SKIPPED = "skipped"
+
+STATE_LABELS = {
+    NODE_PENDING: "⏳",
+    NODE_RESTARTING: "🔄",
+    NODE_UP: "✅",
+    NODE_FAILED: "❌",
+    NODE_SKIPPED: "⏭",
+}
+
+
+def node_healthy(node: Optional[dict]) -> bool:
+    return bool(node and node.get("isConnected") and node.get("isXrayRunning"))
+
+
+def cancel_rolling_keyboard(restart_id: str) -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup([[InlineKeyboardButton("⏹ Остановить перезапуск", callback_data=f"{CANCEL_ROLLING_PREFIX}{restart_id}")]])
+
+
+class RollingRestart:
+    """Поэтапный перезапуск: batch_size серверов за раз, следующий этап —
+    только когда все серверы текущего снова подключены и Xray запущен.
+
+    Если этап не поднялся за timeout секунд, остальные серверы не трогаем,
+    чтобы не уронить еще больше пользователей.
+    """
+
+    def __init__(self, nodes: List[dict], batch_size: int, chat_id: int, message_id: int, user_id: Optional[int] = None):
+        self.id = secrets.token_hex(4)
+        self.names: Dict[str, str] = {node["uuid"]: node.get("name") or node["uuid"] for node in nodes}
+        uuids = list(self.names)
+        self.batch_size = max(1, batch_size)
+        self.batches = [uuids[i:i + self.batch_size] for i in range(0, len(uuids), self.batch_size)]
+        self.states: Dict[str, str] = {uuid: NODE_PENDING for uuid in uuids}
+        self.errors: Dict[str, str] = {}
+        self.current_batch = 0
+        self.chat_id = chat_id
+        self.message_id = message_id
+        self.language = resolve_language(user_id, chat_id)
+        self.cancel_event = asyncio.Event()
+        self.started = time.monotonic()
+        self.stopped_reason: Optional[str] = None
+        self._next_edit = 0.0
+        self._last_text = None
+
+    def format_progress(self, finished: bool = False) -> str:
+        done = sum(1 for state in self.states.values() if state == NODE_UP)
+        if finished:
+            title = "✅ Поэтапный перезапуск завершен" if done == len(self.states) else "⚠️ Поэтапный перезапуск остановлен"
+        else:
+            title = f"🔁 Поэтапный перезапуск: этап {self.current_batch + 1}/{len(self.batches)}"
+        message = f"*{title}*\n\n"
+        message += f"Серверов в сети: {done}/{len(self.states)}\n"
+        message += f"За раз: {self.batch_size}\n"
+        message += f"Прошло секунд: {int(time.monotonic() - self.started)}\n\n"
+        for index, batch in enumerate(self.batches):
+            message += f"{index + 1}. " + ", ".join(
+                f"{STATE_LABELS[self.states[uuid]]} {escape_markdown(self.names[uuid])}" for uuid in batch
+            ) + "\n"
+        if self.errors:
+            message += "\n"
+            for uuid, error in self.errors.items():
+                message += f"❌ {escape_markdown(self.names[uuid])}: {escape_markdown(error)}\n"
+        if finished and self.stopped_reason:
+            message += f"\n{self.stopped_reason}\n"
+        return message
+
+    async def _edit(self, bot, force: bool = False, finished: bool = False):
+        now = time.monotonic()
+        if not force and now < self._next_edit:
+            return
+        self._next_edit = now + BULK_PROGRESS_INTERVAL
+        text = translate_text(self.format_progress(finished), self.language)
+        if text == self._last_text:
+            return
+        if finished:
+            markup = InlineKeyboardMarkup([[InlineKeyboardButton("🔙 К серверам", callback_data="back_to_nodes")]])
+        else:
+            markup = cancel_rolling_keyboard(self.id)
+        try:
+            await bot.edit_message_text(
+                text=text,
+                chat_id=self.chat_id,
+                message_id=self.message_id,
+                reply_markup=localize_markup(None, markup, self.language),
+                parse_mode="Markdown",
+            )
+            self._last_text = text
+        except RetryAfter as e:
+            self._next_edit = time.monotonic() + float(e.retry_after)
+        except BadRequest as e:
+            if "not modified" not in str(e).lower():
+                logger.warning(f"Failed to update rolling restart message: {e}")
+        except Exception as e:
+            logger.warning(f"Failed to update rolling restart message: {e}")
+
+    async def _restart_batch(self, batch: List[str]) -> List[str]:
+        """Отправить команды перезапуска; вернуть серверы, принявшие команду"""
+        from modules.api.nodes import NodeAPI
+
+        results = await asyncio.gather(*(NodeAPI.restart_node(uuid) for uuid in batch), return_exceptions=True)
+        accepted = []
+        for uuid, result in zip(batch, results):
+            if isinstance(result, dict) and result.get("eventSent"):
+                self.states[uuid] = NODE_RESTARTING
+                accepted.append(uuid)
+            else:
+                self.states[uuid] = NODE_FAILED
+                self.errors[uuid] = str(result) if isinstance(result, Exception) else "панель не приняла команду"
+        return accepted
+
+    async def _wait_healthy(self, bot, batch: List[str]) -> bool:
+        """Ждать, пока все серверы этапа подключатся и запустят Xray"""
+        from modules.api.nodes import NodeAPI
+
+        # Сразу после команды сервер еще может числиться в сети, поэтому сначала пауза
+        await self._sleep(ROLLING_RESTART_SETTLE)
+        deadline = time.monotonic() + ROLLING_RESTART_TIMEOUT
+        pending = set(batch)
+        while pending and not self.cancel_event.is_set():
+            nodes = await NodeAPI.get_all_nodes()
+            if isinstance(nodes, list):
+                by_uuid = {node.get("uuid"): node for node in nodes}
+                for uuid in list(pending):
+                    if node_healthy(by_uuid.get(uuid)):
+                        self.states[uuid] = NODE_UP
+                        pending.discard(uuid)
+            await self._edit(bot)
+            if not pending:
+                break
+            if time.monotonic() >= deadline:
+                for uuid in pending:
+                    self.states[uuid] = NODE_FAILED
+                    self.errors[uuid] = "не восстановился вовремя"
+                return False
+            await self._sleep(ROLLING_RESTART_POLL_INTERVAL)
+        return not pending
+
+    async def _sleep(self, seconds: float):
+        """Пауза, которую прерывает отмена"""
+        try:
+            await asyncio.wait_for(self.cancel_event.wait(), timeout=seconds)
+        except asyncio.TimeoutError:
+            pass
+
+    async def run(self, bot):
+        from modules.utils.node_metrics import node_metrics
+        from modules.utils.node_watchdog import node_watchdog
+
+        node_watchdog.maintenance.update(self.states)
+        try:
+            await self._edit(bot, force=True)
+            for index, batch in enumerate(self.batches):
+                self.current_batch = index
+                if self.cancel_event.is_set():
+                    self.stopped_reason = "⏹ Остановлено администратором"
+                    break
+                accepted = await self._restart_batch(batch)
+                await self._edit(bot, force=True)
+                healthy = bool(accepted) and await self._wait_healthy(bot, accepted)
+                if not healthy or len(accepted) < len(batch):
+                    if not self.cancel_event.is_set():
+                        self.stopped_reason = "⚠️ Этап не восстановился, оставшиеся серверы не перезапускались"
+                    break
+            if self.cancel_event.is_set() and not self.stopped_reason:
+                self.stopped_reason = "⏹ Остановлено администратором"
+            for uuid, state in self.states.items():
+                if state == NODE_PENDING:
+                    self.states[uuid] = NODE_SKIPPED
+            await self._edit(bot, force=True, finished=True)
+        except Exception as e:
+            logger.error(f"Rolling restart {self.id} failed: {e}", exc_info=True)
+            self.stopped_reason = "❌ Ошибка при перезапуске"
+            await self._edit(bot, force=True, finished=True)
+        finally:
+            node_watchdog.maintenance.difference_update(self.states)
+            node_metrics.invalidate()
+
+
+class RollingRestarts:
+    """Запущенные поэтапные перезапуски, чтобы их можно было остановить кнопкой"""
+
+    def __init__(self):
+        self.running: Dict[str, RollingRestart] = {}
+        self._tasks: set = set()
+
+    def start(self, bot, restart: RollingRestart) -> asyncio.Task:
+        self.running[restart.id] = restart
+        logger.info(f"Rolling restart {restart.id}: {len(restart.states)} nodes, {restart.batch_size} at a time")
+
+        async def run():
+            try:
+                await restart.run(bot)
+            finally:
+                self.running.pop(restart.id, None)
+
+        task = asyncio.create_task(run())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    def busy(self, uuids) -> bool:
+        """Какие-то из серверов уже перезапускаются другим поэтапным перезапуском"""
+        return any(uuid in restart.states for restart in self.running.values() for uuid in uuids)
+
+    def cancel(self, restart_id: str) -> Optional[RollingRestart]:
+        restart = self.running.get(restart_id)
+        if restart:
+            restart.cancel_event.set()
+        return restart
+
+
+# Глобальный реестр поэтапных перезапусков
+rolling_restarts = RollingRestarts()
@@ -8,8 +8,8 @@ from telegram import InlineKeyboardButton, InlineKeyboardMarkup
 
 from modules.api.users import UserAPI
 from modules.api.inbounds import InboundAPI
-from modules.api.nodes import NodeAPI
 from modules.utils.formatters import escape_markdown
+from modules.utils.node_metrics import node_metrics
 
 logger = logging.getLogger(__name__)
 
@@ -132,7 +132,7 @@ class SelectionHelper:
         Returns: (keyboard, nodes_data)
         """
         try:
-            response = await NodeAPI.get_all_nodes()
+            response = await node_metrics.get_nodes()
             if not response:
                 keyboard = []
                 if include_back:
@@ -324,7 +324,7 @@ class SelectionHelper:
         Smart node lookup - try to find node by name or UUID
         """
         try:
-            response = await NodeAPI.get_all_nodes()
+            response = await node_metrics.get_nodes()
             if not response:
                 return None
             
@@ -0,0 +1,35 @@
+from string import Formatter
+from typing import List
+
+
+class Template:
+    """Шаблон сообщения, скомпилированный один раз при импорте.
+
+    Синтаксис полей — как у str.format: {name} или {name:spec}. Шаблон
+    превращается в функцию с одним f-строковым выражением, поэтому при
+    рендере статические куски не копируются по отдельности, а все части
+    склеиваются за одно соединение строк. Экранирование делает вызывающий код.
+    """
+
+    __slots__ = ("source", "fields", "render")
+
+    def __init__(self, source: str):
+        self.source = source
+        self.fields: List[str] = []
+        body = []
+        for literal, field, spec, conversion in Formatter().parse(source):
+            body.append(literal.replace("{", "{{").replace("}", "}}"))
+            if field is None:
+                continue
+            if not field.isidentifier() or conversion or "{" in (spec or ""):
+                raise ValueError(f"Unsupported template field: {{{field}}}")
+            if field not in self.fields:
+                self.fields.append(field)
+            body.append(f"{{{field}:{spec}}}" if spec else f"{{{field}}}")
+        code = f"def render({', '.join(self.fields)}):\n    return f{''.join(body)!r}\n"
+        namespace = {}
+        exec(compile(code, f"<template {source[:40]!r}>", "exec"), namespace)
+        self.render = namespace["render"]
+
+    def __repr__(self):
+        return f"Template({self.source!r})"
@@ -0,0 +1,299 @@
+import asyncio
+import heapq
+import logging
+from bisect import bisect_right
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Set, Tuple
+
+from modules.config import (
+    ADMIN_USER_IDS,
+    USER_ALERT_DIGEST_HOUR,
+    USER_ALERT_EXPIRY_DAYS,
+    USER_ALERT_INTERVAL,
+    USER_ALERT_TRAFFIC_PERCENT,
+)
+from modules.utils.node_history import utc_now
+
+logger = logging.getLogger(__name__)
+
+DAY = 86400
+# Больше строк в одном сообщении не показываем, остальные — числом
+MAX_ALERT_LINES = 30
+
+
+def _to_timestamp(value) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(str(value).replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return None
+
+
+def _limit_lines(lines: List[str]) -> List[str]:
+    if len(lines) <= MAX_ALERT_LINES:
+        return lines
+    return lines[:MAX_ALERT_LINES] + [f"…и еще {len(lines) - MAX_ALERT_LINES}"]
+
+
+class UserMark:
+    """Последнее известное состояние пользователя и пройденные пороги"""
+
+    __slots__ = ("username", "raw", "expire_at", "expiry_stage", "used", "limit", "traffic_stage")
+
+    def __init__(self, username: str):
+        self.username = username
+        # Исходные поля панели: если не изменились, пользователя не трогаем
+        self.raw: Optional[tuple] = None
+        self.expire_at: Optional[float] = None
+        self.expiry_stage = 0
+        self.used = 0
+        self.limit = 0
+        self.traffic_stage = 0
+
+
+class UserAlerts:
+    """Фоновая проверка сроков подписки и израсходованного трафика пользователей.
+
+    Для каждого еще не пройденного порога срока есть min-heap по expireAt, так
+    что за проверку извлекаются только пользователи, чей порог наступил. Пороги
+    трафика хранятся индексом «число пройденных порогов -> пользователи» и
+    пересчитываются только у пользователей, чьи поля в панели изменились.
+    Пороги, пройденные до первой проверки, оповещений не дают.
+    """
+
+    def __init__(
+        self,
+        interval: float = USER_ALERT_INTERVAL,
+        expiry_days: List[int] = USER_ALERT_EXPIRY_DAYS,
+        traffic_percent: List[int] = USER_ALERT_TRAFFIC_PERCENT,
+        digest_hour: int = USER_ALERT_DIGEST_HOUR,
+    ):
+        self.interval = interval
+        # Дни до окончания по убыванию; последний порог — само окончание подписки
+        self.expiry_days = sorted({day for day in expiry_days if day > 0}, reverse=True) + [0]
+        self.traffic_percent = sorted({percent for percent in traffic_percent if percent > 0})
+        self.digest_hour = digest_hour
+        self.users: Dict[str, UserMark] = {}
+        # expiry_heaps[i] — пользователи, у которых следующий порог expiry_days[i]: (expireAt, uuid)
+        self.expiry_heaps: List[List[Tuple[float, str]]] = [[] for _ in self.expiry_days]
+        # traffic_index[i] — пользователи, прошедшие i порогов трафика
+        self.traffic_index: List[Set[str]] = [set() for _ in range(len(self.traffic_percent) + 1)]
+        self.next_digest: Optional[datetime] = None
+        self.bot = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.interval > 0
+
+    def start(self, bot):
+        if self.enabled and self._task is None:
+            if not ADMIN_USER_IDS:
+                logger.warning("User alerts are enabled but ADMIN_USER_IDS is empty, alerts will not be sent")
+            self.bot = bot
+            self._task = asyncio.create_task(self._run())
+            logger.info(f"User alerts started: every {self.interval}s, expiry days {self.expiry_days[:-1]}, traffic {self.traffic_percent}%")
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def expiry_stage(self, expire_at: Optional[float], now: float) -> int:
+        """Сколько порогов срока уже наступило; без даты окончания — все"""
+        if expire_at is None:
+            return len(self.expiry_days)
+        return sum(1 for day in self.expiry_days if expire_at - day * DAY <= now)
+
+    def traffic_stage(self, used: int, limit: int) -> int:
+        if limit <= 0:
+            return 0
+        return bisect_right(self.traffic_percent, used * 100 / limit)
+
+    def _place_expiry(self, uuid: str, mark: UserMark, expire_at: Optional[float], now: float):
+        """Новая дата окончания: пороги, которые уже наступили, считаются пройденными без оповещения"""
+        mark.expire_at = expire_at
+        mark.expiry_stage = self.expiry_stage(expire_at, now)
+        if mark.expiry_stage < len(self.expiry_days):
+            heapq.heappush(self.expiry_heaps[mark.expiry_stage], (expire_at, uuid))
+
+    def _place_traffic(self, uuid: str, mark: UserMark, stage: int):
+        self.traffic_index[mark.traffic_stage].discard(uuid)
+        mark.traffic_stage = stage
+        self.traffic_index[stage].add(uuid)
+
+    def observe(self, users: List[dict], now: float) -> List[str]:
+        """Учесть очередной список пользователей; вернуть строки оповещения"""
+        from modules.utils.formatters import escape_markdown, format_bytes
+
+        lines = []
+        seen = set()
+        for user in users:
+            uuid = user.get("uuid")
+            # Отключенные пользователи не интересны, их состояние забываем
+            if not uuid or user.get("status") == "DISABLED":
+                continue
+            seen.add(uuid)
+            raw = (user.get("expireAt"), user.get("usedTrafficBytes"), user.get("trafficLimitBytes"))
+            mark = self.users.get(uuid)
+            if mark is not None and mark.raw == raw:
+                continue
+
+            new = mark is None
+            if new:
+                mark = self.users[uuid] = UserMark(user.get("username") or uuid)
+            mark.username = user.get("username") or mark.username
+
+            expire_at = _to_timestamp(raw[0])
+            if new or expire_at != mark.expire_at:
+                self._place_expiry(uuid, mark, expire_at, now)
+
+            used, limit = int(raw[1] or 0), int(raw[2] or 0)
+            stage = self.traffic_stage(used, limit)
+            if not new and stage > mark.traffic_stage:
+                lines.append(
+                    f"📶 *{escape_markdown(mark.username)}*: израсходовано трафика "
+                    f"{self.traffic_percent[stage - 1]}%+ ({format_bytes(used)} / {format_bytes(limit)})"
+                )
+            if new or stage != mark.traffic_stage:
+                self._place_traffic(uuid, mark, stage)
+            mark.used, mark.limit, mark.raw = used, limit, raw
+
+        for uuid in set(self.users) - seen:
+            self.traffic_index[self.users.pop(uuid).traffic_stage].discard(uuid)
+
+        lines.extend(self._pop_expiry(now))
+        self._compact()
+        return lines
+
+    def _compact(self):
+        """Убрать устаревшие записи из куч, если их накопилось больше живых"""
+        for stage, heap in enumerate(self.expiry_heaps):
+            if len(heap) <= 2 * len(self.users) + 64:
+                continue
+            live = [
+                (expire_at, uuid) for expire_at, uuid in heap
+                if uuid in self.users and self.users[uuid].expire_at == expire_at and self.users[uuid].expiry_stage == stage
+            ]
+            heapq.heapify(live)
+            self.expiry_heaps[stage] = live
+
+    def _pop_expiry(self, now: float) -> List[str]:
+        """Извлечь пользователей, у которых наступил следующий порог срока"""
+        from modules.utils.formatters import escape_markdown
+
+        lines = []
+        for stage, (day, heap) in enumerate(zip(self.expiry_days, self.expiry_heaps)):
+            horizon = now + day * DAY
+            while heap and heap[0][0] <= horizon:
+                expire_at, uuid = heapq.heappop(heap)
+                mark = self.users.get(uuid)
+                # Устаревшая запись: пользователя удалили или срок изменился
+                if mark is None or mark.expire_at != expire_at or mark.expiry_stage != stage:
+                    continue
+                self._place_expiry(uuid, mark, expire_at, now)
+                date = datetime.fromtimestamp(expire_at, timezone.utc).strftime("%Y-%m-%d")
+                if mark.expiry_stage == len(self.expiry_days):
+                    lines.append(f"⛔ *{escape_markdown(mark.username)}*: подписка истекла {date}")
+                else:
+                    days_left = max(1, int(-(-(expire_at - now) // DAY)))
+                    lines.append(f"⏳ *{escape_markdown(mark.username)}*: подписка истекает {date} (осталось дней: {days_left})")
+        return lines
+
+    def digest(self, now: float) -> str:
+        """Сводка из индексов: пользователи с наступившим порогом срока и трафика"""
+        from modules.utils.formatters import escape_markdown
+
+        expiring = sorted(
+            (expire_at, uuid)
+            for stage, heap in enumerate(self.expiry_heaps)
+            if stage > 0
+            for expire_at, uuid in heap
+            if uuid in self.users and self.users[uuid].expire_at == expire_at and self.users[uuid].expiry_stage == stage
+        )
+        message = "📋 *Ежедневная сводка по пользователям*\n\n"
+        if expiring:
+            message += f"⏳ *Истекают в ближайшие дни:* {len(expiring)}\n"
+            message += "\n".join(_limit_lines([
+                f"  • {escape_markdown(self.users[uuid].username)} — "
+                f"{datetime.fromtimestamp(expire_at, timezone.utc).strftime('%Y-%m-%d')}"
+                for expire_at, uuid in expiring
+            ])) + "\n\n"
+
+        low_traffic = sorted(
+            (self.users[uuid] for stage in range(1, len(self.traffic_index)) for uuid in self.traffic_index[stage]),
+            key=lambda mark: mark.used / mark.limit,
+            reverse=True,
+        )
+        if low_traffic:
+            message += f"📶 *Трафик на исходе:* {len(low_traffic)}\n"
+            message += "\n".join(_limit_lines([
+                f"  • {escape_markdown(mark.username)} — {int(mark.used * 100 / mark.limit)}%"
+                for mark in low_traffic
+            ])) + "\n"
+
+        if not expiring and not low_traffic:
+            message += "✅ Нет пользователей с истекающей подпиской или трафиком на исходе"
+        return message
+
+    def _schedule_digest(self, current: datetime):
+        if not 0 <= self.digest_hour <= 23:
+            self.next_digest = None
+            return
+        target = current.replace(hour=self.digest_hour, minute=0, second=0, microsecond=0)
+        if target <= current:
+            target += timedelta(days=1)
+        self.next_digest = target
+
+    async def poll_once(self) -> List[str]:
+        from modules.api.users import UserAPI, UserPageError
+
+        # Нужен полный список: по неполному observe забыл бы пропавших пользователей,
+        # а при возвращении счел бы их новыми и пропустил пройденные пороги
+        users = []
+        try:
+            async for page in UserAPI.iter_user_pages():
+                users.extend(page)
+        except UserPageError as e:
+            logger.warning(f"User alerts: skipping poll, {e}")
+            return []
+        current = utc_now()
+        lines = self.observe(users, current.timestamp())
+        if lines:
+            await self.notify("👥 *Оповещения о пользователях*\n\n" + "\n".join(_limit_lines(lines)))
+
+        if self.next_digest is None:
+            self._schedule_digest(current)
+        elif current >= self.next_digest:
+            await self.notify(self.digest(current.timestamp()))
+            self._schedule_digest(current)
+        return lines
+
+    async def notify(self, text: str):
+        from modules.localization import resolve_language, translate_text
+
+        for admin_id in ADMIN_USER_IDS:
+            try:
+                await self.bot.send_message(
+                    chat_id=admin_id,
+                    text=translate_text(text, resolve_language(admin_id, admin_id)),
+                    parse_mode="Markdown",
+                )
+            except Exception as e:
+                logger.warning(f"Failed to send user alert to {admin_id}: {e}")
+
+    async def _run(self):
+        while True:
+            try:
+                await self.poll_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"User alerts poll failed: {e}")
+            await asyncio.sleep(self.interval)
+
+
+# Глобальный планировщик оповещений о пользователях
+user_alerts = UserAlerts()
@@ -0,0 +1,118 @@
+import asyncio
+import csv
+import gzip
+import io
+import json
+import logging
+import os
+import tempfile
+import time
+from typing import Awaitable, Callable, List, Optional
+
+from modules.utils.user_filter import UserIndex, parse_filter
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FORMATS = ("csv", "jsonl")
+# Максимальный размер страницы users в панели
+EXPORT_PAGE_SIZE = 500
+
+CSV_COLUMNS = [
+    "uuid", "shortUuid", "username", "status", "tag", "email", "telegramId", "description",
+    "usedTrafficBytes", "trafficLimitBytes", "lifetimeUsedTrafficBytes", "trafficLimitStrategy",
+    "hwidDeviceLimit", "expireAt", "createdAt", "onlineAt", "subscriptionUrl",
+]
+
+
+class ExportResult:
+    """Итог выгрузки: сколько просмотрено и выгружено, объем и скорость"""
+
+    def __init__(self, fmt: str, path: str):
+        self.format = fmt
+        self.path = path
+        self.scanned = 0
+        self.exported = 0
+        self.pages = 0
+        self.raw_bytes = 0
+        self.file_bytes = 0
+        self.seconds = 0.0
+
+    @property
+    def rate(self) -> float:
+        """Пользователей в секунду"""
+        return self.scanned / self.seconds if self.seconds > 0 else 0.0
+
+    @property
+    def filename(self) -> str:
+        return f"users-{time.strftime('%Y%m%d-%H%M%S')}.{self.format}.gz"
+
+
+def encode_users(users: List[dict], fmt: str, header: bool = False) -> bytes:
+    """Строки одной страницы в выбранном формате"""
+    if fmt == "jsonl":
+        return "".join(json.dumps(user, ensure_ascii=False) + "\n" for user in users).encode("utf-8")
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=CSV_COLUMNS, extrasaction="ignore")
+    if header:
+        writer.writeheader()
+    writer.writerows(users)
+    return buffer.getvalue().encode("utf-8")
+
+
+class UserExport:
+    """Потоковая выгрузка пользователей в сжатый CSV или JSONL.
+
+    Пользователи читаются из панели по страницам, фильтруются и сразу
+    дописываются в gzip-файл во временном каталоге, так что в памяти
+    одновременно находится только одна страница.
+    """
+
+    def __init__(self, fmt: str = "csv", expression: Optional[str] = None, page_size: int = EXPORT_PAGE_SIZE):
+        if fmt not in EXPORT_FORMATS:
+            raise ValueError(f"Unknown export format: {fmt}")
+        self.format = fmt
+        self.expression = expression
+        # Ошибка в выражении (FilterError) всплывает сразу, до запросов к панели
+        self.match = parse_filter(expression) if expression else None
+        self.page_size = page_size
+
+    def _select(self, users: List[dict]) -> List[dict]:
+        if self.match is None:
+            return users
+        mask = self.match(UserIndex(users))
+        return [user for user, matched in zip(users, mask) if matched]
+
+    async def run(self, on_page: Optional[Callable[[ExportResult], Awaitable]] = None) -> ExportResult:
+        """Выгрузить во временный файл; удалить его после отправки должен вызывающий"""
+        from modules.api.users import UserAPI
+
+        fd, path = tempfile.mkstemp(prefix="users-", suffix=f".{self.format}.gz")
+        os.close(fd)
+        result = ExportResult(self.format, path)
+        started = time.monotonic()
+        archive = gzip.open(path, "wb", compresslevel=6)
+        try:
+            async for page in UserAPI.iter_user_pages(self.page_size):
+                selected = self._select(page)
+                data = encode_users(selected, self.format, header=result.pages == 0)
+                # Сжатие и запись — в потоке, чтобы не задерживать цикл событий
+                await asyncio.to_thread(archive.write, data)
+                result.pages += 1
+                result.scanned += len(page)
+                result.exported += len(selected)
+                result.raw_bytes += len(data)
+                result.seconds = time.monotonic() - started
+                if on_page:
+                    await on_page(result)
+        except BaseException:
+            archive.close()
+            os.remove(path)
+            raise
+        await asyncio.to_thread(archive.close)
+        result.file_bytes = os.path.getsize(path)
+        result.seconds = time.monotonic() - started
+        logger.info(
+            f"User export: {result.exported}/{result.scanned} users, {result.pages} pages, "
+            f"{result.raw_bytes} -> {result.file_bytes} bytes in {result.seconds:.2f}s ({result.rate:.0f} users/s)"
+        )
+        return result
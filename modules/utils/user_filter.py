@@ -0,0 +1,328 @@
+"""Выражения-фильтры для массовых операций над снимком пользователей.
+
+Пример: tag = TRIAL and expire < now+3d and used_pct > 90
+
+Условия `поле оператор значение` объединяются через and / or / not и скобки.
+Операторы: = != < <= > >= и ~ (подстрока без учета регистра).
+Значения: числа с единицами (10GB, 512MB), проценты (90%), даты (now-7d,
+now+12h, 2025-01-31), строки (TRIAL или "с пробелами") и none для пустых полей.
+"""
+import asyncio
+import logging
+import re
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+MAX_EXPRESSION_LENGTH = 500
+
+TEXT, NUMBER, BYTES, TIME = "text", "number", "bytes", "time"
+
+SIZE_UNITS = {"b": 1, "kb": 1024, "mb": 1024 ** 2, "gb": 1024 ** 3, "tb": 1024 ** 4}
+DURATION_UNITS = {"m": 60, "h": 3600, "d": 86400, "w": 7 * 86400}
+
+_TOKEN_RE = re.compile(r"""\s*(?:(?P<paren>[()])|(?P<op><=|>=|!=|=|<|>|~)|"(?P<dq>[^"]*)"|'(?P<sq>[^']*)'|(?P<word>[^\s()<>=!~"']+))""")
+_SIZE_RE = re.compile(r"^(\d+(?:\.\d+)?)\s*(b|kb|mb|gb|tb)?$", re.IGNORECASE)
+_RELATIVE_RE = re.compile(r"^now(?:([+-])(\d+(?:\.\d+)?)([mhdw]))?$", re.IGNORECASE)
+
+
+class FilterError(ValueError):
+    """Ошибка в выражении фильтра; текст показывается пользователю"""
+
+
+def _to_timestamp(value: Any) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(str(value).replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return None
+
+
+def _to_number(value: Any) -> Optional[float]:
+    if value is None or value == "":
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _to_text(value: Any) -> str:
+    return str(value).lower() if value is not None else ""
+
+
+def _used_pct(user: dict) -> Optional[float]:
+    limit = _to_number(user.get("trafficLimitBytes"))
+    if not limit:
+        return None
+    return (_to_number(user.get("usedTrafficBytes")) or 0) / limit * 100
+
+
+# Поле фильтра -> (тип, функция извлечения значения из пользователя)
+FIELDS: Dict[str, tuple] = {
+    "status": (TEXT, lambda u: _to_text(u.get("status"))),
+    "tag": (TEXT, lambda u: _to_text(u.get("tag"))),
+    "username": (TEXT, lambda u: _to_text(u.get("username"))),
+    "email": (TEXT, lambda u: _to_text(u.get("email"))),
+    "description": (TEXT, lambda u: _to_text(u.get("description"))),
+    "strategy": (TEXT, lambda u: _to_text(u.get("trafficLimitStrategy"))),
+    "telegram_id": (NUMBER, lambda u: _to_number(u.get("telegramId"))),
+    "devices": (NUMBER, lambda u: _to_number(u.get("hwidDeviceLimit"))),
+    "used": (BYTES, lambda u: _to_number(u.get("usedTrafficBytes")) or 0),
+    "limit": (BYTES, lambda u: _to_number(u.get("trafficLimitBytes")) or 0),
+    "used_pct": (NUMBER, _used_pct),
+    "expire": (TIME, lambda u: _to_timestamp(u.get("expireAt"))),
+    "created": (TIME, lambda u: _to_timestamp(u.get("createdAt"))),
+    "online": (TIME, lambda u: _to_timestamp(u.get("onlineAt"))),
+}
+
+
+class UserIndex:
+    """Колонки заранее вычисленных значений по снимку пользователей"""
+
+    def __init__(self, users: List[dict]):
+        self.users = users
+        self.uuids = [u.get("uuid") for u in users]
+        self.columns: Dict[str, list] = {name: [extract(u) for u in users] for name, (_, extract) in FIELDS.items()}
+        self.built_at = time.time()
+
+    def __len__(self) -> int:
+        return len(self.users)
+
+    def select(self, expression: str) -> List[int]:
+        """Индексы пользователей, подходящих под выражение"""
+        mask = parse_filter(expression)(self)
+        return [i for i, matched in enumerate(mask) if matched]
+
+
+def _parse_value(field: str, kind: str, token: str, quoted: bool, now: float):
+    if not quoted and token.lower() in ("none", "null"):
+        return None
+    if kind == TEXT:
+        return token.lower()
+    if quoted:
+        raise FilterError(f"{field}: ожидается {'дата' if kind == TIME else 'число'}, получено «{token}»")
+
+    if kind == TIME:
+        match = _RELATIVE_RE.match(token)
+        if match:
+            sign, amount, unit = match.groups()
+            if not sign:
+                return now
+            delta = float(amount) * DURATION_UNITS[unit.lower()]
+            return now + delta if sign == "+" else now - delta
+        try:
+            parsed = datetime.fromisoformat(token)
+        except ValueError:
+            raise FilterError(f"Не удалось разобрать дату «{token}» (примеры: now-7d, now+12h, 2025-01-31)")
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=timezone.utc)
+        return parsed.timestamp()
+
+    if kind == NUMBER:
+        try:
+            return float(token.rstrip("%"))
+        except ValueError:
+            raise FilterError(f"{field}: ожидается число, получено «{token}»")
+
+    match = _SIZE_RE.match(token)
+    if not match:
+        raise FilterError(f"Не удалось разобрать объем «{token}» (примеры: 500MB, 10GB, 1.5TB)")
+    amount, unit = match.groups()
+    return float(amount) * SIZE_UNITS[(unit or "b").lower()]
+
+
+def _comparison(field: str, op: str, value) -> Callable[[UserIndex], List[bool]]:
+    kind = FIELDS[field][0]
+    if op == "~" and kind != TEXT:
+        raise FilterError(f"Оператор ~ применим только к текстовым полям, а {field} — нет")
+    if value is None and op not in ("=", "!="):
+        raise FilterError("Значение none сравнивается только через = или !=")
+
+    def evaluate(index: UserIndex) -> List[bool]:
+        column = index.columns[field]
+        if value is None:
+            empty = "" if kind == TEXT else None
+            if op == "=":
+                return [v == empty for v in column]
+            return [v != empty for v in column]
+        if op == "=":
+            return [v == value for v in column]
+        if op == "!=":
+            return [v != value for v in column]
+        if op == "~":
+            return [value in v for v in column]
+        if op == "<":
+            return [v is not None and v < value for v in column]
+        if op == "<=":
+            return [v is not None and v <= value for v in column]
+        if op == ">":
+            return [v is not None and v > value for v in column]
+        return [v is not None and v >= value for v in column]
+
+    return evaluate
+
+
+def _tokenize(expression: str) -> List[tuple]:
+    tokens, position = [], 0
+    expression = expression.strip()
+    while position < len(expression):
+        match = _TOKEN_RE.match(expression, position)
+        if not match or match.end() == position:
+            raise FilterError(f"Непонятный символ в позиции {position + 1}: «{expression[position:position + 10]}»")
+        position = match.end()
+        if match.group("paren"):
+            tokens.append(("paren", match.group("paren")))
+        elif match.group("op"):
+            tokens.append(("op", match.group("op")))
+        elif match.group("dq") is not None or match.group("sq") is not None:
+            tokens.append(("string", match.group("dq") if match.group("dq") is not None else match.group("sq")))
+        else:
+            tokens.append(("word", match.group("word")))
+    return tokens
+
+
+class _Parser:
+    """Рекурсивный спуск: or -> and -> not / скобки / сравнение"""
+
+    def __init__(self, tokens: List[tuple], now: float):
+        self.tokens = tokens
+        self.position = 0
+        self.now = now
+
+    def peek(self) -> Optional[tuple]:
+        return self.tokens[self.position] if self.position < len(self.tokens) else None
+
+    def take(self) -> tuple:
+        token = self.peek()
+        if token is None:
+            raise FilterError("Выражение оборвалось — не хватает условия или значения")
+        self.position += 1
+        return token
+
+    def keyword(self, word: str) -> bool:
+        token = self.peek()
+        if token and token[0] == "word" and token[1].lower() == word:
+            self.position += 1
+            return True
+        return False
+
+    def parse(self):
+        node = self.parse_or()
+        if self.peek() is not None:
+            raise FilterError(f"Лишняя часть выражения: «{self.peek()[1]}»")
+        return node
+
+    def parse_or(self):
+        nodes = [self.parse_and()]
+        while self.keyword("or"):
+            nodes.append(self.parse_and())
+        if len(nodes) == 1:
+            return nodes[0]
+        return lambda index: [any(values) for values in zip(*(node(index) for node in nodes))]
+
+    def parse_and(self):
+        nodes = [self.parse_unary()]
+        while self.keyword("and"):
+            nodes.append(self.parse_unary())
+        if len(nodes) == 1:
+            return nodes[0]
+        return lambda index: [all(values) for values in zip(*(node(index) for node in nodes))]
+
+    def parse_unary(self):
+        if self.keyword("not"):
+            node = self.parse_unary()
+            return lambda index: [not value for value in node(index)]
+        if self.peek() == ("paren", "("):
+            self.take()
+            node = self.parse_or()
+            if self.take() != ("paren", ")"):
+                raise FilterError("Не хватает закрывающей скобки")
+            return node
+        return self.parse_comparison()
+
+    def parse_comparison(self):
+        kind, field = self.take()
+        field = field.lower()
+        if kind != "word" or field not in FIELDS:
+            raise FilterError(f"Неизвестное поле «{field}». Доступны: {', '.join(FIELDS)}")
+        kind, op = self.take()
+        if kind != "op":
+            raise FilterError(f"После поля {field} ожидается оператор (= != < <= > >= ~)")
+        kind, raw = self.take()
+        if kind not in ("word", "string"):
+            raise FilterError(f"Не хватает значения после «{field} {op}»")
+        value = _parse_value(field, FIELDS[field][0], raw, kind == "string", self.now)
+        return _comparison(field, op, value)
+
+
+def parse_filter(expression: str, now: Optional[float] = None) -> Callable[[UserIndex], List[bool]]:
+    """Разобрать выражение в функцию, возвращающую маску по колонкам индекса"""
+    if not expression or not expression.strip():
+        raise FilterError("Пустое выражение")
+    if len(expression) > MAX_EXPRESSION_LENGTH:
+        raise FilterError(f"Выражение длиннее {MAX_EXPRESSION_LENGTH} символов")
+    now = time.time() if now is None else now
+    return _Parser(_tokenize(expression), now).parse()
+
+
+_index: Optional[UserIndex] = None
+
+
+async def get_user_index() -> Optional[UserIndex]:
+    """Индекс по снимку из кэша пользователей; перестраивается, когда снимок обновился"""
+    global _index
+    from modules.handlers.users.handlers import user_cache
+
+    users = await user_cache.get_all_users()
+    if users is None:
+        return None
+    if _index is None or _index.users is not users:
+        started = time.monotonic()
+        _index = await asyncio.to_thread(UserIndex, users)
+        logger.info(f"User filter index built for {len(users)} users in {time.monotonic() - started:.2f}s")
+    return _index
+
+
+class StatusIndex:
+    """Число пользователей, трафик и примеры имен по каждому статусу"""
+
+    SAMPLE_SIZE = 10
+
+    def __init__(self, users: List[dict], snapshot_time: Optional[float] = None):
+        self.users = users
+        self.snapshot_time = snapshot_time or time.time()
+        self.statuses: Dict[str, dict] = {}
+        for user in users:
+            status = str(user.get("status") or "UNKNOWN").upper()
+            entry = self.statuses.get(status)
+            if entry is None:
+                entry = self.statuses[status] = {"count": 0, "used": 0, "lifetime": 0, "sample": []}
+            entry["count"] += 1
+            entry["used"] += _to_number(user.get("usedTrafficBytes")) or 0
+            entry["lifetime"] += _to_number(user.get("lifetimeUsedTrafficBytes")) or 0
+            if len(entry["sample"]) < self.SAMPLE_SIZE:
+                entry["sample"].append(user.get("username") or user.get("uuid"))
+
+    def get(self, status: str) -> dict:
+        return self.statuses.get(status.upper(), {"count": 0, "used": 0, "lifetime": 0, "sample": []})
+
+
+_status_index: Optional[StatusIndex] = None
+
+
+def peek_status_index() -> Optional[StatusIndex]:
+    """Индекс статусов по уже загруженному снимку; None, если снимка в кэше нет"""
+    global _status_index
+    from modules.handlers.users.handlers import user_cache
+
+    cached = user_cache.peek_all_users()
+    if cached is None:
+        return None
+    users, snapshot_time = cached
+    if _status_index is None or _status_index.users is not users:
+        _status_index = StatusIndex(users, snapshot_time)
+    return _status_index
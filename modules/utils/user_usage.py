@@ -0,0 +1,146 @@
+import logging
+import time
+from collections import OrderedDict
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from modules.config import USER_USAGE_CACHE_SIZE, USER_USAGE_TODAY_TTL
+from modules.utils.node_history import DAY_CLOSE_GRACE, usage_range_params, utc_now
+
+logger = logging.getLogger(__name__)
+
+# Период статистики пользователя, дни
+USER_USAGE_DAYS = 30
+
+
+class UserUsage:
+    """Трафик одного пользователя по дням, уже сгруппированный по серверам"""
+
+    def __init__(self):
+        # Дата -> UUID сервера -> байты; закрытые дни не меняются
+        self.closed: Dict[str, Dict[str, int]] = {}
+        self.recent: Dict[str, Dict[str, int]] = {}
+        self.recent_from: Optional[date] = None
+        self.recent_fetched = 0.0
+
+    def rows(self, day: str) -> Dict[str, int]:
+        if day in self.recent:
+            return self.recent[day]
+        return self.closed.get(day, {})
+
+
+class UserUsageCache:
+    """Кэш users/stats/usage/{uuid}/range с LRU-вытеснением по пользователям.
+
+    Закрытые дни хранятся до вытеснения пользователя и больше не запрашиваются;
+    открытый хвост (сегодня и вчера сразу после полуночи UTC) перечитывается не
+    чаще раза в today_ttl секунд, поэтому повторный просмотр и «Обновить» стоят
+    одного короткого запроса вместо 30 дней.
+    """
+
+    def __init__(self, capacity: int = USER_USAGE_CACHE_SIZE, today_ttl: float = USER_USAGE_TODAY_TTL):
+        self.capacity = max(1, capacity)
+        self.today_ttl = today_ttl
+        self.users: "OrderedDict[str, UserUsage]" = OrderedDict()
+        self.names: Dict[str, str] = {}
+
+    def _entry(self, uuid: str) -> UserUsage:
+        entry = self.users.get(uuid)
+        if entry is None:
+            entry = self.users[uuid] = UserUsage()
+            while len(self.users) > self.capacity:
+                self.users.popitem(last=False)
+        else:
+            self.users.move_to_end(uuid)
+        return entry
+
+    def invalidate(self, uuid: str):
+        self.users.pop(uuid, None)
+
+    async def _fetch(self, uuid: str, start: date, end: date) -> Optional[Dict[str, Dict[str, int]]]:
+        from modules.api.users import UserAPI
+
+        usage = await UserAPI.get_user_usage_by_range(uuid, *usage_range_params(start, end))
+        if not isinstance(usage, list):
+            return None
+        days: Dict[str, Dict[str, int]] = {}
+        for entry in usage:
+            node_uuid = entry.get("nodeUuid")
+            day = str(entry.get("date") or "")[:10]
+            if not node_uuid or not start.isoformat() <= day <= end.isoformat():
+                continue
+            if entry.get("nodeName"):
+                self.names[node_uuid] = entry["nodeName"]
+            rows = days.setdefault(day, {})
+            rows[node_uuid] = rows.get(node_uuid, 0) + int(entry.get("total") or 0)
+        return days
+
+    async def _ensure(self, uuid: str, days: int) -> Optional[UserUsage]:
+        entry = self._entry(uuid)
+        now = utc_now()
+        today = now.date()
+        open_from = (now - DAY_CLOSE_GRACE).date()
+        start = today - timedelta(days=days - 1)
+
+        missing = [
+            start + timedelta(days=offset)
+            for offset in range((open_from - start).days)
+            if (start + timedelta(days=offset)).isoformat() not in entry.closed
+        ]
+        recent_stale = entry.recent_from != open_from or time.monotonic() - entry.recent_fetched >= self.today_ttl
+        if not missing and not recent_stale:
+            return entry
+
+        fetch_start = missing[0] if missing else open_from
+        fetched = await self._fetch(uuid, fetch_start, today)
+        if fetched is None:
+            # Без ответа панели отдаем то, что есть, только если кэш уже заполнен
+            return entry if entry.recent_from is not None else None
+
+        day = fetch_start
+        while day < open_from:
+            entry.closed[day.isoformat()] = fetched.get(day.isoformat(), {})
+            day += timedelta(days=1)
+        entry.recent = {}
+        while day <= today:
+            entry.recent[day.isoformat()] = fetched.get(day.isoformat(), {})
+            day += timedelta(days=1)
+        entry.recent_from = open_from
+        entry.recent_fetched = time.monotonic()
+
+        # Дни, выпавшие из окна, больше не нужны
+        oldest = start.isoformat()
+        for stale in [day for day in entry.closed if day < oldest]:
+            del entry.closed[stale]
+        return entry
+
+    async def node_totals(self, uuid: str, days: int = USER_USAGE_DAYS) -> Optional[List[Tuple[str, str, int]]]:
+        """(UUID сервера, имя, байты) за период по убыванию; None, если панель не ответила"""
+        entry = await self._ensure(uuid, days)
+        if entry is None:
+            return None
+        today = utc_now().date()
+        totals: Dict[str, int] = {}
+        for offset in range(days):
+            for node_uuid, total in entry.rows((today - timedelta(days=offset)).isoformat()).items():
+                totals[node_uuid] = totals.get(node_uuid, 0) + total
+        return sorted(
+            ((node_uuid, self.names.get(node_uuid, "Неизвестный сервер"), total) for node_uuid, total in totals.items()),
+            key=lambda item: item[2],
+            reverse=True,
+        )
+
+    async def daily(self, uuid: str, days: int = USER_USAGE_DAYS) -> Optional[List[Tuple[str, int]]]:
+        """(дата, байты) от старых дней к новым; None, если панель не ответила"""
+        entry = await self._ensure(uuid, days)
+        if entry is None:
+            return None
+        today = utc_now().date()
+        return [
+            (day, sum(entry.rows(day).values()))
+            for day in ((today - timedelta(days=offset)).isoformat() for offset in range(days - 1, -1, -1))
+        ]
+
+
+# Глобальный кэш статистики пользователей
+user_usage_cache = UserUsageCache()